@@ -7,41 +7,210 @@ import sys
 import os
 from dotenv import load_dotenv
 load_dotenv()  # .env 파일에서 환경변수 로드
-import json
+import atexit
+import logging
+import logging.handlers
+import sqlite3
 import threading
 import uuid
 import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import queue
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import config
-from modules.topic_refiner import refine_topic_from_string, evaluate_topic_clarity, ask_clarifying_question, structure_final_topic
-from modules.q_population import construct_q_set
-from modules.p_set_generator import generate_all_personas
-from modules.q_sorting import simulate_all_sortings
-from modules.factor_analysis import perform_factor_analysis
-from modules.dual_type_generator import generate_dual_types
-from modules.report_generator import generate_report, save_data_artifacts
+from utils.llm_client import create_llm_session, use_llm_session, get_provider, ContextThreadPoolExecutor
+
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson 기반 JSON 직렬화 (numpy 스칼라/배열 직접 지원)"""
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option),
+            mimetype=self.mimetype
+        )
+
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
+app.json = OrjsonProvider(app)
 
-# 세션별 진행 상태 저장 (TTL 기반 정리)
-sessions = {}
+# 로깅: 요청/분석 스레드는 큐에 넣기만 하고, 실제 stdout 쓰기는 백그라운드 리스너가 담당
+_log_queue = queue.Queue(-1)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.propagate = False
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# 세션별 진행 상태 저장 (메모리: TTL + LRU 상한, 완료된 결과: sqlite)
+sessions = OrderedDict()
+_sessions_lock = threading.Lock()
 SESSION_TTL_SECONDS = 1800  # 30분
+MAX_SESSIONS = 256  # 메모리에 유지할 최대 세션 수 (초과 시 끝난 세션 중 가장 오래 사용되지 않은 것부터 제거)
+FINISHED_STATUSES = ('completed', 'error')  # 메모리에서 제거해도 되는 세션 상태 (대기/실행 중 세션은 유지)
+SESSION_LOG_LIMIT = 100  # 세션별 보관 로그 수
+SSE_KEEPALIVE_SECONDS = 15  # SSE 연결 유지용 주석 이벤트 간격
+
+# 분석 작업 풀: 동시 실행 수를 제한하고 초과 요청은 대기열에서 순서대로 처리
+_analysis_executor = ContextThreadPoolExecutor(
+    max_workers=config.MAX_CONCURRENT_ANALYSES,
+    thread_name_prefix="analysis"
+)
+_pending_analyses = threading.BoundedSemaphore(config.MAX_CONCURRENT_ANALYSES + config.MAX_QUEUED_ANALYSES)
 
 
 def _cleanup_expired_sessions():
-    """만료된 세션을 메모리에서 제거합니다."""
+    """만료된 세션(완료/오류 상태)을 메모리에서 제거합니다."""
     now = time.time()
-    expired = [sid for sid, s in sessions.items()
-               if now - s.get('created_at', now) > SESSION_TTL_SECONDS]
-    for sid in expired:
-        del sessions[sid]
+    with _sessions_lock:
+        expired = [sid for sid, s in sessions.items()
+                   if s['status'] in FINISHED_STATUSES and now - s.get('created_at', now) > SESSION_TTL_SECONDS]
+        for sid in expired:
+            del sessions[sid]
     if expired:
-        print(f"[CLEANUP] {len(expired)}개 만료 세션 제거 (남은 세션: {len(sessions)}개)", flush=True)
+        logger.info("[CLEANUP] %d개 만료 세션 제거 (남은 세션: %d개)", len(expired), len(sessions))
+
+
+def _add_session(session_id: str, session: dict):
+    """
+    세션을 등록하고 상한을 넘으면 끝난 세션 중 가장 오래 사용되지 않은 것부터 제거합니다.
+    대기/실행 중 세션은 제거하지 않으므로 모두 살아 있으면 상한을 잠시 넘을 수 있습니다.
+    (살아 있는 세션은 최대 MAX_CONCURRENT_ANALYSES + MAX_QUEUED_ANALYSES개)
+    """
+    with _sessions_lock:
+        sessions[session_id] = session
+        excess = len(sessions) - MAX_SESSIONS
+        if excess > 0:
+            evicted = [sid for sid, s in sessions.items() if s['status'] in FINISHED_STATUSES][:excess]
+            for sid in evicted:
+                del sessions[sid]
+                logger.info("[CLEANUP] 세션 상한 초과로 제거: %s", sid)
+
+
+def _get_session(session_id: str):
+    """메모리의 세션을 조회하고, 없으면 디스크에 저장된 완료 결과로 대체합니다."""
+    with _sessions_lock:
+        session = sessions.get(session_id)
+        if session is not None:
+            sessions.move_to_end(session_id)
+            return session
+    
+    result = _load_result(session_id)
+    if result is None:
+        return None
+    return {
+        'status': 'completed',
+        'progress': 100,
+        'current_step': 'Step 7: 분석 완료!',
+        'logs': deque(),
+        'result': result,
+        'error': None
+    }
+
+
+@dataclass(slots=True)
+class QItemView:
+    """결과 화면용 Q-Set 문항"""
+    id: int
+    text: str
+
+
+@dataclass(slots=True)
+class PersonaView:
+    """결과 화면용 페르소나 요약 (반복되는 범주형 값은 intern하여 세션 간 공유)"""
+    id: int
+    name: str
+    age: object
+    gender: str
+    occupation: str
+    personality: tuple
+    values: tuple
+    attitude: str
+    brief: str
+    
+    @classmethod
+    def from_persona(cls, index: int, persona: dict) -> "PersonaView":
+        return cls(
+            id=index + 1,
+            name=persona.get('name', f'P{index+1}'),
+            age=persona.get('age', 'N/A'),
+            gender=_intern(persona.get('gender', 'N/A')),
+            occupation=_intern(persona.get('occupation', 'N/A')),
+            personality=tuple(_intern(t) for t in persona.get('personality_traits', [])),
+            values=tuple(_intern(v) for v in persona.get('values', [])),
+            attitude=persona.get('attitude_toward_topic', '')[:100],
+            brief=persona.get('brief_description', '')
+        )
+
+
+def _intern(value):
+    """문자열이면 sys.intern (성별/직업/성격 특성처럼 값 종류가 적은 필드용)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _results_db() -> sqlite3.Connection:
+    """완료된 분석 결과 저장소 연결"""
+    os.makedirs(os.path.dirname(config.RESULTS_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(config.RESULTS_DB_PATH, timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results (session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, result TEXT NOT NULL)"
+    )
+    return conn
+
+
+def _persist_result(session_id: str, result: dict):
+    """완료된 결과를 sqlite에 저장합니다. (메모리에서 제거된 뒤에도 조회 가능)"""
+    try:
+        conn = _results_db()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (session_id, created_at, result) VALUES (?, ?, ?)",
+                (session_id, time.time(), app.json.dumps(result))
+            )
+            conn.execute(
+                "DELETE FROM results WHERE created_at < ?",
+                (time.time() - config.RESULTS_TTL_SECONDS,)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("[RESULT] 결과 저장 실패 (%s): %s", session_id, e)
+
+
+def _load_result(session_id: str):
+    """sqlite에 저장된 결과를 조회합니다."""
+    try:
+        conn = _results_db()
+        try:
+            row = conn.execute(
+                "SELECT result FROM results WHERE session_id = ? AND created_at >= ?",
+                (session_id, time.time() - config.RESULTS_TTL_SECONDS)
+            ).fetchone()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("[RESULT] 결과 조회 실패 (%s): %s", session_id, e)
+        return None
+    return app.json.loads(row[0]) if row else None
 
 
 def _get_factor_scores_summary(factor_scores_df, q_set, top_n=5):
@@ -49,37 +218,35 @@ def _get_factor_scores_summary(factor_scores_df, q_set, top_n=5):
     if factor_scores_df is None:
         return {}
     
+    import numpy as np
+    from utils.similarity import top_k_indices
     summary = {}
-    import pandas as pd
     
-    for col in factor_scores_df.columns:
-        scores = factor_scores_df[col].sort_values(ascending=False)
-        
-        # 상위 5개 (가장 동의)
-        top_items = []
-        for idx in scores.head(top_n).index:
-            item_num = int(idx.replace("Q", "")) - 1
-            if item_num < len(q_set):
-                top_items.append({
-                    'q_num': item_num + 1,
-                    'text': q_set[item_num][:50] + '...' if len(q_set[item_num]) > 50 else q_set[item_num],
-                    'z_score': round(float(scores[idx]), 2)
-                })
+    # 점수 행렬과 문항 번호는 한 번만 추출 ("Q12" → 11), 이후 열 단위 numpy 연산만 사용
+    values = factor_scores_df.to_numpy(dtype=float)  # (문항 수, 요인 수)
+    item_nums = np.fromiter((int(idx[1:]) - 1 for idx in factor_scores_df.index), dtype=np.int32, count=len(factor_scores_df.index))
+    
+    def _item(pos, score):
+        item_num = int(item_nums[pos])
+        text = q_set[item_num]
+        return {
+            'q_num': item_num + 1,
+            'text': text[:50] + '...' if len(text) > 50 else text,
+            'z_score': round(float(score), 2)
+        }
+    
+    for k, col in enumerate(factor_scores_df.columns):
+        scores = values[:, k]
         
-        # 하위 5개 (가장 비동의)
-        bottom_items = []
-        for idx in scores.tail(top_n).index:
-            item_num = int(idx.replace("Q", "")) - 1
-            if item_num < len(q_set):
-                bottom_items.append({
-                    'q_num': item_num + 1,
-                    'text': q_set[item_num][:50] + '...' if len(q_set[item_num]) > 50 else q_set[item_num],
-                    'z_score': round(float(scores[idx]), 2)
-                })
+        # 상위 5개 (가장 동의) / 하위 5개 (가장 비동의, 낮은 점수부터)
+        top_items = [_item(pos, scores[pos]) for pos in top_k_indices(scores, top_n)
+                     if item_nums[pos] < len(q_set)]
+        bottom_items = [_item(pos, scores[pos]) for pos in top_k_indices(-scores, top_n)
+                        if item_nums[pos] < len(q_set)]
         
         summary[col] = {
             'top_agree': top_items,
-            'top_disagree': bottom_items[::-1]
+            'top_disagree': bottom_items
         }
     
     return summary
@@ -131,183 +298,245 @@ def start_analysis():
         return jsonify({'error': '연구 주제를 입력해주세요.'}), 400
     
     # If no API key provided in request, check server configuration
-    if not api_key:
-        if config.OPENAI_API_KEY:
-            api_key = config.OPENAI_API_KEY
-        elif config.GOOGLE_API_KEY:
-            api_key = config.GOOGLE_API_KEY
-    
-    if not api_key:
+    if not api_key and not (config.OPENAI_API_KEY or config.GOOGLE_API_KEY):
         return jsonify({'error': '서버에 API Key가 설정되어 있지 않습니다. 관리자에게 문의하세요.'}), 400
     
+    # 프로바이더는 요청 시 한 번만 판별하고, 세션 전용 클라이언트로 보관 (전역 config 변경 없음)
+    try:
+        llm_session = create_llm_session(api_key)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # 만료된 세션 정리
     _cleanup_expired_sessions()
     
+    # 실행 + 대기 중인 분석이 상한에 도달하면 즉시 거절 (백프레셔)
+    if not _pending_analyses.acquire(blocking=False):
+        return jsonify({'error': '현재 분석 요청이 많습니다. 잠시 후 다시 시도해주세요.'}), 503
+    
     session_id = str(uuid.uuid4())
-    sessions[session_id] = {
-        'status': 'started',
+    _add_session(session_id, {
+        'status': 'queued',
         'topic': topic,
         'language': language,
-        'api_key': api_key,
+        'llm_client': llm_session,
         'progress': 0,
-        'current_step': '시작',
-        'logs': [],
+        'current_step': '대기 중',
+        'logs': deque(maxlen=SESSION_LOG_LIMIT),
+        'events': queue.Queue(),  # SSE 스트림으로 전달할 상태 변경 알림
         'result': None,
         'created_at': time.time()
-    }
+    })
     
-    # 백그라운드에서 분석 실행
-    print(f"\n[API] 분석 시작 요청 - 세션: {session_id} (Language: {language})", flush=True)
-    print(f"[API] 스레드 생성 중...", flush=True)
-    thread = threading.Thread(target=run_analysis_background, args=(session_id, topic, api_key, language), daemon=True)
-    thread.start()
-    print(f"[API] 스레드 시작됨 - Thread ID: {thread.ident}", flush=True)
+    # 작업 풀에서 분석 실행
+    logger.info("[API] 분석 시작 요청 - 세션: %s (Language: %s)", session_id, language)
+    with use_llm_session(llm_session):
+        # 작업 풀이 제출 시점의 컨텍스트를 복사하므로 백그라운드 작업 전체가 이 세션 클라이언트를 사용
+        future = _analysis_executor.submit(run_analysis_background, session_id, topic, language)
+    future.add_done_callback(lambda _: _pending_analyses.release())
+    logger.info("[API] 작업 풀에 등록됨 (동시 실행 상한: %d)", config.MAX_CONCURRENT_ANALYSES)
     
     return jsonify({'session_id': session_id})
 
 
-def run_analysis_background(session_id: str, topic: str, api_key: str, language: str = 'ko'):
-    """백그라운드에서 분석 실행"""
-    import sys
-    print(f"\n[THREAD] 백그라운드 스레드 시작: {session_id} (Lang: {language})", flush=True)
-    print(f"[THREAD] 주제: {topic[:50]}...", flush=True)
-    print(f"[THREAD] API Key: {'서버 설정 사용' if not api_key else api_key[:10] + '...'}", flush=True)
-    sys.stdout.flush()
-    
-    # API 키가 직접 전달된 경우에만 config 업데이트 (서버 시작 시 .env에서 이미 로드됨)
-    # 주의: --workers 1 환경에서만 안전. 멀티 워커 시 thread-local 사용 필요
-    if api_key and api_key != config.GOOGLE_API_KEY and api_key != config.OPENAI_API_KEY:
-        if api_key.startswith("AIza"):
-            config.GOOGLE_API_KEY = api_key
-            config.LLM_PROVIDER = "gemini"
-        elif api_key.startswith("sk-"):
-            config.OPENAI_API_KEY = api_key
-            config.LLM_PROVIDER = "openai"
+def run_analysis_background(session_id: str, topic: str, language: str = 'ko'):
+    """백그라운드에서 분석 실행 (세션 LLM 클라이언트는 컨텍스트로 전달됨)"""
+    logger.info("[THREAD] 백그라운드 스레드 시작: %s (Lang: %s, Provider: %s)", session_id, language, get_provider())
+    logger.info("[THREAD] 주제: %s...", topic[:50])
     
-    provider = config.LLM_PROVIDER if config.LLM_PROVIDER != "auto" else ("gemini" if config.GOOGLE_API_KEY else "openai")
-    print(f"[THREAD] LLM Provider: {provider}", flush=True)
+    # 파이프라인 모듈(pandas/sklearn/factor_analyzer/LLM SDK)은 첫 분석 시점에 로드
+    # → 워커 기동 시간과 워커당 메모리 절감 (이후 호출은 sys.modules 캐시 사용)
+    from modules.topic_refiner import refine_topic_from_string
+    from modules.q_population import construct_q_set
+    from modules.p_set_generator import generate_all_personas
+    from modules.q_sorting import simulate_all_sortings
+    from modules.factor_analysis import perform_factor_analysis
+    from modules.dual_type_generator import generate_dual_types
+    from modules.report_generator import generate_report
     
-    session = sessions[session_id]
+    with _sessions_lock:
+        session = sessions.get(session_id)
+    if session is None:
+        logger.warning("[THREAD] 세션이 메모리에 없어 분석을 건너뜀: %s", session_id)
+        return
+    session['status'] = 'running'
     
     try:
         # Step 1: 주제 구체화
-        print("[THREAD] Step 1 시작: 주제 구체화")
-        update_session(session_id, 1, "주제 구체화 중...", 5)
-        topic_info = refine_topic_from_string(topic, language)
-        update_session(session_id, 1, f"주제 확정: {topic_info.get('final_topic', topic)}", 15)
-        print(f"[THREAD] Step 1 완료: {topic_info.get('final_topic', topic)}")
+        with TimingContext(session_id, 1, "주제 구체화 중...", 5, 15) as step:
+            topic_info = refine_topic_from_string(topic, language)
+            step.message = f"주제 확정: {topic_info.get('final_topic', topic)}"
         
         # Step 2: Q-Set 구성
-        update_session(session_id, 2, "Q-Population 생성 중 (200개 문항)...", 20)
-        q_population, q_set = construct_q_set(topic_info)
-        update_session(session_id, 2, f"Q-Set 선정 완료: {len(q_set)}개 문항", 30)
+        with TimingContext(session_id, 2, "Q-Population 생성 중 (200개 문항)...", 20, 30) as step:
+            q_population, q_set = construct_q_set(topic_info)
+            step.message = f"Q-Set 선정 완료: {len(q_set)}개 문항"
         
         # Step 3: 페르소나 생성
-        update_session(session_id, 3, "가상 참여자 페르소나 생성 중...", 35)
-        personas = generate_all_personas(topic_info)
-        update_session(session_id, 3, f"페르소나 생성 완료: {len(personas)}명", 45)
+        with TimingContext(session_id, 3, "가상 참여자 페르소나 생성 중...", 35, 45) as step:
+            personas = generate_all_personas(topic_info)
+            step.message = f"페르소나 생성 완료: {len(personas)}명"
         
         # Step 4: Q-Sorting
-        update_session(session_id, 4, "Q-Sorting 시뮬레이션 중...", 50)
-        sorting_matrix = simulate_all_sortings(personas, q_set, topic_info)
-        update_session(session_id, 4, f"Q-Sorting 완료: {sorting_matrix.shape}", 60)
+        with TimingContext(session_id, 4, "Q-Sorting 시뮬레이션 중...", 50, 60) as step:
+            sorting_matrix = simulate_all_sortings(personas, q_set, topic_info)
+            step.message = f"Q-Sorting 완료: {sorting_matrix.shape}"
         
         # Step 5: 요인 분석
-        update_session(session_id, 5, "통계 분석 (Factor Analysis) 중...", 65)
-        factor_result = perform_factor_analysis(sorting_matrix)
-        update_session(session_id, 5, f"요인 분석 완료: {factor_result['n_factors']}개 요인", 75)
+        with TimingContext(session_id, 5, "통계 분석 (Factor Analysis) 중...", 65, 75) as step:
+            factor_result = perform_factor_analysis(sorting_matrix)
+            step.message = f"요인 분석 완료: {factor_result['n_factors']}개 요인"
         
         # Step 6: 유형 이원화
-        update_session(session_id, 6, "유형 이원화 생성 중...", 80)
-        types = generate_dual_types(
-            factor_result['factor_scores'],
-            q_set,
-            topic_info,
-            factor_result['significant_loadings']
-        )
-        update_session(session_id, 6, f"유형 생성 완료: {len(types)}개 유형", 90)
+        with TimingContext(session_id, 6, "유형 이원화 생성 중...", 80, 90) as step:
+            types = generate_dual_types(
+                factor_result['factor_scores'],
+                q_set,
+                topic_info,
+                factor_result['significant_loadings']
+            )
+            step.message = f"유형 생성 완료: {len(types)}개 유형"
         
         # Step 7: 리포트 생성
-        update_session(session_id, 7, "리포트 생성 중...", 95)
-        report_path = generate_report(
-            topic_info, q_set, personas, sorting_matrix, factor_result, types
-        )
-        
-        # 결과 저장 - 상세 데이터 포함
-        session['result'] = {
-            'topic_info': topic_info,
-            # Q-Set 문항 (id, text)
-            'q_set': [{'id': i+1, 'text': q} for i, q in enumerate(q_set)],
-            # 페르소나 상세 정보
-            'personas': [{
-                'id': i+1,
-                'name': p.get('name', f'P{i+1}'),
-                'age': p.get('age', 'N/A'),
-                'gender': p.get('gender', 'N/A'),
-                'occupation': p.get('occupation', 'N/A'),
-                'personality': p.get('personality_traits', []),
-                'values': p.get('values', []),
-                'attitude': p.get('attitude_toward_topic', '')[:100],
-                'brief': p.get('brief_description', '')
-            } for i, p in enumerate(personas)],
-            # Factor 분석 통계
-            'factor_stats': {
-                'n_factors': factor_result['n_factors'],
-                'eigenvalues': factor_result.get('eigenvalues', [])[:factor_result['n_factors']],  # ★ 실제 Eigenvalue 사용
-                'explained_variance': factor_result['variance'].get('proportion_var', []),
-                'cumulative_variance': factor_result['variance'].get('cumulative_var', []),
-                'total_variance': sum(factor_result['variance'].get('proportion_var', []))
-            },
-            # 요인별 Z-score 상위/하위 문항
-            'factor_scores_summary': _get_factor_scores_summary(factor_result.get('factor_scores'), q_set),
-            # 합의 문항 (모든 Factor에서 비슷한 점수)
-            'consensus_statements': _get_consensus_statements(factor_result.get('factor_scores'), q_set),
-            # 유형 정보
-            'types': types,
-            'n_types': len(types),
-            'report_path': report_path
-        }
-        
-        update_session(session_id, 7, "분석 완료!", 100)
-        session['status'] = 'completed'
+        with TimingContext(session_id, 7, "리포트 생성 중...", 95, 100) as step:
+            report_path = generate_report(
+                topic_info, q_set, personas, sorting_matrix, factor_result, types
+            )
+            
+            # 결과 저장 - 상세 데이터 포함
+            session['result'] = {
+                'topic_info': topic_info,
+                # Q-Set 문항 (id, text)
+                'q_set': [QItemView(i + 1, q) for i, q in enumerate(q_set)],
+                # 페르소나 상세 정보
+                'personas': [PersonaView.from_persona(i, p) for i, p in enumerate(personas)],
+                # Factor 분석 통계
+                'factor_stats': {
+                    'n_factors': factor_result['n_factors'],
+                    'eigenvalues': factor_result.get('eigenvalues', [])[:factor_result['n_factors']],  # ★ 실제 Eigenvalue 사용
+                    'explained_variance': factor_result['variance'].get('proportion_var', []),
+                    'cumulative_variance': factor_result['variance'].get('cumulative_var', []),
+                    'total_variance': sum(factor_result['variance'].get('proportion_var', []))
+                },
+                # 요인별 Z-score 상위/하위 문항
+                'factor_scores_summary': _get_factor_scores_summary(factor_result.get('factor_scores'), q_set),
+                # 합의 문항 (모든 Factor에서 비슷한 점수)
+                'consensus_statements': _get_consensus_statements(factor_result.get('factor_scores'), q_set),
+                # 유형 정보
+                'types': types,
+                'n_types': len(types),
+                'report_path': report_path
+            }
+            
+            _persist_result(session_id, session['result'])
+            session['status'] = 'completed'
+            step.message = "분석 완료!"
         
     except Exception as e:
-        print(f"\n[ERROR] 분석 중 오류 발생: {e}", flush=True)
+        logger.error("[ERROR] 분석 중 오류 발생: %s", e)
         session['status'] = 'error'
         session['error'] = str(e)
         session['logs'].append(f"❌ 오류: {e}")
+        session['events'].put_nowait('error')
 
 
-def update_session(session_id: str, step: int, message: str, progress: int):
-    """세션 상태 업데이트"""
-    session = sessions.get(session_id)
+def update_session(session_id: str, step: int, message: str, progress: int, elapsed_ms: float = None):
+    """세션 상태 업데이트 (로그 추가 + SSE 알림)"""
+    with _sessions_lock:
+        session = sessions.get(session_id)
     if session:
+        log = f"[Step {step}] {message}" if elapsed_ms is None else f"[Step {step}] {message} ({elapsed_ms:.0f}ms)"
         session['current_step'] = f"Step {step}: {message}"
         session['progress'] = progress
-        session['logs'].append(f"[Step {step}] {message}")
+        session['logs'].append(log)
+        session['events'].put_nowait(step)
+        logger.info("[THREAD] %s", log)
 
 
-@app.route('/api/status/<session_id>')
-def get_status(session_id):
-    """진행 상태 조회"""
-    session = sessions.get(session_id)
-    if not session:
-        return jsonify({'error': '세션을 찾을 수 없습니다.'}), 404
+class TimingContext:
+    """
+    분석 단계 실행 시간을 측정하고 단계 완료 시 한 번만 진행 상태를 갱신합니다.
+    시작 시에는 current_step/progress만 조용히 바꾸고 로그/알림은 남기지 않습니다.
+    """
+    
+    def __init__(self, session_id: str, step: int, message: str, start_progress: int, end_progress: int):
+        self.session_id = session_id
+        self.step = step
+        self.message = message  # 블록 안에서 완료 메시지로 교체
+        self.start_progress = start_progress
+        self.end_progress = end_progress
+        self.elapsed_ms = None
+    
+    def __enter__(self):
+        with _sessions_lock:
+            session = sessions.get(self.session_id)
+        if session:
+            session['current_step'] = f"Step {self.step}: {self.message}"
+            session['progress'] = self.start_progress
+        self._started = time.perf_counter()
+        return self
     
-    return jsonify({
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed_ms = (time.perf_counter() - self._started) * 1000
+        if exc_type is None:
+            update_session(self.session_id, self.step, self.message, self.end_progress, self.elapsed_ms)
+        return False
+
+
+def _status_payload(session: dict) -> dict:
+    """상태 응답 본문 (폴링/SSE 공용)"""
+    return {
         'status': session['status'],
         'progress': session['progress'],
         'current_step': session['current_step'],
-        'logs': session['logs'][-10:],  # 최근 10개 로그
+        'logs': list(session['logs'])[-10:],  # 최근 10개 로그
         'result': session.get('result'),
         'error': session.get('error')
-    })
+    }
+
+
+@app.route('/api/stream/<session_id>')
+def stream_status(session_id):
+    """진행 상태 스트리밍 (Server-Sent Events) - 상태가 바뀔 때만 전송"""
+    session = _get_session(session_id)
+    if not session:
+        return jsonify({'error': '세션을 찾을 수 없습니다.'}), 404
+    
+    def generate():
+        # 연결 직후 현재 상태를 먼저 보내 재연결 시에도 화면이 맞도록 함
+        payload = _status_payload(session)
+        yield f"data: {app.json.dumps(payload)}\n\n"
+        
+        while payload['status'] not in ('completed', 'error') and session_id in sessions:
+            try:
+                session['events'].get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            payload = _status_payload(session)
+            yield f"data: {app.json.dumps(payload)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/status/<session_id>')
+def get_status(session_id):
+    """진행 상태 조회 (SSE를 쓸 수 없는 클라이언트용 폴링 엔드포인트)"""
+    session = _get_session(session_id)
+    if not session:
+        return jsonify({'error': '세션을 찾을 수 없습니다.'}), 404
+    
+    return jsonify(_status_payload(session))
 
 
 @app.route('/api/result/<session_id>')
 def get_result(session_id):
     """분석 결과 조회"""
-    session = sessions.get(session_id)
+    session = _get_session(session_id)
     if not session:
         return jsonify({'error': '세션을 찾을 수 없습니다.'}), 404
     
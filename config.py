@@ -14,6 +14,9 @@ GEMINI_MODEL = "gemini-2.0-flash"  # 사용할 모델
 
 # LLM Provider Selection: "openai" or "gemini" (auto-detect if not set)
 LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "auto")
+LLM_TIMEOUT_SECONDS = 60  # LLM 요청 1회당 최대 대기 시간 (초)
+LLM_JSON_PARSE_RETRIES = 2  # JSON 파싱 실패 시 최대 시도 횟수 (형식 오류는 반복해도 잘 고쳐지지 않음)
+LLM_STRICT_JSON = os.environ.get("LLM_STRICT_JSON", "1") != "0"  # OpenAI json_object 응답은 신뢰하고 파싱 실패 시 재요청하지 않음
 
 # Q-Methodology Configuration
 Q_POPULATION_SIZE = 200  # Q-Population 문항 수 (200개 생성 후 60개 선별)
@@ -21,6 +24,13 @@ Q_SET_SIZE = 60  # 최종 Q-Set 문항 수
 P_SET_SIZE = 20  # 페르소나 수
 MAX_TOPIC_REFINEMENT_ITERATIONS = 3  # 주제 구체화 최대 반복 횟수
 PERSONA_SIMILARITY_THRESHOLD = 0.4  # 페르소나 유사도 임계값
+MAX_PARALLEL_LLM = 8  # 동시에 보낼 LLM 요청 수 (레이트 리밋 고려)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))  # 프로세스 전체 동시 LLM 요청 상한 (동시 분석 포함)
+LLM_RPM_LIMIT = int(os.environ.get("LLM_RPM_LIMIT", "500"))  # 프로세스 전체 분당 LLM 요청 상한 (0이면 제한 없음)
+PERSONA_BATCH_SIZE = 5  # 한 번의 LLM 호출로 생성할 페르소나 수
+PERSONA_AVOID_LIMIT = 5  # 재생성 프롬프트에 "이들과 다르게"로 넣을 유사 페르소나 최대 수
+NEAR_DUPLICATE_THRESHOLD = 0.85  # 문항 근접 중복 판정 (문자 3-gram Jaccard 유사도)
+RANKING_MIN_COVERAGE = 0.8  # Q-Sorting 순위 응답이 이 비율 이상의 문항을 포함해야 누락분을 중앙에 채워 사용 (미만이면 재요청)
 
 # Forced Distribution for Q-Sorting (-5 to +5)
 # 정규분포 형태의 강제 분포
@@ -41,6 +51,32 @@ FORCED_DISTRIBUTION = {
 # Factor Analysis Configuration
 EIGENVALUE_THRESHOLD = 1.0  # Eigenvalue 임계값
 MIN_FACTOR_LOADING = 0.4  # 최소 요인 적재량
+USE_FP32_FA = True  # 요인 분석 입력을 float32로 처리 (적재량은 소수점 3자리 정도만 필요)
+
+# Web Server Configuration
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("MAX_CONCURRENT_ANALYSES", "4"))  # 동시에 실행할 분석 수
+MAX_QUEUED_ANALYSES = int(os.environ.get("MAX_QUEUED_ANALYSES", "16"))  # 실행 대기 가능한 분석 수 (초과 시 503)
 
 # Output Configuration
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "outputs")
+SORTING_MATRIX_FORMAT = "parquet"  # "parquet" (pyarrow 필요, 없으면 csv로 대체) 또는 "csv"
+
+# Cache Configuration (정확 일치 + 의미 유사 2단계 캐시)
+CACHE_ENABLED = os.environ.get("QMETHOD_CACHE", "1") != "0"
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "qmethod_cache.sqlite3")
+SEMANTIC_CACHE_THRESHOLD = 0.92  # 의미 일치로 간주할 임베딩 코사인 유사도
+SEMANTIC_LLM_CACHE_MAX_TEMPERATURE = 0.2  # 이 온도 이하 LLM 호출은 항상 캐시하고 의미가 같은 프롬프트도 재사용
+CACHE_DEFAULT_TTL_SECONDS = 24 * 3600
+CACHE_TTL_SECONDS = {
+    "refine": 7 * 24 * 3600,  # 주제 구조화 결과
+    "q_set": 3 * 24 * 3600,  # Q-Population / Q-Set
+    "personas": 24 * 3600,  # P-Set 페르소나
+    "llm": 7 * 24 * 3600,  # 프롬프트 해시 기준 LLM 응답 (generate_json(cache=True) 또는 temperature=0)
+    "llm_text": 7 * 24 * 3600,  # 프롬프트 해시 기준 텍스트 응답 (generate_text(cache=True) 또는 temperature=0)
+    "embedding": 30 * 24 * 3600,  # 텍스트 해시 기준 임베딩 벡터 (프로세스 LRU 다음 단계)
+}
+EMBEDDING_CACHE_SIZE = 2048  # 프로세스 내 임베딩 LRU 항목 수 (같은 텍스트 재임베딩 방지)
+EMBEDDING_BATCH_LIMITS = {"openai": 2048, "gemini": 100}  # 임베딩 배치 요청 1회당 최대 입력 수 (초과분은 나눠서 요청)
+RESULTS_DB_PATH = os.path.join(CACHE_DIR, "results.sqlite3")  # 웹 분석 결과 보관
+RESULTS_TTL_SECONDS = 7 * 24 * 3600  # 보관 기간이 지난 결과는 다음 저장 시 삭제
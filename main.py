@@ -21,6 +21,7 @@ from modules.q_sorting import simulate_all_sortings
 from modules.factor_analysis import perform_factor_analysis, get_factor_interpretation_data
 from modules.dual_type_generator import generate_dual_types
 from modules.report_generator import generate_report, save_data_artifacts
+from utils import async_writer
 
 
 def print_banner():
@@ -143,6 +144,9 @@ def run_full_pipeline(initial_topic: str = None, interactive: bool = True) -> st
         types
     )
     
+    # 백그라운드로 예약된 데이터 아티팩트 쓰기 완료 대기
+    async_writer.flush()
+    
     # 완료 메시지
     print("\n" + "="*60)
     print("🎉 분석 완료!")
@@ -171,6 +175,7 @@ def main():
   python main.py                           # 대화형 모드
   python main.py --topic "MZ세대의 워라밸" # 주제 직접 입력
   python main.py --non-interactive --topic "..."  # 비대화형 모드
+  python main.py --no-cache --topic "..."  # 캐시 없이 처음부터 다시 생성
         """
     )
     
@@ -192,12 +197,22 @@ def main():
         help='출력 디렉토리 경로'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='주제 구체화/Q-Set/페르소나 캐시를 사용하지 않고 새로 생성'
+    )
+    
     args = parser.parse_args()
     
     # 출력 디렉토리 설정
     if args.output:
         config.OUTPUT_DIR = args.output
     
+    # 캐시 비활성화 (같은 주제라도 Q-Set/페르소나를 다시 생성)
+    if args.no_cache:
+        config.CACHE_ENABLED = False
+    
     try:
         interactive = not args.non_interactive
         report_path = run_full_pipeline(
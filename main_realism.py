@@ -7,21 +7,93 @@ import argparse
 import sys
 import os
 import json
+import concurrent.futures
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import config
+from utils.llm_client import ContextThreadPoolExecutor
 from modules.realism_q_set import generate_q_set, get_contradiction_pairs
 from modules.realism_p_set import generate_realism_personas, generate_dual_group_personas
 from modules.q_sorting import simulate_single_sorting
-from modules.validation import validate_sorting
+from modules.validation import resolve_pair_indices, validate_sorting_array
 from modules.factor_analysis import perform_factor_analysis
 from modules.polarity_decomposer import generate_six_types, analyze_internal_conflict
 from modules.match_matrix import analyze_dual_group_dynamics
 from modules.realism_report import generate_realism_report, save_realism_report
 
 
+def _simulate_sortings(
+    personas: list[dict],
+    q_set: list[dict],
+    topic_info: dict,
+    contradiction_pairs: list[tuple[str, str]] = None
+) -> np.ndarray:
+    """
+    모든 페르소나의 Q-Sorting을 병렬로 시뮬레이션합니다.
+    contradiction_pairs가 주어지면 검증(Mirror Test + Flat-line) 실패자만 모아 라운드 단위로 병렬 재시뮬레이션합니다. (최대 3라운드)
+    
+    Returns:
+        페르소나 x 문항 int8 점수 행렬
+    """
+    statements = [q["text"] for q in q_set]
+    q_ids = [q["id"] for q in q_set]
+    # 상충 쌍은 문항 위치 인덱스로 한 번만 변환 (시도마다 ID → 점수 딕셔너리를 만들지 않음)
+    pair_idx = resolve_pair_indices(q_ids, contradiction_pairs) if contradiction_pairs is not None else None
+    
+    def _sort_persona(persona):
+        sorting = simulate_single_sorting(persona, statements, topic_info)
+        return [sorting.get(j + 1, 0) for j in range(len(q_set))]
+    
+    # 점수는 -5 ~ +5이므로 int8 행렬을 한 번만 할당하고 행 단위로 채움
+    sorting_matrix = np.empty((len(personas), len(q_set)), dtype=np.int8)
+    
+    # 1차: 전원 병렬 시뮬레이션 → 검증 실패/응답 오류자만 모아 다음 라운드에서 다시 병렬 재시뮬레이션 (최대 3라운드)
+    max_rounds = 3
+    pending = list(range(len(personas)))
+    with ContextThreadPoolExecutor(max_workers=min(20, config.MAX_PARALLEL_LLM)) as executor:
+        for round_idx in range(max_rounds):
+            future_to_index = {executor.submit(_sort_persona, personas[i]): i for i in pending}
+            failed = []
+            for future in concurrent.futures.as_completed(future_to_index):
+                i = future_to_index[future]
+                try:
+                    sorting_matrix[i] = future.result()
+                except Exception as e:
+                    # 불완전한 순위 응답 등 → 이번 라운드는 0점 행(검증에서 걸러지는 값)으로 두고 재시도
+                    print(f"[SORT] {personas[i].get('name', f'P{i+1}')} 분류 실패: {e}", flush=True)
+                    sorting_matrix[i] = 0
+                    failed.append(i)
+                    continue
+                if pair_idx is not None:
+                    is_valid, _ = validate_sorting_array(sorting_matrix[i], pair_idx, q_ids)
+                    if not is_valid:
+                        failed.append(i)
+            
+            if not failed:
+                break
+            if round_idx < max_rounds - 1:
+                print(f"[SORT] 검증 실패 {len(failed)}명 재시뮬레이션 ({round_idx+2}/{max_rounds})", flush=True)
+            # 검증 실패해도 마지막 라운드 결과를 사용 (계속 오류면 0점 행)
+            pending = sorted(failed)
+    
+    return sorting_matrix
+
+
+def _to_sorting_frame(sorting_matrix: np.ndarray, personas: list[dict]) -> pd.DataFrame:
+    """perform_factor_analysis 입력 형식 (참여자 x 문항 DataFrame, 복사 없이 감쌈)"""
+    return pd.DataFrame(
+        sorting_matrix,
+        index=[p.get("name", f"P{i+1}") for i, p in enumerate(personas)],
+        columns=[f"Q{j+1}" for j in range(sorting_matrix.shape[1])],
+        copy=False
+    )
+
+
 def run_single_group_analysis(topic: str, group_a: str) -> dict:
     """
     Single Group Deep-Dive Mode
@@ -52,40 +124,16 @@ def run_single_group_analysis(topic: str, group_a: str) -> dict:
     
     # Step 3: Q-Sorting 시뮬레이션 + 검증
     print("\n🎯 Step 3: Q-Sorting Simulation with Validation")
-    valid_sortings = []
-    sorting_matrix = []
-    
-    for persona in personas:
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            sorting = simulate_single_sorting(persona, q_set, topic_info)
-            
-            # 검증
-            sorting_dict = {q_set[i]["id"]: score for i, score in enumerate(sorting)}
-            is_valid, report = validate_sorting(sorting_dict, contradiction_pairs)
-            
-            if is_valid:
-                valid_sortings.append(sorting_dict)
-                sorting_matrix.append(sorting)
-                break
-            elif attempt < max_attempts - 1:
-                print(f"[SORT] {persona.get('name', 'Unknown')} 재시뮬레이션 ({attempt+2}/{max_attempts})", flush=True)
-        else:
-            # 검증 실패해도 추가 (경고와 함께)
-            valid_sortings.append(sorting_dict)
-            sorting_matrix.append(sorting)
-    
-    import numpy as np
-    sorting_matrix = np.array(sorting_matrix)
+    sorting_matrix = _simulate_sortings(personas, q_set, topic_info, contradiction_pairs)
     
     # Step 4: Factor Analysis (PCA + Varimax)
     print("\n📊 Step 4: Factor Analysis (PCA + Varimax Rotation)")
-    factor_result = perform_factor_analysis(sorting_matrix)
+    factor_result = perform_factor_analysis(_to_sorting_frame(sorting_matrix, personas))
     
     # Step 5: Polarity Decomposition (6 Types)
     print("\n🎭 Step 5: Polarity Decomposition (3 Factors × 2 Poles)")
     types = generate_six_types(
-        factor_result["factor_scores"],
+        factor_result["factor_scores"].to_numpy(),
         q_set,
         topic_info,
         n_factors=3
@@ -123,6 +171,29 @@ def run_single_group_analysis(topic: str, group_a: str) -> dict:
     }
 
 
+def _analyze_group(topic: str, group: str, topic_info: dict) -> dict:
+    """
+    Dual Group Mode의 단일 집단 파이프라인
+    Q-Set 생성 → 페르소나 → Q-Sorting → 요인 분석 → 6 Types
+    """
+    print(f"\n{'='*30} GROUP: {group} {'='*30}")
+    q_set, category_map, contradiction_pairs = generate_q_set(topic, group, 200, 60)
+    personas = generate_realism_personas(topic_info, group, 20)
+    
+    sorting_matrix = _simulate_sortings(personas, q_set, topic_info)
+    
+    factor_result = perform_factor_analysis(_to_sorting_frame(sorting_matrix, personas))
+    types = generate_six_types(factor_result["factor_scores"].to_numpy(), q_set, topic_info, 3)
+    
+    return {
+        "q_set": q_set,
+        "category_map": category_map,
+        "contradiction_pairs": contradiction_pairs,
+        "personas": personas,
+        "types": types
+    }
+
+
 def run_dual_group_analysis(topic: str, group_a: str, group_b: str) -> dict:
     """
     Dual Group Dynamics Mode
@@ -144,36 +215,20 @@ def run_dual_group_analysis(topic: str, group_a: str, group_b: str) -> dict:
         "analysis_mode": "dual"
     }
     
-    results = {"mode": "dual", "topic_info": topic_info}
-    
-    # Group A 분석
-    print(f"\n{'='*30} GROUP A: {group_a} {'='*30}")
-    q_set_a, cat_map_a, pairs_a = generate_q_set(topic, group_a, 200, 60)
-    personas_a = generate_realism_personas(topic_info, group_a, 20)
-    
-    sorting_matrix_a = []
-    for persona in personas_a:
-        sorting = simulate_single_sorting(persona, q_set_a, topic_info)
-        sorting_matrix_a.append(sorting)
-    
-    import numpy as np
-    sorting_matrix_a = np.array(sorting_matrix_a)
-    factor_result_a = perform_factor_analysis(sorting_matrix_a)
-    types_a = generate_six_types(factor_result_a["factor_scores"], q_set_a, topic_info, 3)
-    
-    # Group B 분석
-    print(f"\n{'='*30} GROUP B: {group_b} {'='*30}")
-    q_set_b, cat_map_b, pairs_b = generate_q_set(topic, group_b, 200, 60)
-    personas_b = generate_realism_personas(topic_info, group_b, 20)
-    
-    sorting_matrix_b = []
-    for persona in personas_b:
-        sorting = simulate_single_sorting(persona, q_set_b, topic_info)
-        sorting_matrix_b.append(sorting)
-    
-    sorting_matrix_b = np.array(sorting_matrix_b)
-    factor_result_b = perform_factor_analysis(sorting_matrix_b)
-    types_b = generate_six_types(factor_result_b["factor_scores"], q_set_b, topic_info, 3)
+    # Group A / Group B 파이프라인은 서로 독립적이므로 동시에 실행
+    group_results = {}
+    with ContextThreadPoolExecutor(max_workers=2) as executor:
+        future_to_label = {
+            executor.submit(_analyze_group, topic, group, {**topic_info, "group": group}): label
+            for label, group in (("A", group_a), ("B", group_b))
+        }
+        for future in concurrent.futures.as_completed(future_to_label):
+            label = future_to_label[future]
+            group_results[label] = future.result()
+            print(f"\n[DUAL] Group {label} 분석 완료", flush=True)
+    
+    q_set_a, personas_a, types_a = (group_results["A"][k] for k in ("q_set", "personas", "types"))
+    q_set_b, personas_b, types_b = (group_results["B"][k] for k in ("q_set", "personas", "types"))
     
     # Match/Mismatch Matrix
     print(f"\n{'='*30} MATCH MATRIX {'='*30}")
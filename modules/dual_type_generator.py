@@ -2,15 +2,12 @@
 Step 6: Dual-Type Generation Module (유형의 이원화)
 각 Factor에 대해 긍정 편향 유형과 부정 편향 유형을 분리합니다.
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import pandas as pd
 import numpy as np
-from utils.llm_client import generate_json
+from utils.llm_client import generate_json, ContextThreadPoolExecutor
 from utils.localization import get_cultural_context
 from modules.factor_analysis import get_factor_interpretation_data
+import config
 
 
 def generate_dual_types(
@@ -36,44 +33,40 @@ def generate_dual_types(
     print("="*60)
     
     interpretation_data = get_factor_interpretation_data(factor_scores, q_set, top_n=7)
-    all_types = []
     
+    # (요인, 편향)별 유형 생성 작업 목록: 요인마다 긍정(상위 문항) → 부정(하위 문항) 순서
+    jobs = []
     for factor_name, data in interpretation_data.items():
-        print(f"\n📌 {factor_name} 이원화 중...")
-        
-        # 긍정 편향 유형 생성
-        positive_type = generate_type(
-            factor_name=factor_name,
-            bias="positive",
-            key_items=data["top_items"],
-            topic_info=topic_info,
-            significant_participants=[
-                p for p in significant_loadings.get(factor_name, [])
-                if p["direction"] == "positive"
-            ]
-        )
-        positive_type["factor"] = factor_name
-        positive_type["bias"] = "positive"
-        positive_type["key_statements"] = data["top_items"]
-        all_types.append(positive_type)
-        print(f"   ✅ {positive_type.get('type_name', 'N/A')} (긍정)")
+        # 대표 참여자를 적재 방향별로 한 번에 분리 (적재량 크기 순서 유지)
+        participants_by_bias = {"positive": [], "negative": []}
+        for p in significant_loadings.get(factor_name, []):
+            participants_by_bias[p["direction"]].append(p)
         
-        # 부정 편향 유형 생성
-        negative_type = generate_type(
-            factor_name=factor_name,
-            bias="negative",
-            key_items=data["bottom_items"],
-            topic_info=topic_info,
-            significant_participants=[
-                p for p in significant_loadings.get(factor_name, [])
-                if p["direction"] == "negative"
-            ]
-        )
-        negative_type["factor"] = factor_name
-        negative_type["bias"] = "negative"
-        negative_type["key_statements"] = data["bottom_items"]
-        all_types.append(negative_type)
-        print(f"   ✅ {negative_type.get('type_name', 'N/A')} (부정)")
+        for bias, items_key in (("positive", "top_items"), ("negative", "bottom_items")):
+            jobs.append((factor_name, bias, data[items_key], participants_by_bias[bias]))
+    
+    print(f"\n📌 {len(interpretation_data)}개 요인 이원화 중 ({len(jobs)}개 유형 병렬 생성)...")
+    
+    # 2N번의 LLM 호출을 동시에 실행 (결과는 작업 목록 순서대로 수집)
+    with ContextThreadPoolExecutor(max_workers=max(1, min(len(jobs), config.MAX_PARALLEL_LLM))) as executor:
+        futures = [
+            executor.submit(
+                generate_type,
+                factor_name=factor_name,
+                bias=bias,
+                key_items=key_items,
+                topic_info=topic_info,
+                significant_participants=participants
+            )
+            for factor_name, bias, key_items, participants in jobs
+        ]
+        all_types = [future.result() for future in futures]
+    
+    for type_info, (factor_name, bias, key_items, _) in zip(all_types, jobs):
+        type_info["factor"] = factor_name
+        type_info["bias"] = bias
+        type_info["key_statements"] = key_items
+        print(f"   ✅ {type_info.get('type_name', 'N/A')} ({factor_name}, {'긍정' if bias == 'positive' else '부정'})")
     
     print(f"\n📊 총 {len(all_types)}개 유형 생성 완료")
     
@@ -159,7 +152,8 @@ JSON 키는 영어 그대로 두되, 내용은 반드시 {cul_ctx['report_langua
 }}
 """
     
-    return generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.7)
+    # 고정 스키마(9개 필드)이므로 응답 길이 상한을 둠
+    return generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.7, max_output_tokens=1200, cache=True)
 
 
 def create_type_summary(types: list[dict]) -> str:
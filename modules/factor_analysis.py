@@ -2,56 +2,77 @@
 Step 5: Statistical Analysis Module (통계적 분석)
 Factor Analysis를 수행하여 유의미한 요인을 추출합니다.
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import numpy as np
 import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 from factor_analyzer import FactorAnalyzer
 from factor_analyzer.factor_analyzer import calculate_kmo
 import config
+from utils.similarity import top_k_indices
+
+
+def _participant_matrix(df: pd.DataFrame) -> np.ndarray:
+    """
+    Q방법론 분석용 (문항 x 참여자) 행렬을 연속 메모리로 만듭니다.
+    df.T.values는 비연속 뷰라 sklearn 내부에서 다시 복사되므로 한 번만 변환합니다.
+    """
+    dtype = np.float32 if config.USE_FP32_FA else np.float64
+    return np.ascontiguousarray(df.to_numpy(dtype=dtype).T)
 
 
-def perform_pca_analysis(df: pd.DataFrame) -> dict:
+def _standardized_matrix(data_transposed: np.ndarray) -> np.ndarray:
+    """
+    참여자(열)별 z-score 표준화 (StandardScaler와 동일: 모분산 기준, 분산 0인 열은 중심화만)
+    perform_factor_analysis에서 한 번만 계산해 PCA 상관행렬과 factor_analyzer 입력에 함께 사용합니다.
+    """
+    mu = data_transposed.mean(axis=0)
+    sd = data_transposed.std(axis=0)
+    sd[sd == 0] = 1
+    return (data_transposed - mu) / sd
+
+
+def perform_pca_analysis(
+    df: pd.DataFrame,
+    data_transposed: np.ndarray = None,
+    data_standardized: np.ndarray = None
+) -> dict:
     """
     PCA 분석을 수행하여 주요 요인을 식별합니다.
     
     Args:
         df: Q-Sorting 데이터 매트릭스 (참여자 x 문항)
+        data_transposed: 이미 만든 (문항 x 참여자) 행렬 (있으면 재사용)
+        data_standardized: 이미 표준화한 (문항 x 참여자) 행렬 (있으면 재사용)
     
     Returns:
         PCA 분석 결과
     """
     # 데이터 전치 (Q방법론에서는 참여자를 변수로, 문항을 관측치로 처리)
-    data_transposed = df.T.values
-    
-    # ★ 중요: 상관행렬 기반 PCA를 위해 데이터 표준화 (Z-score)
-    # 이렇게 해야 Eigenvalue가 변수 수 기준으로 계산됨 (합계 = 변수 수)
-    scaler = StandardScaler()
-    data_standardized = scaler.fit_transform(data_transposed)
-    
-    # PCA 수행 (모든 컴포넌트)
-    pca = PCA()
-    pca.fit(data_standardized)
-    
-    # ★ 상관행렬 기반 Eigenvalue 계산
-    # 표준화된 데이터에서 explained_variance_는 상관행렬의 Eigenvalue와 동일
-    eigenvalues = pca.explained_variance_
+    if data_standardized is None:
+        if data_transposed is None:
+            data_transposed = _participant_matrix(df)
+        data_standardized = _standardized_matrix(data_transposed)
+    
+    # ★ 상관행렬 기반 PCA: 표준화 행렬에서 참여자 간 상관행렬을 한 번에 계산 (BLAS gemm 1회)
+    # 상관행렬의 Eigenvalue 합계 = 변수 수 (분산이 0인 참여자는 행/열이 0)
+    corr = (data_standardized.T @ data_standardized).astype(np.float64) / data_standardized.shape[0]
+    
+    # ★ 대칭 행렬이므로 eigh 사용 (실수 고유값, 오름차순 반환 → 내림차순 정렬)
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    eigenvalues = eigenvalues[::-1]
+    eigenvectors = eigenvectors[:, ::-1]
+    explained_variance_ratio = eigenvalues / eigenvalues.sum()
     n_factors = sum(1 for ev in eigenvalues if ev >= config.EIGENVALUE_THRESHOLD)
     
-    print(f"[PCA] 데이터 shape: {data_transposed.shape}", flush=True)
+    print(f"[PCA] 데이터 shape: {data_standardized.shape}", flush=True)
     print(f"[PCA] 총 Eigenvalue 합계: {sum(eigenvalues):.2f} (변수 수와 동일해야 함)", flush=True)
     print(f"[PCA] Eigenvalue >= 1.0인 요인 수: {n_factors}", flush=True)
     
     return {
         "eigenvalues": eigenvalues.tolist(),
-        "explained_variance_ratio": pca.explained_variance_ratio_.tolist(),
-        "cumulative_variance": np.cumsum(pca.explained_variance_ratio_).tolist(),
+        "explained_variance_ratio": explained_variance_ratio.tolist(),
+        "cumulative_variance": np.cumsum(explained_variance_ratio).tolist(),
         "n_factors": max(n_factors, 2),  # 최소 2개 요인
-        "components": pca.components_
+        "components": eigenvectors.T
     }
 
 
@@ -77,17 +98,18 @@ def perform_factor_analysis(
     print("="*60, flush=True)
     
     # 데이터 전치
-    data_transposed = df.T.values
+    data_transposed = _participant_matrix(df)
     
-    # ★ 상관행렬 기반 분석을 위해 데이터 표준화
-    scaler = StandardScaler()
-    data_standardized = scaler.fit_transform(data_transposed)
+    # ★ 상관행렬 기반 분석을 위해 데이터 표준화 (PCA와 factor_analyzer가 같은 결과를 공유)
+    data_standardized = _standardized_matrix(data_transposed)
+    
+    # ★ 상관행렬 고유분해는 한 번만 수행 (요인 수 결정 + Eigenvalue 보고 + PCA 대체 경로에서 재사용)
+    pca_result = perform_pca_analysis(df, data_standardized=data_standardized)
+    eigenvalues = pca_result["eigenvalues"]
     
     # PCA로 요인 수 결정
     if n_factors is None:
-        pca_result = perform_pca_analysis(df)
         n_factors = pca_result["n_factors"]
-        eigenvalues = pca_result["eigenvalues"]
         print(f"\n🔢 Eigenvalue > 1.0 기준 요인 수: {n_factors}", flush=True)
         print(f"   Eigenvalues: {[f'{ev:.2f}' for ev in eigenvalues[:n_factors+2]]}", flush=True)
     
@@ -103,10 +125,12 @@ def perform_factor_analysis(
         cumulative_var = variance[2].tolist()
     except Exception as e:
         print(f"⚠️ factor_analyzer 오류, PCA로 대체: {e}", flush=True)
-        # PCA 직접 사용 (표준화된 데이터)
-        pca = PCA(n_components=n_factors)
-        pca.fit(data_standardized)  # ★ 표준화된 데이터 사용
-        loadings = pca.components_.T  # Transpose to get (n_features, n_components)
+        # PCA 직접 사용: 위에서 구한 상관행렬 고유벡터를 그대로 재사용 (추가 SVD 없음)
+        components = pca_result["components"][:n_factors].copy()
+        # sklearn PCA와 같은 부호 규약 (각 성분에서 절대값이 가장 큰 원소가 양수)
+        max_abs = np.argmax(np.abs(components), axis=1)
+        components *= np.sign(components[np.arange(n_factors), max_abs])[:, None]
+        loadings = components.T  # Transpose to get (n_features, n_components)
         
         # Varimax 회전 수동 적용
         if rotation == "varimax":
@@ -114,9 +138,10 @@ def perform_factor_analysis(
         
         # 분산 계산 (상관행렬 기반 PCA에서는 총 분산 = 변수 수)
         n_vars = data_standardized.shape[1]  # 변수(참여자) 수
-        # PCA의 explained_variance_ratio_ 사용
-        proportion_var = list(pca.explained_variance_ratio_)
-        ss_loadings = list(pca.explained_variance_)  # Eigenvalues
+        # PCA의 explained_variance_ratio_ / explained_variance_와 동일 (표본 공분산 기준 n/(n-1) 보정)
+        n_obs = data_standardized.shape[0]
+        proportion_var = pca_result["explained_variance_ratio"][:n_factors]
+        ss_loadings = [ev * n_obs / (n_obs - 1) for ev in eigenvalues[:n_factors]]  # Eigenvalues
         cumulative_var = np.cumsum(proportion_var).tolist()
     
     # 각 참여자의 요인 점수 계산
@@ -155,48 +180,27 @@ def perform_factor_analysis(
     }
 
 
-def varimax_rotation(loadings: np.ndarray, max_iter: int = 100, tol: float = 1e-5) -> np.ndarray:
+def varimax_rotation(loadings: np.ndarray, max_iter: int = 50, tol: float = 1e-6) -> np.ndarray:
     """
-    Varimax 회전 수동 구현
+    Varimax 회전 (Kaiser 방식의 닫힌 형태 갱신)
+    요인 쌍별 회전 대신 반복마다 k x k 행렬의 SVD 한 번으로 전체 회전 행렬을 갱신합니다.
     """
-    n_vars, n_factors = loadings.shape
+    n_factors = loadings.shape[1]
     rotation_matrix = np.eye(n_factors)
+    criterion = 0.0
     
     for _ in range(max_iter):
-        old_rotation = rotation_matrix.copy()
-        
-        for i in range(n_factors):
-            for j in range(i + 1, n_factors):
-                # Varimax criterion
-                x = loadings[:, i]
-                y = loadings[:, j]
-                
-                u = x**2 - y**2
-                v = 2 * x * y
-                
-                A = np.sum(u)
-                B = np.sum(v)
-                C = np.sum(u**2 - v**2)
-                D = np.sum(2 * u * v)
-                
-                num = D - 2 * A * B / n_vars
-                den = C - (A**2 - B**2) / n_vars
-                
-                phi = 0.25 * np.arctan2(num, den)
-                
-                # Rotation
-                cos_phi = np.cos(phi)
-                sin_phi = np.sin(phi)
-                
-                loadings[:, i] = x * cos_phi + y * sin_phi
-                loadings[:, j] = -x * sin_phi + y * cos_phi
+        rotated = loadings @ rotation_matrix
+        target = rotated ** 3 - rotated * (rotated ** 2).mean(axis=0)
+        u, s, vt = np.linalg.svd(loadings.T @ target)
+        rotation_matrix = u @ vt
         
-        # Check convergence
-        if np.allclose(rotation_matrix, old_rotation, atol=tol):
+        # Check convergence (varimax 기준값의 상대 증가량)
+        old_criterion, criterion = criterion, s.sum()
+        if old_criterion != 0 and criterion < old_criterion * (1 + tol):
             break
     
-    return loadings
-
+    return loadings @ rotation_matrix
 
 
 def calculate_factor_scores(df: pd.DataFrame, loadings: np.ndarray) -> pd.DataFrame:
@@ -213,36 +217,28 @@ def calculate_factor_scores(df: pd.DataFrame, loadings: np.ndarray) -> pd.DataFr
     n_factors = loadings.shape[1]
     n_items = df.shape[1]
     
-    factor_scores = np.zeros((n_items, n_factors))
+    # 해당 요인에 유의미하게 적재된 참여자들의 |적재량| 가중치 행렬 (참여자 x 요인)
+    abs_loadings = np.abs(loadings)
+    significant_mask = abs_loadings >= config.MIN_FACTOR_LOADING
     
-    for factor_idx in range(n_factors):
-        # 해당 요인에 유의미하게 적재된 참여자들의 가중 평균
-        factor_loadings = loadings[:, factor_idx]
-        
-        # 유의미한 적재량을 가진 참여자만 선택
-        significant_mask = np.abs(factor_loadings) >= config.MIN_FACTOR_LOADING
-        
-        # ★ 유의미한 참여자가 없으면, 상위 3명이라도 사용
-        if not np.any(significant_mask):
-            # 적재량 절대값 기준 상위 3명 선택
-            top_indices = np.argsort(np.abs(factor_loadings))[-3:]
-            significant_mask = np.zeros(len(factor_loadings), dtype=bool)
-            significant_mask[top_indices] = True
-        
-        weights = factor_loadings[significant_mask]
-        weighted_data = df.iloc[significant_mask].values
-        
-        # 가중 평균 계산
-        if len(weights) > 0 and np.sum(np.abs(weights)) > 0:
-            weighted_sum = np.average(weighted_data, axis=0, weights=np.abs(weights))
-            
-            # Z-score 변환 (std=0 방지)
-            std_val = np.std(weighted_sum)
-            if std_val > 0:
-                factor_scores[:, factor_idx] = (weighted_sum - np.mean(weighted_sum)) / std_val
-            else:
-                # 표준편차 0이면 모든 값이 동일 → 중앙화만
-                factor_scores[:, factor_idx] = weighted_sum - np.mean(weighted_sum)
+    # ★ 유의미한 참여자가 없는 요인은, 적재량 절대값 기준 상위 3명이라도 사용
+    for factor_idx in np.flatnonzero(~significant_mask.any(axis=0)):
+        top_indices = np.argsort(abs_loadings[:, factor_idx])[-3:]
+        significant_mask[top_indices, factor_idx] = True
+    
+    weights = np.where(significant_mask, abs_loadings, 0.0)
+    weight_sums = weights.sum(axis=0)
+    valid = weight_sums > 0
+    
+    # 모든 요인의 가중 평균을 행렬곱 한 번으로 계산 (문항 x 요인)
+    weighted_sum = df.to_numpy(dtype=float).T @ weights
+    weighted_sum[:, valid] /= weight_sums[valid]
+    weighted_sum[:, ~valid] = 0.0
+    
+    # Z-score 변환 (std=0이면 모든 값이 동일 → 중앙화만)
+    factor_scores = weighted_sum - weighted_sum.mean(axis=0)
+    std_val = weighted_sum.std(axis=0)
+    factor_scores[:, std_val > 0] /= std_val[std_val > 0]
     
     return pd.DataFrame(
         factor_scores,
@@ -269,23 +265,20 @@ def identify_significant_loadings(
     """
     n_factors = loadings.shape[1]
     result = {}
+    abs_loadings = np.abs(loadings)
     
     for factor_idx in range(n_factors):
-        factor_name = f"Factor{factor_idx + 1}"
         factor_loadings = loadings[:, factor_idx]
         
-        significant = []
-        for i, (name, loading) in enumerate(zip(participant_names, factor_loadings)):
-            if abs(loading) >= threshold:
-                significant.append({
-                    "name": name,
-                    "loading": loading,
-                    "direction": "positive" if loading > 0 else "negative"
-                })
+        # 임계값 이상인 참여자만 골라 적재량 크기 내림차순 정렬 (동률은 원래 순서 유지)
+        idx = np.flatnonzero(abs_loadings[:, factor_idx] >= threshold)
+        idx = idx[np.argsort(-abs_loadings[idx, factor_idx], kind="stable")]
         
-        # 적재량 크기로 정렬
-        significant.sort(key=lambda x: abs(x["loading"]), reverse=True)
-        result[factor_name] = significant
+        result[f"Factor{factor_idx + 1}"] = [{
+            "name": participant_names[i],
+            "loading": float(factor_loadings[i]),
+            "direction": "positive" if factor_loadings[i] > 0 else "negative"
+        } for i in idx]
     
     return result
 
@@ -308,25 +301,24 @@ def identify_consensus_statements(
         합의 문항 리스트
     """
     consensus = []
-    n_factors = len(factor_scores.columns)
-    
-    for idx in factor_scores.index:
-        item_num = int(idx.replace("Q", "")) - 1
-        scores = factor_scores.loc[idx].values
-        
-        # 모든 Factor 간 Z-score 차이 계산
-        max_diff = max(scores) - min(scores)
-        avg_score = np.mean(scores)
-        
-        # 차이가 임계값 이하면 합의 문항
-        if max_diff <= threshold:
-            consensus.append({
-                "item_number": item_num + 1,
-                "statement": q_set[item_num] if item_num < len(q_set) else f"Q{item_num+1}",
-                "avg_z_score": float(avg_score),
-                "max_difference": float(max_diff),
-                "factor_scores": {col: float(factor_scores.loc[idx, col]) for col in factor_scores.columns}
-            })
+    arr = factor_scores.to_numpy()
+    columns = list(factor_scores.columns)
+    item_nums = [int(idx.replace("Q", "")) - 1 for idx in factor_scores.index]
+    
+    # 모든 Factor 간 Z-score 차이/평균을 행 단위로 한 번에 계산
+    max_diff = arr.max(axis=1) - arr.min(axis=1)
+    avg_score = arr.mean(axis=1)
+    
+    # 차이가 임계값 이하면 합의 문항
+    for row in np.flatnonzero(max_diff <= threshold):
+        item_num = item_nums[row]
+        consensus.append({
+            "item_number": item_num + 1,
+            "statement": q_set[item_num] if item_num < len(q_set) else f"Q{item_num+1}",
+            "avg_z_score": float(avg_score[row]),
+            "max_difference": float(max_diff[row]),
+            "factor_scores": {col: float(arr[row, k]) for k, col in enumerate(columns)}
+        })
     
     # 평균 Z-score 절대값으로 정렬 (강한 합의가 먼저)
     consensus.sort(key=lambda x: abs(x["avg_z_score"]), reverse=True)
@@ -352,27 +344,29 @@ def identify_distinguishing_statements(
         Factor별 구분 문항 딕셔너리
     """
     distinguishing = {}
+    arr = factor_scores.to_numpy()
+    item_nums = [int(idx.replace("Q", "")) - 1 for idx in factor_scores.index]
     
-    for col in factor_scores.columns:
-        other_cols = [c for c in factor_scores.columns if c != col]
+    for k, col in enumerate(factor_scores.columns):
+        others = np.delete(arr, k, axis=1)
         dist_items = []
+        if others.shape[1] == 0:
+            distinguishing[col] = dist_items
+            continue
         
-        for idx in factor_scores.index:
-            item_num = int(idx.replace("Q", "")) - 1
-            this_score = factor_scores.loc[idx, col]
-            other_scores = [factor_scores.loc[idx, c] for c in other_cols]
-            
-            # 다른 모든 Factor보다 현저히 높거나 낮은 경우
-            min_diff = min([abs(this_score - other) for other in other_scores])
-            
-            if min_diff >= threshold:
-                dist_items.append({
-                    "item_number": item_num + 1,
-                    "statement": q_set[item_num] if item_num < len(q_set) else f"Q{item_num+1}",
-                    "z_score": float(this_score),
-                    "min_diff_from_others": float(min_diff),
-                    "direction": "high" if this_score > 0 else "low"
-                })
+        # 다른 모든 Factor보다 현저히 높거나 낮은 경우 (다른 Factor와의 최소 차이)
+        this_scores = arr[:, k]
+        min_diff = np.abs(this_scores[:, None] - others).min(axis=1)
+        
+        for row in np.flatnonzero(min_diff >= threshold):
+            item_num = item_nums[row]
+            dist_items.append({
+                "item_number": item_num + 1,
+                "statement": q_set[item_num] if item_num < len(q_set) else f"Q{item_num+1}",
+                "z_score": float(this_scores[row]),
+                "min_diff_from_others": float(min_diff[row]),
+                "direction": "high" if this_scores[row] > 0 else "low"
+            })
         
         # Z-score 차이로 정렬
         dist_items.sort(key=lambda x: x["min_diff_from_others"], reverse=True)
@@ -398,35 +392,24 @@ def get_factor_interpretation_data(
         요인별 해석 데이터
     """
     result = {}
-    
-    for col in factor_scores.columns:
-        factor_scores_sorted = factor_scores[col].sort_values(ascending=False)
-        
-        # 상위 문항 (가장 동의)
-        top_items = []
-        for idx in factor_scores_sorted.head(top_n).index:
-            item_num = int(idx.replace("Q", "")) - 1
-            top_items.append({
-                "item_number": item_num + 1,
-                "statement": q_set[item_num],
-                "z_score": factor_scores_sorted[idx]
-            })
-        
-        # 하위 문항 (가장 비동의)
-        bottom_items = []
-        for idx in factor_scores_sorted.tail(top_n).index:
-            item_num = int(idx.replace("Q", "")) - 1
-            bottom_items.append({
-                "item_number": item_num + 1,
-                "statement": q_set[item_num],
-                "z_score": factor_scores_sorted[idx]
-            })
+    arr = factor_scores.to_numpy()
+    item_nums = [int(idx.replace("Q", "")) - 1 for idx in factor_scores.index]
+    
+    def _items(col_scores, rows):
+        return [{
+            "item_number": item_nums[row] + 1,
+            "statement": q_set[item_nums[row]],
+            "z_score": float(col_scores[row])
+        } for row in rows]
+    
+    for k, col in enumerate(factor_scores.columns):
+        col_scores = arr[:, k]
         
         result[col] = {
-            "top_items": top_items,
-            "bottom_items": bottom_items[::-1],  # 가장 낮은 것부터
-            "mean_score": factor_scores[col].mean(),
-            "std_score": factor_scores[col].std()
+            "top_items": _items(col_scores, top_k_indices(col_scores, top_n)),  # 가장 동의
+            "bottom_items": _items(col_scores, top_k_indices(-col_scores, top_n)),  # 가장 비동의 (가장 낮은 것부터)
+            "mean_score": float(col_scores.mean()),
+            "std_score": float(col_scores.std(ddof=1))  # pandas Series.std와 동일 (표본 표준편차)
         }
     
     return result
@@ -7,59 +7,109 @@ import numpy as np
 from utils.llm_client import generate_json
 
 
-def calculate_type_compatibility(
-    type_a: Dict, 
-    type_b: Dict
-) -> Tuple[float, str]:
+# 충돌하는 방어 기제 패턴
+CONFLICTING_DEFENSES = [
+    ("회피", "직면"), ("공격", "회피"), ("통제", "자유")
+]
+
+
+def _normalize_type(type_info: Dict) -> Dict:
     """
-    두 유형 간의 호환성 점수 계산
+    유형 하나의 비교용 정규화 뷰 (소문자화/토큰화는 유형당 한 번만 수행)
+    """
+    return {
+        "values": frozenset(type_info.get("core_values", [])),
+        "defense_l": type_info.get("defense_mechanism", "").lower(),
+        # 두려움 단어는 중복 제거 (자극 문구 검사는 부분 문자열 일치 유지:
+        # "실패" ↔ "실패할까봐"처럼 조사/어미가 붙은 한국어 표현도 잡기 위함)
+        "fear_tokens": frozenset(type_info.get("hidden_fear", "").lower().split()),
+        "trigger_l": " ".join(type_info.get("trigger_phrases", [])).lower(),
+    }
+
+
+def _type_features(types: List[Dict]) -> Dict:
+    """
+    상성 계산에 필요한 유형별 특징을 한 번만 추출합니다.
+    (핵심 가치 집합, 방어 기제 키워드 포함 여부, 두려움 단어, 자극 문구)
+    """
+    normalized = [_normalize_type(t) for t in types]
+    defense_keywords = sorted({word for pair in CONFLICTING_DEFENSES for word in pair})
+    return {
+        "values": [n["values"] for n in normalized],
+        "defense": {kw: np.array([kw in n["defense_l"] for n in normalized], dtype=bool) for kw in defense_keywords},
+        "fear_words": [n["fear_tokens"] for n in normalized],
+        "triggers": [n["trigger_l"] for n in normalized],
+    }
+
+
+def _value_mask(values: frozenset, vocab: Dict[str, int]) -> int:
+    """핵심 가치 집합 → 비트마스크 (어휘가 64개 이하이면 한 machine word)"""
+    mask = 0
+    for v in values:
+        mask |= 1 << vocab[v]
+    return mask
+
+
+def compute_compatibility_matrix(
+    types_a: List[Dict],
+    types_b: List[Dict]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A x B 전체 유형 쌍의 호환성 점수와 화학 작용을 한 번에 계산합니다.
     
     Returns:
-        compatibility_score: -1.0 (최악) ~ +1.0 (최고)
-        chemistry: 'synergy' | 'neutral' | 'conflict'
+        scores: (A, B) 점수 행렬, -1.0 (최악) ~ +1.0 (최고)
+        chemistry: (A, B) 'synergy' | 'neutral' | 'conflict'
     """
-    # 핵심 가치 비교
-    values_a = set(type_a.get("core_values", []))
-    values_b = set(type_b.get("core_values", []))
+    feat_a = _type_features(types_a)
+    feat_b = _type_features(types_b)
     
-    value_overlap = len(values_a & values_b)
-    value_total = len(values_a | values_b) if values_a | values_b else 1
-    value_compatibility = value_overlap / value_total
+    # 핵심 가치 비교 (Jaccard): 가치 어휘를 비트 위치로 매핑해 유형별 정수 비트마스크로 인코딩
+    # → 교집합/합집합 크기가 AND/OR 후 popcount (집합 해싱 없음)
+    vocab = {v: k for k, v in enumerate(set().union(*feat_a["values"], *feat_b["values"]))}
+    masks_a = [_value_mask(values, vocab) for values in feat_a["values"]]
+    masks_b = [_value_mask(values, vocab) for values in feat_b["values"]]
+    value_compatibility = np.array([
+        [(ma & mb).bit_count() / max((ma | mb).bit_count(), 1) for mb in masks_b]
+        for ma in masks_a
+    ]).reshape(len(types_a), len(types_b))
     
     # 방어 기제 충돌 확인
-    defense_a = type_a.get("defense_mechanism", "").lower()
-    defense_b = type_b.get("defense_mechanism", "").lower()
-    
-    # 충돌하는 방어 기제 패턴
-    conflicting_defenses = [
-        ("회피", "직면"), ("공격", "회피"), ("통제", "자유")
-    ]
+    conflict = np.zeros((len(types_a), len(types_b)), dtype=bool)
+    for d1, d2 in CONFLICTING_DEFENSES:
+        a1, a2 = feat_a["defense"][d1], feat_a["defense"][d2]
+        b1, b2 = feat_b["defense"][d1], feat_b["defense"][d2]
+        conflict |= np.outer(a1, b2) | np.outer(a2, b1)
+    defense_conflict = np.where(conflict, -0.3, 0.0)
     
-    defense_conflict = 0
-    for d1, d2 in conflicting_defenses:
-        if (d1 in defense_a and d2 in defense_b) or (d2 in defense_a and d1 in defense_b):
-            defense_conflict = -0.3
-            break
-    
-    # 두려움 상호 자극 확인
-    fear_a = type_a.get("hidden_fear", "").lower()
-    trigger_b = " ".join(type_b.get("trigger_phrases", [])).lower()
-    
-    fear_triggered = -0.2 if any(word in trigger_b for word in fear_a.split()) else 0
+    # 두려움 상호 자극 확인 (A의 두려움 단어가 B의 자극 문구에 등장)
+    fear_triggered = np.array([
+        [-0.2 if any(word in trigger for word in fear_words) else 0.0 for trigger in feat_b["triggers"]]
+        for fear_words in feat_a["fear_words"]
+    ]).reshape(len(types_a), len(types_b))
     
     # 최종 점수 계산
-    compatibility_score = value_compatibility + defense_conflict + fear_triggered
-    compatibility_score = max(-1.0, min(1.0, compatibility_score))
+    scores = np.clip(value_compatibility + defense_conflict + fear_triggered, -1.0, 1.0)
     
     # 화학 작용 판정
-    if compatibility_score >= 0.3:
-        chemistry = "synergy"
-    elif compatibility_score <= -0.2:
-        chemistry = "conflict"
-    else:
-        chemistry = "neutral"
+    chemistry = np.select([scores >= 0.3, scores <= -0.2], ["synergy", "conflict"], default="neutral")
+    
+    return scores, chemistry
+
+
+def calculate_type_compatibility(
+    type_a: Dict, 
+    type_b: Dict
+) -> Tuple[float, str]:
+    """
+    두 유형 간의 호환성 점수 계산
     
-    return compatibility_score, chemistry
+    Returns:
+        compatibility_score: -1.0 (최악) ~ +1.0 (최고)
+        chemistry: 'synergy' | 'neutral' | 'conflict'
+    """
+    scores, chemistry = compute_compatibility_matrix([type_a], [type_b])
+    return float(scores[0, 0]), str(chemistry[0, 0])
 
 
 def generate_match_matrix(
@@ -72,27 +122,29 @@ def generate_match_matrix(
     """
     print(f"\n[MATRIX] === Match/Mismatch Matrix 생성 ===", flush=True)
     
-    matrix = []
-    
-    for type_a in types_a:
-        row = []
-        for type_b in types_b:
-            score, chemistry = calculate_type_compatibility(type_a, type_b)
-            row.append({
-                "type_a": type_a.get("type_name", "Unknown A"),
-                "type_b": type_b.get("type_name", "Unknown B"),
-                "score": score,
-                "chemistry": chemistry
-            })
-        matrix.append(row)
-    
-    # 최고/최악 매칭 찾기
-    all_pairs = [cell for row in matrix for cell in row]
-    best_match = max(all_pairs, key=lambda x: x["score"])
-    worst_match = min(all_pairs, key=lambda x: x["score"])
+    scores, chemistry = compute_compatibility_matrix(types_a, types_b)
+    names_a = [t.get("type_name", "Unknown A") for t in types_a]
+    names_b = [t.get("type_name", "Unknown B") for t in types_b]
+    
+    def _cell(i, j):
+        return {
+            "type_a": names_a[i],
+            "type_b": names_b[j],
+            "score": float(scores[i, j]),
+            "chemistry": str(chemistry[i, j])
+        }
+    
+    # 최고/최악 매칭 찾기 (동점이면 행 우선 순서상 첫 번째)
+    best_match = _cell(*np.unravel_index(np.argmax(scores), scores.shape))
+    worst_match = _cell(*np.unravel_index(np.argmin(scores), scores.shape))
     
+    # 내부 계산(위험 경고 등)용으로 셀 딕셔너리 대신 (A, B) 배열로 보관
+    # 외부에 돌려주는 "matrix" 셀 리스트는 analyze_dual_group_dynamics에서 matrix_cells()로 한 번만 생성
     result = {
-        "matrix": matrix,
+        "type_names_a": names_a,
+        "type_names_b": names_b,
+        "score_matrix": scores,
+        "chemistry_matrix": chemistry,
         "best_match": best_match,
         "worst_match": worst_match,
         "group_a": topic_info.get("group_a", "Group A"),
@@ -105,6 +157,18 @@ def generate_match_matrix(
     return result
 
 
+def matrix_cells(matrix: Dict) -> List[List[Dict]]:
+    """generate_match_matrix 결과를 셀 딕셔너리의 2차원 리스트로 변환합니다. (직렬화/출력용)"""
+    scores = matrix["score_matrix"]
+    chemistry = matrix["chemistry_matrix"]
+    return [[{
+        "type_a": name_a,
+        "type_b": name_b,
+        "score": float(scores[i, j]),
+        "chemistry": str(chemistry[i, j])
+    } for j, name_b in enumerate(matrix["type_names_b"])] for i, name_a in enumerate(matrix["type_names_a"])]
+
+
 def generate_communication_scripts(
     match_info: Dict,
     topic_info: Dict
@@ -149,7 +213,7 @@ JSON 형식:
 }}
 """
     
-    result = generate_json(prompt)
+    result = generate_json(prompt, max_output_tokens=1500, cache=True)
     result["best_match"] = best
     result["worst_match"] = worst
     
@@ -166,24 +230,26 @@ def generate_risk_warnings(
     위험 매칭 경고 생성
     """
     warnings = []
+    scores = matrix["score_matrix"]
     
-    all_pairs = [cell for row in matrix["matrix"] for cell in row]
-    
-    for pair in all_pairs:
-        if pair["score"] <= risk_threshold:
-            risk_level = "critical" if pair["score"] <= -0.5 else "warning"
-            
-            # 이탈 확률 추정 (단순 휴리스틱)
-            churn_probability = min(95, int(abs(pair["score"]) * 100 + 30))
-            
-            warnings.append({
-                "type_a": pair["type_a"],
-                "type_b": pair["type_b"],
-                "score": pair["score"],
-                "risk_level": risk_level,
-                "churn_probability": churn_probability,
-                "warning_message": f"⚠️ 경고: [{pair['type_a']}]에게 [{pair['type_b']}]를 매칭하면 이탈 확률이 {churn_probability}% 증가합니다."
-            })
+    # 임계값 이하인 셀만 행 우선 순서로 순회
+    for i, j in np.argwhere(scores <= risk_threshold):
+        type_a = matrix["type_names_a"][i]
+        type_b = matrix["type_names_b"][j]
+        score = float(scores[i, j])
+        risk_level = "critical" if score <= -0.5 else "warning"
+        
+        # 이탈 확률 추정 (단순 휴리스틱)
+        churn_probability = min(95, int(abs(score) * 100 + 30))
+        
+        warnings.append({
+            "type_a": type_a,
+            "type_b": type_b,
+            "score": score,
+            "risk_level": risk_level,
+            "churn_probability": churn_probability,
+            "warning_message": f"⚠️ 경고: [{type_a}]에게 [{type_b}]를 매칭하면 이탈 확률이 {churn_probability}% 증가합니다."
+        })
     
     print(f"[MATRIX] {len(warnings)}개 위험 매칭 경고 생성", flush=True)
     
@@ -231,11 +297,11 @@ JSON:
 }}
 """
     
-    dynamics = generate_json(prompt)
+    dynamics = generate_json(prompt, max_output_tokens=1000, cache=True)
     
     return {
         "analysis_mode": "dual_group",
-        "match_matrix": matrix,
+        "match_matrix": {**matrix, "matrix": matrix_cells(matrix)},  # 기존 "matrix" 셀 리스트 필드 유지
         "communication_scripts": scripts,
         "risk_warnings": warnings,
         "dynamics_analysis": dynamics
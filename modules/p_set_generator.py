@@ -2,12 +2,17 @@
 Step 3: P-Set Generation Module (참여자 페르소나 생성)
 연구 주제와 관련된 가상 참여자 페르소나를 생성합니다.
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import io
+import json
+from collections import Counter
 
-from utils.llm_client import generate_json, generate_embedding
-from utils.similarity import check_diversity, calculate_embedding_similarity_matrix
+from utils.llm_client import generate_json, generate_embeddings_batch, ContextThreadPoolExecutor
+from utils.similarity import (
+    similar_partners, calculate_embedding_similarity_matrix,
+    normalize_embeddings, update_similarity_rows, similarity_violations
+)
+from utils.semantic_cache import semantic_cache
+from utils.localization import get_cultural_context
 import config
 import numpy as np
 import random
@@ -119,24 +124,20 @@ def validate_persona_constraints(persona: dict, slot: dict, constraints: dict) -
     return (len(issues) == 0, "; ".join(issues) if issues else "")
 
 
-def generate_single_persona(topic_info: dict, persona_index: int, existing_personas: list[dict] = None, demographic_slot: dict = None) -> dict:
+def generate_single_persona(topic_info: dict, persona_index: int, existing_summary: str = "", demographic_slot: dict = None) -> dict:
     """
     단일 페르소나를 생성합니다.
     
     Args:
         topic_info: 연구 주제 정보
         persona_index: 페르소나 인덱스
-        existing_personas: 기존 생성된 페르소나들 (다양성 확보를 위해)
+        existing_summary: 이 페르소나가 달라야 할 기존 페르소나 요약 (다양성 재생성 시 유사했던 상대만, 한 줄씩)
         demographic_slot: 할당된 인구통계 슬롯 (연령, 성별, 직업 힌트)
     
     Returns:
         생성된 페르소나 정보
     """
-    existing_desc = ""
-    if existing_personas:
-        existing_desc = "기존 페르소나들:\n"
-        for i, p in enumerate(existing_personas):
-            existing_desc += f"- {p.get('name', f'페르소나{i+1}')}: {p.get('brief_description', '')}\n"
+    existing_desc = f"기존 페르소나들:\n{existing_summary}\n" if existing_summary else ""
     
     # 인구통계 제약 프롬프트 생성
     demographic_instruction = ""
@@ -192,6 +193,120 @@ JSON 형식으로 응답해주세요:
     return generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.9)
 
 
+def generate_persona_batch(topic_info: dict, start_index: int, demographic_slots: list[dict]) -> list[dict]:
+    """
+    여러 페르소나를 한 번의 LLM 호출로 생성합니다.
+    
+    Args:
+        topic_info: 연구 주제 정보
+        start_index: 첫 페르소나의 인덱스
+        demographic_slots: 페르소나별 인구통계 슬롯 (순서대로 생성)
+    
+    Returns:
+        슬롯 순서대로 생성된 페르소나 리스트
+    """
+    language = topic_info.get("language", "ko")
+    cul_ctx = get_cultural_context(language)
+    
+    slot_lines = []
+    for k, slot in enumerate(demographic_slots):
+        line = f"- 페르소나 {start_index + k + 1}: 연령 {slot['age_range']}, 성별 {slot['gender']}"
+        if slot.get('occupation_hint'):
+            line += f", 직업군 힌트 {slot['occupation_hint']}"
+        slot_lines.append(line)
+    slot_desc = "\n".join(slot_lines)
+    
+    prompt = f"""
+Q방법론 연구를 위한 가상 참여자 페르소나 {len(demographic_slots)}명을 생성해주세요.
+
+연구 주제: {topic_info.get('final_topic', '')}
+대상 집단: {topic_info.get('target_population', '')}
+연구 맥락: {topic_info.get('context', '')}
+
+⚠️ 인구통계 필수 조건 (페르소나별, 반드시 준수):
+{slot_desc}
+
+[로컬라이제이션 가이드]
+{cul_ctx['persona_rules']}
+언어: 반드시 {cul_ctx['report_language']} 언어로 작성하세요.
+
+다음 조건을 충족하는 페르소나들을 생성해주세요:
+1. 각 페르소나는 위의 인구통계 필수 조건을 순서대로 따라야 합니다.
+2. 페르소나들끼리 명확하게 다른 성격, 배경, 가치관을 가져야 합니다.
+3. 연구 주제에 대해 독특하고 일관된 관점을 가져야 합니다.
+4. 현실적이고 구체적인 배경 스토리가 있어야 합니다.
+
+JSON 형식으로 응답해주세요 (personas 배열에 정확히 {len(demographic_slots)}명, 위 순서대로):
+{{
+    "personas": [
+        {{
+            "name": "이름 (가상)",
+            "age": 나이 (숫자, 인구통계 필수 조건 범위 내),
+            "gender": "성별 (인구통계 필수 조건과 일치)",
+            "occupation": "직업",
+            "education": "학력",
+            "personality_traits": ["성격특성1", "성격특성2", "성격특성3"],
+            "values": ["핵심가치1", "핵심가치2"],
+            "life_experiences": ["주요경험1", "주요경험2"],
+            "attitude_toward_topic": "연구 주제에 대한 기본 태도 (상세 설명)",
+            "brief_description": "한 문장 요약",
+            "decision_making_style": "의사결정 스타일",
+            "social_orientation": "사회적 성향 (개인주의/집단주의 등)"
+        }}
+    ]
+}}
+"""
+    result = generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.9)
+    personas = result.get("personas", [])
+    if len(personas) != len(demographic_slots):
+        raise ValueError(f"배치 응답 인원 불일치: {len(personas)}명 (요청: {len(demographic_slots)}명)")
+    return personas
+
+
+def _fallback_persona(index: int, slot: dict, language: str) -> dict:
+    """생성 실패 시 사용할 언어 기반 최소 페르소나"""
+    if language == "en":
+        fallback_names = ["Alex", "Jordan", "Sam", "Casey", "Morgan", "Taylor", "Riley", "Quinn", "Avery", "Drew",
+                          "Jamie", "Charlie", "Skyler", "Reese", "Sage", "Blake", "Rowan", "Ellis", "Finley", "Emery"]
+        return {
+            "name": fallback_names[index % len(fallback_names)],
+            "age": random.randint(slot['age_min'], slot['age_max']),
+            "gender": slot['gender'],
+            "occupation": "Office Worker",
+            "personality_traits": ["adaptable", "pragmatic", "reserved"],
+            "values": ["stability", "fairness"],
+            "attitude_toward_topic": "Has a moderate, balanced view on the topic.",
+            "brief_description": "A typical respondent with balanced perspectives.",
+            "decision_making_style": "deliberate",
+            "social_orientation": "moderate"
+        }
+    fallback_names = ["김민수", "이지영", "박서준", "최유진", "정하준", "강수빈", "윤도현", "한소희", "오태민", "신예진",
+                      "임준혁", "배지현", "조영호", "류서연", "권대한", "문하은", "서진우", "황수아", "송민재", "양예린"]
+    return {
+        "name": fallback_names[index % len(fallback_names)],
+        "age": random.randint(slot['age_min'], slot['age_max']),
+        "gender": slot['gender'],
+        "occupation": "회사원",
+        "personality_traits": ["적응력 있는", "현실적인", "신중한"],
+        "values": ["안정", "공정성"],
+        "attitude_toward_topic": "주제에 대해 중립적이고 균형 잡힌 시각을 가지고 있다.",
+        "brief_description": "균형 잡힌 시각을 가진 일반적인 응답자.",
+        "decision_making_style": "신중형",
+        "social_orientation": "중도적"
+    }
+
+
+def _personas_cache_key(topic_info: dict, max_retries: int = 3) -> tuple[str, str]:
+    """P-Set 캐시 키: 언어/인구통계 제약/인원 수는 정확 일치, final_topic은 의미 일치"""
+    scope = json.dumps({
+        "language": topic_info.get("language", "ko"),
+        "demographic_constraints": topic_info.get("demographic_constraints") or {},
+        "count": config.P_SET_SIZE,
+    }, ensure_ascii=False, sort_keys=True)
+    return scope, topic_info.get("final_topic", "")
+
+
+@semantic_cache(ns="personas", key_fn=_personas_cache_key)
 def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
     """
     모든 페르소나를 생성하고 다양성을 검증합니다.
@@ -214,13 +329,8 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
     
     # 슬롯 분포 출력
     print(f"\n📊 인구통계 슬롯 분포:")
-    age_ranges = {}
-    gender_counts = {}
-    for slot in slots:
-        ar = slot['age_range']
-        age_ranges[ar] = age_ranges.get(ar, 0) + 1
-        g = slot['gender']
-        gender_counts[g] = gender_counts.get(g, 0) + 1
+    age_ranges = Counter(slot['age_range'] for slot in slots)
+    gender_counts = Counter(slot['gender'] for slot in slots)
     
     print(f"   연령: {', '.join([f'{k}({v}명)' for k, v in sorted(age_ranges.items())])}")
     print(f"   성별: {', '.join([f'{k}({v}명)' for k, v in gender_counts.items()])}")
@@ -229,10 +339,11 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
     
     personas = [None] * config.P_SET_SIZE
     
-    def _generate_and_validate(i, slot):
-        print(f"\n🧑 페르소나 {i+1}/{config.P_SET_SIZE} 생성 중... [{slot['age_range']}, {slot['gender']}]")
-        # 기존 페르소나 목록(existing_personas)을 빈 리스트로 넘겨 독립적으로 생성
-        persona = generate_single_persona(topic_info, i, [], demographic_slot=slot)
+    def _generate_and_validate(i, slot, persona=None):
+        # persona가 없으면 (배치 실패 등) 독립적으로 단일 생성
+        if persona is None:
+            print(f"\n🧑 페르소나 {i+1}/{config.P_SET_SIZE} 생성 중... [{slot['age_range']}, {slot['gender']}]")
+            persona = generate_single_persona(topic_info, i, demographic_slot=slot)
         
         # 제약 준수 검증
         is_valid, issues = validate_persona_constraints(persona, slot, constraints)
@@ -241,7 +352,7 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
             # 재시도 (최대 2회)
             for retry in range(2):
                 print(f"   🔄 재생성 시도 {retry + 1}...")
-                persona = generate_single_persona(topic_info, i, [], demographic_slot=slot)
+                persona = generate_single_persona(topic_info, i, demographic_slot=slot)
                 is_valid, issues = validate_persona_constraints(persona, slot, constraints)
                 if is_valid:
                     break
@@ -249,55 +360,45 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
                 print(f"   ⚠️ 재시도 후에도 제약 위반. 계속 진행합니다.")
         
         print(f"   ✅ {persona.get('name', f'페르소나{i+1}')} ({persona.get('age')}세 {persona.get('gender')}) - {persona.get('brief_description', '')[:40]}...")
-        return i, persona
+        return persona
 
-    # future → index 매핑 딕셔너리 생성
-    future_to_index = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=min(10, config.P_SET_SIZE)) as executor:
-        for i in range(config.P_SET_SIZE):
-            future = executor.submit(_generate_and_validate, i, slots[i])
-            future_to_index[future] = i
+    def _generate_batch(start, batch_slots):
+        print(f"\n🧑 페르소나 {start+1}~{start+len(batch_slots)}/{config.P_SET_SIZE} 배치 생성 중...")
+        try:
+            batch = generate_persona_batch(topic_info, start, batch_slots)
+        except Exception as e:
+            print(f"   ⚠️ 배치 생성 실패, 개별 생성으로 전환: {str(e)[:100]}")
+            batch = [None] * len(batch_slots)
         
-        for future in concurrent.futures.as_completed(future_to_index):
-            idx_fallback = future_to_index[future]
+        results = []
+        for k, (slot, persona) in enumerate(zip(batch_slots, batch)):
             try:
-                idx, persona = future.result()
-                personas[idx] = persona
+                results.append(_generate_and_validate(start + k, slot, persona))
             except Exception as e:
-                print(f"   ❌ 페르소나 {idx_fallback+1} 생성 중 에러 발생: {e}")
+                print(f"   ❌ 페르소나 {start+k+1} 생성 중 에러 발생: {e}")
+                results.append(_fallback_persona(start + k, slot, language))
+        return results
+
+    # 슬롯을 PERSONA_BATCH_SIZE명씩 묶어 한 번의 호출로 생성 (배치 간에는 병렬)
+    batch_size = config.PERSONA_BATCH_SIZE
+    batch_starts = list(range(0, config.P_SET_SIZE, batch_size))
+    
+    # future → 배치 시작 인덱스 매핑 딕셔너리 생성
+    future_to_start = {}
+    with ContextThreadPoolExecutor(max_workers=min(10, len(batch_starts))) as executor:
+        for start in batch_starts:
+            future = executor.submit(_generate_batch, start, slots[start:start + batch_size])
+            future_to_start[future] = start
+        
+        for future in concurrent.futures.as_completed(future_to_start):
+            start = future_to_start[future]
+            try:
+                personas[start:start + batch_size] = future.result()
+            except Exception as e:
+                print(f"   ❌ 페르소나 {start+1}~ 배치 처리 중 에러 발생: {e}")
                 # 실패 시 언어 기반 최소 인격 fallback 객체 할당
-                language = topic_info.get("language", "ko")
-                slot = slots[idx_fallback]
-                if language == "en":
-                    fallback_names = ["Alex", "Jordan", "Sam", "Casey", "Morgan", "Taylor", "Riley", "Quinn", "Avery", "Drew",
-                                      "Jamie", "Charlie", "Skyler", "Reese", "Sage", "Blake", "Rowan", "Ellis", "Finley", "Emery"]
-                    personas[idx_fallback] = {
-                        "name": fallback_names[idx_fallback % len(fallback_names)],
-                        "age": random.randint(slot['age_min'], slot['age_max']),
-                        "gender": slot['gender'],
-                        "occupation": "Office Worker",
-                        "personality_traits": ["adaptable", "pragmatic", "reserved"],
-                        "values": ["stability", "fairness"],
-                        "attitude_toward_topic": "Has a moderate, balanced view on the topic.",
-                        "brief_description": "A typical respondent with balanced perspectives.",
-                        "decision_making_style": "deliberate",
-                        "social_orientation": "moderate"
-                    }
-                else:
-                    fallback_names = ["김민수", "이지영", "박서준", "최유진", "정하준", "강수빈", "윤도현", "한소희", "오태민", "신예진",
-                                      "임준혁", "배지현", "조영호", "류서연", "권대한", "문하은", "서진우", "황수아", "송민재", "양예린"]
-                    personas[idx_fallback] = {
-                        "name": fallback_names[idx_fallback % len(fallback_names)],
-                        "age": random.randint(slot['age_min'], slot['age_max']),
-                        "gender": slot['gender'],
-                        "occupation": "회사원",
-                        "personality_traits": ["적응력 있는", "현실적인", "신중한"],
-                        "values": ["안정", "공정성"],
-                        "attitude_toward_topic": "주제에 대해 중립적이고 균형 잡힌 시각을 가지고 있다.",
-                        "brief_description": "균형 잡힌 시각을 가진 일반적인 응답자.",
-                        "decision_making_style": "신중형",
-                        "social_orientation": "중도적"
-                    }
+                for i in range(start, min(start + batch_size, config.P_SET_SIZE)):
+                    personas[i] = _fallback_persona(i, slots[i], language)
     
     # None 필터링 (에러 fallback이 idx를 정확히 못잡았을 경우 대비)
     personas = [p for p in personas if p is not None]
@@ -305,15 +406,16 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
     # 다양성 검증 (임베딩 실패 시 건너뜀)
     print("\n🔍 페르소나 다양성 검증 중...")
     
+    def _persona_desc(p):
+        return f"{p.get('personality_traits', [])} {p.get('values', [])} {p.get('attitude_toward_topic', '')}"
+    
     try:
+        # 페르소나 설명을 한 번의 요청으로 일괄 임베딩 (재시도 시에는 교체된 페르소나만 다시 임베딩)
+        # 정규화 임베딩 (N, D)와 유사도 행렬 (N, N)을 재시도 내내 유지하고 교체된 행/열만 갱신
+        embeddings = normalize_embeddings(generate_embeddings_batch([_persona_desc(p) for p in personas]))
+        similarity = embeddings @ embeddings.T
         for retry in range(max_retries):
-            embeddings = []
-            for p in personas:
-                # 페르소나 설명을 임베딩
-                desc = f"{p.get('personality_traits', [])} {p.get('values', [])} {p.get('attitude_toward_topic', '')}"
-                embeddings.append(generate_embedding(desc))
-            
-            is_diverse, violations = check_diversity(embeddings, config.PERSONA_SIMILARITY_THRESHOLD)
+            is_diverse, violations = similarity_violations(similarity, config.PERSONA_SIMILARITY_THRESHOLD)
             
             if is_diverse:
                 print(f"✅ 다양성 검증 통과! (모든 페르소나 쌍의 유사도 < {config.PERSONA_SIMILARITY_THRESHOLD})")
@@ -322,33 +424,35 @@ def generate_all_personas(topic_info: dict, max_retries: int = 3) -> list[dict]:
                 print(f"⚠️  다양성 미달: {len(violations)}개 쌍이 임계값 초과")
                 
                 if retry < max_retries - 1:
-                    # 가장 유사한 쌍 중 하나 재생성
-                    violations.sort(key=lambda x: x[2], reverse=True)
-                    idx_to_replace = violations[0][1]  # 두 번째 인덱스 교체
+                    # 초과 쌍마다 뒤쪽 페르소나를 재생성 (서로 독립이므로 한 라운드에 병렬로)
+                    to_replace = sorted({v[1] for v in violations})
+                    print(f"   🔄 페르소나 {', '.join(str(i + 1) for i in to_replace)} 재생성 중...")
+                    
+                    def _regenerate(idx):
+                        # 프롬프트에는 전체 P-Set 대신 이 페르소나와 유사했던 상대만 요약 (입력 토큰 O(1))
+                        existing_summary = "\n".join(
+                            f"- {personas[k].get('name', f'페르소나{k+1}')}: {personas[k].get('brief_description', '')}"
+                            for k in similar_partners(violations, idx, config.PERSONA_AVOID_LIMIT)
+                        )
+                        return generate_single_persona(topic_info, idx, existing_summary, demographic_slot=slots[idx])
                     
-                    print(f"   🔄 페르소나 {idx_to_replace + 1} 재생성 중...")
-                    new_persona = generate_single_persona(
-                        topic_info, 
-                        idx_to_replace, 
-                        [p for i, p in enumerate(personas) if i != idx_to_replace],
-                        demographic_slot=slots[idx_to_replace]
+                    with ContextThreadPoolExecutor(max_workers=max(1, min(len(to_replace), config.MAX_PARALLEL_LLM))) as executor:
+                        new_personas = list(executor.map(_regenerate, to_replace))
+                    for idx, new_persona in zip(to_replace, new_personas):
+                        personas[idx] = new_persona
+                        print(f"   ✅ {new_persona.get('name', f'페르소나{idx+1}')} - {new_persona.get('brief_description', '')[:40]}...")
+                    update_similarity_rows(
+                        embeddings, similarity, to_replace,
+                        generate_embeddings_batch([_persona_desc(p) for p in new_personas])
                     )
-                    personas[idx_to_replace] = new_persona
-                    print(f"   ✅ {new_persona.get('name', f'페르소나{idx_to_replace+1}')} - {new_persona.get('brief_description', '')[:40]}...")
     except Exception as e:
         print(f"⚠️  다양성 검증 건너뜀 (임베딩 에러): {str(e)[:100]}")
         # 다양성 검증 실패해도 20명의 페르소나는 정상 반환
     
     # 최종 인구통계 분포 출력
     print("\n📊 최종 P-Set 인구통계 분포:")
-    final_ages = {}
-    final_genders = {}
-    for p in personas:
-        age = p.get('age', 0)
-        age_group = f"{(age // 10) * 10}대"
-        final_ages[age_group] = final_ages.get(age_group, 0) + 1
-        g = p.get('gender', '미상')
-        final_genders[g] = final_genders.get(g, 0) + 1
+    final_ages = Counter(f"{(p.get('age', 0) // 10) * 10}대" for p in personas)
+    final_genders = Counter(p.get('gender', '미상') for p in personas)
     
     print(f"   연령: {', '.join([f'{k}({v}명)' for k, v in sorted(final_ages.items())])}")
     print(f"   성별: {', '.join([f'{k}({v}명)' for k, v in final_genders.items()])}")
@@ -366,9 +470,11 @@ def describe_personas(personas: list[dict]) -> str:
     Returns:
         요약 설명 문자열
     """
-    summary = []
+    buf = io.StringIO()
     for i, p in enumerate(personas):
-        summary.append(f"""
+        if i:
+            buf.write("\n")
+        buf.write(f"""
 ### 페르소나 {i+1}: {p.get('name', 'N/A')}
 - **나이/성별**: {p.get('age', 'N/A')}세 / {p.get('gender', 'N/A')}
 - **직업**: {p.get('occupation', 'N/A')}
@@ -376,7 +482,7 @@ def describe_personas(personas: list[dict]) -> str:
 - **가치관**: {', '.join(p.get('values', []))}
 - **주제 태도**: {p.get('attitude_toward_topic', 'N/A')[:100]}...
 """)
-    return "\n".join(summary)
+    return buf.getvalue()
 
 
 if __name__ == "__main__":
@@ -3,9 +3,21 @@ Polarity Decomposer
 Factor → Positive Type + Negative Type 분리
 귀추법적 해석 (생존 본능, 방어 기제 중심)
 """
+import string
 from typing import Dict, List, Tuple, Optional
 import numpy as np
-from utils.llm_client import generate_json
+import config
+from utils.llm_client import generate_json, ContextThreadPoolExecutor
+from utils.similarity import top_k_indices
+
+
+def _statement_texts(q_set: List[Dict], n_items: int) -> np.ndarray:
+    """문항 텍스트 object 배열 (요인 점수 행과 1:1 대응해야 하므로 길이를 한 번만 검사)"""
+    if len(q_set) != n_items:
+        raise ValueError(f"Q-Set 문항 수({len(q_set)})와 요인 점수 행 수({n_items})가 다릅니다.")
+    q_texts = np.empty(n_items, dtype=object)
+    q_texts[:] = [q["text"] for q in q_set]
+    return q_texts
 
 
 def decompose_factor_to_types(
@@ -27,18 +39,18 @@ def decompose_factor_to_types(
         positive_type: 동의 기반 유형
         negative_type: 비동의 기반 유형
     """
-    # 정렬하여 상위/하위 문항 추출
-    sorted_indices = np.argsort(factor_scores)
+    factor_scores = np.asarray(factor_scores)
+    q_texts = _statement_texts(q_set, len(factor_scores))
+    
+    # 상위 10개 (가장 동의하는 문항) / 하위 10개 (가장 비동의하는 문항)
+    top_indices = top_k_indices(factor_scores, 10)
+    bottom_indices = top_k_indices(-factor_scores, 10)
     
-    # 상위 10개 (가장 동의하는 문항)
-    top_indices = sorted_indices[-10:][::-1]
-    top_statements = [q_set[i]["text"] for i in top_indices if i < len(q_set)]
-    top_scores = [float(factor_scores[i]) for i in top_indices if i < len(factor_scores)]
+    top_statements = q_texts[top_indices].tolist()
+    top_scores = factor_scores[top_indices].astype(float).tolist()
     
-    # 하위 10개 (가장 비동의하는 문항)
-    bottom_indices = sorted_indices[:10]
-    bottom_statements = [q_set[i]["text"] for i in bottom_indices if i < len(q_set)]
-    bottom_scores = [float(factor_scores[i]) for i in bottom_indices if i < len(factor_scores)]
+    bottom_statements = q_texts[bottom_indices].tolist()
+    bottom_scores = factor_scores[bottom_indices].astype(float).tolist()
     
     # LLM을 통한 귀추법적 해석
     positive_type = interpret_type(
@@ -62,39 +74,19 @@ def decompose_factor_to_types(
     return positive_type, negative_type
 
 
-def interpret_type(
-    topic_info: Dict,
-    factor_index: int,
-    polarity: str,
-    defining_statements: List[str],
-    defining_scores: List[float],
-    contrasting_statements: List[str]
-) -> Dict:
-    """
-    Mirror Logic 기반 유형 해석
-    
-    ⚠️ CRITICAL MIRROR RULE:
-    - Type A (Positive): 동의 문항으로 정의 (정상 해석)
-    - Type B (Negative): Type A가 거부한 문항을 믿는 사람으로 해석
-      → Type B는 단순히 "Type A가 아닌 것"이 아님
-      → Type B는 Type A가 -5를 준 문항에 +5를 주는 별개의 캐릭터
-    """
-    topic = topic_info.get("final_topic", topic_info.get("topic", ""))
-    group = topic_info.get("group", "참여자")
-    
-    if polarity == "positive":
-        # Type A: 정상적인 동의 기반 해석
-        prompt = f"""당신은 Q방법론 심리 분석 전문가입니다.
+# 유형 해석 프롬프트 골격은 모듈 로드 시 한 번만 만들고, 호출 시에는 가변 필드만 채웁니다.
+# Type A: 정상적인 동의 기반 해석
+_TYPE_A_PROMPT = string.Template("""당신은 Q방법론 심리 분석 전문가입니다.
 
-주제: {topic}
-집단: {group}
-요인: Factor {factor_index} - **Type A (Positive Pole)**
+주제: $topic
+집단: $group
+요인: Factor $factor_index - **Type A (Positive Pole)**
 
 이 유형을 정의하는 핵심 문항들 (가장 강하게 동의, Z > +1.0):
-{chr(10).join([f"• ✅ {s} (z={sc:.2f})" for s, sc in zip(defining_statements[:7], defining_scores[:7])])}
+$defining_block
 
 이 유형이 강하게 거부하는 문항들 (Z < -1.0):
-{chr(10).join([f"• ❌ {s}" for s in contrasting_statements[:5]])}
+$contrasting_block
 
 다음 관점에서 해석해주세요:
 1. **생존 본능 (Survival Instinct)**: 핵심 생존 전략
@@ -103,7 +95,7 @@ def interpret_type(
 4. **자기 정당화 로직 (Self-Justification)**: 합리화 방식
 
 JSON 형식:
-{{
+{
   "type_name": "짧고 직관적인 유형명 (한글)",
   "short_description": "한 문장 요약",
   "survival_instinct": "생존 본능",
@@ -113,22 +105,22 @@ JSON 형식:
   "core_values": ["핵심 가치 1", "가치 2", "가치 3"],
   "trigger_phrases": ["자극 트리거 1", "트리거 2"],
   "action_plan": ["행동 지침 1", "지침 2", "지침 3"]
-}}
-"""
-    else:
-        # Type B: ⚠️ MIRROR RULE - Type A가 거부한 것을 믿는 사람으로 해석
-        prompt = f"""당신은 Q방법론 심리 분석 전문가입니다.
+}
+""")
 
-주제: {topic}
-집단: {group}
-요인: Factor {factor_index} - **Type B (Negative Pole)**
+# Type B: ⚠️ MIRROR RULE - Type A가 거부한 것을 믿는 사람으로 해석
+_TYPE_B_PROMPT = string.Template("""당신은 Q방법론 심리 분석 전문가입니다.
+
+주제: $topic
+집단: $group
+요인: Factor $factor_index - **Type B (Negative Pole)**
 
 ⚠️ **MIRROR RULE 적용** ⚠️
 Type A가 강하게 거부한 다음 문항들을 Type B는 **강하게 믿습니다**:
-{chr(10).join([f"• 🔥 \"{s}\" ← Type B는 이것을 진심으로 믿음" for s in contrasting_statements[:7]])}
+$contrasting_block
 
 반대로, Type A가 믿는 다음 문항들을 Type B는 **거부합니다**:
-{chr(10).join([f"• ❌ \"{s}\"" for s in defining_statements[:5]])}
+$defining_block
 
 중요: Type B를 해석할 때:
 - ❌ 단순히 "Type A가 아닌 사람"으로 해석하지 마세요
@@ -142,7 +134,7 @@ Type A가 강하게 거부한 다음 문항들을 Type B는 **강하게 믿습
 4. **자기 정당화**: 이 가치관을 어떻게 정당화하는가?
 
 JSON 형식:
-{{
+{
   "type_name": "Type A와 이념적으로 반대되는 유형명 (한글)",
   "short_description": "Type A와 대조되는 한 문장 정체성",
   "survival_instinct": "Type A와 반대되는 생존 전략",
@@ -153,10 +145,57 @@ JSON 형식:
   "trigger_phrases": ["이 유형을 자극하는 말 1", "트리거 2"],
   "action_plan": ["행동 지침 1", "지침 2", "지침 3"],
   "mirror_belief": "Type A가 거부한 것 중 이 유형이 가장 믿는 신념"
-}}
-"""
+}
+""")
+
+
+def _statement_blocks(
+    polarity: str,
+    defining_statements: List[str],
+    defining_scores: List[float],
+    contrasting_statements: List[str]
+) -> Dict[str, str]:
+    """프롬프트에 들어갈 문항 목록 블록 (극성별 표기)"""
+    if polarity == "positive":
+        return {
+            "defining_block": "\n".join(f"• ✅ {s} (z={sc:.2f})" for s, sc in zip(defining_statements[:7], defining_scores[:7])),
+            "contrasting_block": "\n".join(f"• ❌ {s}" for s in contrasting_statements[:5]),
+        }
+    return {
+        "defining_block": "\n".join(f'• ❌ "{s}"' for s in defining_statements[:5]),
+        "contrasting_block": "\n".join(f'• 🔥 "{s}" ← Type B는 이것을 진심으로 믿음' for s in contrasting_statements[:7]),
+    }
+
+
+def interpret_type(
+    topic_info: Dict,
+    factor_index: int,
+    polarity: str,
+    defining_statements: List[str],
+    defining_scores: List[float],
+    contrasting_statements: List[str]
+) -> Dict:
+    """
+    Mirror Logic 기반 유형 해석
     
-    result = generate_json(prompt)
+    ⚠️ CRITICAL MIRROR RULE:
+    - Type A (Positive): 동의 문항으로 정의 (정상 해석)
+    - Type B (Negative): Type A가 거부한 문항을 믿는 사람으로 해석
+      → Type B는 단순히 "Type A가 아닌 것"이 아님
+      → Type B는 Type A가 -5를 준 문항에 +5를 주는 별개의 캐릭터
+    """
+    topic = topic_info.get("final_topic", topic_info.get("topic", ""))
+    group = topic_info.get("group", "참여자")
+    
+    template = _TYPE_A_PROMPT if polarity == "positive" else _TYPE_B_PROMPT
+    prompt = template.substitute(
+        topic=topic,
+        group=group,
+        factor_index=factor_index,
+        **_statement_blocks(polarity, defining_statements, defining_scores, contrasting_statements)
+    )
+    
+    result = generate_json(prompt, cache=True)
     
     # 메타데이터 추가
     result["factor"] = f"Factor {factor_index}"
@@ -214,56 +253,48 @@ def conditional_decompose_factors(
     
     all_types = []
     factor_info = []
+    jobs = []  # (factor_index, polarity, interpret_type 인자) - 요인 간 LLM 해석은 서로 독립
+    n_used = min(n_factors, factor_scores_matrix.shape[1])
+    q_texts = _statement_texts(q_set, factor_scores_matrix.shape[0])
+    
+    # Check if Bipolar or Unipolar: 전체 요인을 한 번에 판정
+    # factor_loadings가 없는 요인은 factor_scores의 분포로 추정
+    col_min = factor_scores_matrix[:, :n_used].min(axis=0)
+    col_max = factor_scores_matrix[:, :n_used].max(axis=0)
+    is_bipolar_all = (col_min < -0.5) & (col_max > 0.5)
+    neg_counts = np.zeros(n_used, dtype=int)
+    pos_counts = np.zeros(n_used, dtype=int)
+    if factor_loadings is not None:
+        n_loaded = min(n_used, factor_loadings.shape[1])
+        neg_counts[:n_loaded] = (factor_loadings[:, :n_loaded] < -loading_threshold).sum(axis=0)
+        pos_counts[:n_loaded] = (factor_loadings[:, :n_loaded] > loading_threshold).sum(axis=0)
+        is_bipolar_all[:n_loaded] = neg_counts[:n_loaded] > 0
     
-    for i in range(min(n_factors, factor_scores_matrix.shape[1])):
+    for i in range(n_used):
         factor_scores = factor_scores_matrix[:, i]
-        
-        # Check if Bipolar or Unipolar
-        is_bipolar = False
-        negative_loaders_count = 0
-        positive_loaders_count = 0
-        
-        if factor_loadings is not None and i < factor_loadings.shape[1]:
-            loadings = factor_loadings[:, i]
-            negative_loaders_count = np.sum(loadings < -loading_threshold)
-            positive_loaders_count = np.sum(loadings > loading_threshold)
-            is_bipolar = negative_loaders_count > 0
-        else:
-            # factor_loadings가 없으면 factor_scores의 분포로 추정
-            is_bipolar = np.min(factor_scores) < -0.5 and np.max(factor_scores) > 0.5
+        is_bipolar = bool(is_bipolar_all[i])
+        negative_loaders_count = int(neg_counts[i])
+        positive_loaders_count = int(pos_counts[i])
         
         factor_type = "Bipolar" if is_bipolar else "Unipolar"
         print(f"[POLARITY] Factor {i+1}: {factor_type} (Positive: {positive_loaders_count}, Negative: {negative_loaders_count})", flush=True)
         
-        # 정렬하여 상위/하위 문항 추출
-        sorted_indices = np.argsort(factor_scores)
+        # 상위/하위 10개 문항 추출
+        top_indices = top_k_indices(factor_scores, 10)
+        bottom_indices = top_k_indices(-factor_scores, 10)
         
-        top_indices = sorted_indices[-10:][::-1]
-        top_statements = [q_set[j]["text"] for j in top_indices if j < len(q_set)]
-        top_scores = [float(factor_scores[j]) for j in top_indices if j < len(factor_scores)]
+        top_statements = q_texts[top_indices].tolist()
+        top_scores = factor_scores[top_indices].astype(float).tolist()
         
-        bottom_indices = sorted_indices[:10]
-        bottom_statements = [q_set[j]["text"] for j in bottom_indices if j < len(q_set)]
-        bottom_scores = [float(factor_scores[j]) for j in bottom_indices if j < len(factor_scores)]
+        bottom_statements = q_texts[bottom_indices].tolist()
+        bottom_scores = factor_scores[bottom_indices].astype(float).tolist()
         
         # Type A는 항상 생성
-        positive_type = interpret_type(
-            topic_info, i + 1, "positive",
-            top_statements, top_scores, bottom_statements
-        )
-        positive_type["factor_type"] = factor_type
-        positive_type["is_consensus"] = not is_bipolar
-        all_types.append(positive_type)
+        jobs.append((i, "positive", (topic_info, i + 1, "positive", top_statements, top_scores, bottom_statements)))
         
         # Type B는 Bipolar일 때만 생성
         if is_bipolar:
-            negative_type = interpret_type(
-                topic_info, i + 1, "negative",
-                bottom_statements, bottom_scores, top_statements
-            )
-            negative_type["factor_type"] = factor_type
-            negative_type["is_consensus"] = False
-            all_types.append(negative_type)
+            jobs.append((i, "negative", (topic_info, i + 1, "negative", bottom_statements, bottom_scores, top_statements)))
         else:
             # Unipolar: Type B 없음 - 합의 항목으로 표시
             print(f"[POLARITY] Factor {i+1}: Unipolar - Type B 생략 (Universal Agreement)", flush=True)
@@ -275,6 +306,15 @@ def conditional_decompose_factors(
             "negative_loaders": negative_loaders_count
         })
     
+    # 모든 요인의 Type A/B 해석을 동시에 요청 (결과는 요인 → A → B 순서 유지)
+    if jobs:
+        with ContextThreadPoolExecutor(max_workers=max(1, min(len(jobs), config.MAX_PARALLEL_LLM))) as executor:
+            results = list(executor.map(lambda job: interpret_type(*job[2]), jobs))
+        for (i, polarity, _), type_info in zip(jobs, results):
+            type_info["factor_type"] = factor_info[i]["type"]
+            type_info["is_consensus"] = polarity == "positive" and factor_info[i]["type"] == "Unipolar"
+            all_types.append(type_info)
+    
     bipolar_count = sum(1 for f in factor_info if f["type"] == "Bipolar")
     unipolar_count = sum(1 for f in factor_info if f["type"] == "Unipolar")
     
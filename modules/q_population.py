@@ -2,80 +2,44 @@
 Step 2: Q-Population & Q-Set Construction Module (문항 생성 및 선정)
 연구 주제를 바탕으로 Q-Population을 생성하고 Q-Set을 선정합니다.
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import string
 
-from utils.llm_client import generate_json
-from utils.similarity import find_most_dissimilar, calculate_text_similarity_matrix
+from utils.llm_client import generate_json, ContextThreadPoolExecutor
+from utils.similarity import find_most_dissimilar, calculate_text_similarity_matrix, near_duplicate_keep_indices
 from utils.localization import get_cultural_context
+from utils.semantic_cache import semantic_cache
 import config
 
 
-def generate_q_population(topic_info: dict) -> list[str]:
-    """
-    연구 주제를 바탕으로 Q-Population (100개 문항)을 생성합니다.
-    
-    Args:
-        topic_info: 구조화된 연구 주제 정보
-    
-    Returns:
-        100개의 Q-Population 문항 리스트
-    """
-    final_topic = topic_info.get("final_topic", "")
-    research_question = topic_info.get("research_question", "")
-    target_population = topic_info.get("target_population", "")
-    context = topic_info.get("context", "")
-    keywords = topic_info.get("keywords", [])
-    language = topic_info.get("language", "ko")
-    
-    cul_ctx = get_cultural_context(language)
-    
-    prompt = f"""
-Q방법론 연구를 위한 콘코스(Concourse) 문항을 생성합니다.
-
-## 연구 정보 (★ 이 주제에 집중하여 문항 생성)
-- 연구 주제: {final_topic}
-- 연구 질문: {research_question}
-- 대상 집단: {target_population}
-- 연구 맥락: {context}
-- 핵심 키워드: {', '.join(keywords)}
-
-⚠️ **중요**: 위 연구 주제와 직접적으로 관련된 문항만 생성하세요.
-
-{cul_ctx['statement_rules']}
-반드시 **{cul_ctx['report_language']}** 언어로 생성해야 합니다.
-
----
-
-## 🎯 3-Track 소스 시뮬레이션 (★ 핵심)
-
-실제 Q방법론 연구에서 콘코스를 구성하는 3가지 출처를 시뮬레이션합니다.
-각 Track의 언어적 특성을 반드시 반영하세요.
-
-### Track 1: Naturalistic (심층 인터뷰형) - 80개 (40%)
+# 3-Track 소스 시뮬레이션: (이름, 비율, 프롬프트 블록) - 트랙별로 나눠 병렬 생성
+_Q_POPULATION_TRACKS = [
+    ("Naturalistic", 0.4, """### Track 1: Naturalistic (심층 인터뷰형)
 **출처**: 1:1 인터뷰, FGI(포커스 그룹 인터뷰)에서 나온 '날것의 언어'
 **언어적 특징**:
 - 반드시 **1인칭(나, 저 / I, me)** 주어로 시작
 - 구어체, 감정 표현 포함
-- 개인적 경험과 감정이 녹아있음
-
-### Track 2: Ready-made (문헌/전문가형) - 60개 (30%)
+- 개인적 경험과 감정이 녹아있음"""),
+    ("Ready-made", 0.3, """### Track 2: Ready-made (문헌/전문가형)
 **출처**: 학술 논문, 신문 칼럼, 전문가 기고문, 정책 보고서
 **언어적 특징**:
 - 3인칭 또는 일반화된 표현
 - 논리적, 분석적 어조
-- 구조적/제도적 관점 포함
-
-### Track 3: Realism (커뮤니티/SNS형) - 60개 (30%)
+- 구조적/제도적 관점 포함"""),
+    ("Realism", 0.3, """### Track 3: Realism (커뮤니티/SNS형)
 **출처**: 블라인드, 트위터, 커뮤니티 댓글, 온라인 게시판 (또는 Reddit, Twitter 등)
 **언어적 특징**:
 - 짧고 강렬한 문장
 - 냉소적, 풍자적, 직설적 표현
 - 숨겨진 본심, 불편한 진실
-- 비격식체, 때로는 신조어 사용 가능
+- 비격식체, 때로는 신조어 사용 가능"""),
+]
 
----
+
+# Q-Population 프롬프트 (모듈 로드 시 한 번만 구성)
+# 호출마다 같은 정적 지침(작성 원칙)을 앞에 두어 프로바이더의 프롬프트 접두사 캐시를 재사용할 수 있게 함
+_Q_POPULATION_PROMPT = string.Template("""
+Q방법론 연구를 위한 콘코스(Concourse) 문항을 생성합니다.
 
 ## ✍️ Q문항 작성 원칙 (Writing Principles)
 
@@ -99,19 +63,120 @@ Q방법론 연구를 위한 콘코스(Concourse) 문항을 생성합니다.
 
 ---
 
+## 연구 정보 (★ 이 주제에 집중하여 문항 생성)
+- 연구 주제: ${final_topic}
+- 연구 질문: ${research_question}
+- 대상 집단: ${target_population}
+- 연구 맥락: ${context}
+- 핵심 키워드: ${keywords}
+
+⚠️ **중요**: 위 연구 주제와 직접적으로 관련된 문항만 생성하세요.
+
+${statement_rules}
+반드시 **${report_language}** 언어로 생성해야 합니다.
+
+---
+
+## 🎯 소스 시뮬레이션 (★ 핵심)
+
+실제 Q방법론 연구에서 콘코스를 구성하는 3가지 출처 중 아래 Track의 문항 ${n}개를 생성합니다.
+Track의 언어적 특성을 반드시 반영하세요.
+
+${track_block}
+
+---
+
 ## 📝 출력 형식 (JSON)
-JSON 형식: {{"statements": ["문항1", "문항2", ..., "문항{config.Q_POPULATION_SIZE}"]}}
-"""
-    
-    result = generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.8)
+JSON 형식: {"statements": ["문항1", "문항2", ..., "문항${n}"]}
+""")
+
+
+def _track_counts(total: int) -> list[int]:
+    """트랙 비율대로 문항 수 배분 (반올림 오차는 마지막 트랙이 흡수)"""
+    counts = [round(total * ratio) for _, ratio, _ in _Q_POPULATION_TRACKS[:-1]]
+    counts.append(total - sum(counts))
+    return counts
+
+
+def _extract_statements(result) -> list[str]:
+    """LLM 응답에서 문항 리스트 추출 (statements/items 키 또는 첫 번째 리스트 값)"""
+    if not isinstance(result, dict):
+        return []
     statements = result.get("statements", result.get("items", []))
-    if not statements and isinstance(result, dict):
+    if not statements:
         for v in result.values():
             if isinstance(v, list):
                 statements = v
                 break
+    return [s for s in statements if isinstance(s, str) and s.strip()]
+
+
+def _normalize_statement(statement: str) -> str:
+    """중복 판정용 정규화 (공백 정리 + 소문자)"""
+    return " ".join(statement.split()).lower()
+
+
+def generate_q_population(topic_info: dict) -> list[str]:
+    """
+    연구 주제를 바탕으로 Q-Population (config.Q_POPULATION_SIZE개 문항)을 생성합니다.
+    
+    3-Track(Naturalistic / Ready-made / Realism)별로 프롬프트를 나눠 동시에 생성한 뒤
+    정규화 텍스트 일치 및 문자 3-gram 근접 중복을 제거하고, 부족할 때만 추가 생성을 요청합니다.
+    
+    Args:
+        topic_info: 구조화된 연구 주제 정보
+    
+    Returns:
+        Q-Population 문항 리스트
+    """
+    final_topic = topic_info.get("final_topic", "")
+    research_question = topic_info.get("research_question", "")
+    target_population = topic_info.get("target_population", "")
+    context = topic_info.get("context", "")
+    keywords = topic_info.get("keywords", [])
+    language = topic_info.get("language", "ko")
     
-    # 100개 미만이면 추가 생성
+    cul_ctx = get_cultural_context(language)
+    
+    def _gen_track(track_block: str, n: int) -> list[str]:
+        prompt = _Q_POPULATION_PROMPT.substitute(
+            final_topic=final_topic,
+            research_question=research_question,
+            target_population=target_population,
+            context=context,
+            keywords=', '.join(keywords),
+            statement_rules=cul_ctx['statement_rules'],
+            report_language=cul_ctx['report_language'],
+            track_block=track_block,
+            n=n,
+        )
+        return _extract_statements(generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.8))
+    
+    # 트랙별 프롬프트를 동시에 요청 (총 소요 시간 ≈ 가장 긴 트랙 1회)
+    jobs = [(block, n) for (_, _, block), n in zip(_Q_POPULATION_TRACKS, _track_counts(config.Q_POPULATION_SIZE)) if n > 0]
+    with ContextThreadPoolExecutor(max_workers=max(1, min(len(jobs), config.MAX_PARALLEL_LLM))) as executor:
+        track_results = list(executor.map(lambda job: _gen_track(*job), jobs))
+    
+    statements = []
+    seen = set()
+    
+    def _add(new_stmts):
+        for stmt in new_stmts:
+            key = _normalize_statement(stmt)
+            if key not in seen:
+                seen.add(key)
+                statements.append(stmt)
+    
+    def _drop_near_duplicates():
+        # 문자 3-gram Jaccard 기준 근접 중복 제거 (먼저 생성된 문항 우선 유지)
+        keep = near_duplicate_keep_indices(statements, config.NEAR_DUPLICATE_THRESHOLD)
+        statements[:] = [statements[i] for i in keep]
+    
+    for track_statements in track_results:
+        _add(track_statements)
+    _drop_near_duplicates()
+    
+    # 목표 수 미만이면 추가 생성
     retry_count = 0
     while len(statements) < config.Q_POPULATION_SIZE and retry_count < 5:
         retry_count += 1
@@ -123,14 +188,8 @@ JSON 형식: {{"statements": ["문항1", "문항2", ..., "문항{config.Q_POPULA
 
 JSON 형식: {{"statements": ["추가문항1", ...]}}
 """
-        additional = generate_json(additional_prompt, temperature=0.9)
-        new_stmts = additional.get("statements", additional.get("items", []))
-        if not new_stmts and isinstance(additional, dict):
-            for v in additional.values():
-                if isinstance(v, list):
-                    new_stmts = v
-                    break
-        statements.extend(new_stmts)
+        _add(_extract_statements(generate_json(additional_prompt, temperature=0.9)))
+        _drop_near_duplicates()
     
     return statements[:config.Q_POPULATION_SIZE]
 
@@ -201,9 +260,21 @@ JSON 형식으로 응답해주세요:
     "suggestions": ["개선 제안1", ...]
 }}
 """
-    return generate_json(prompt)
+    # 같은 Q-Set에 대한 평가는 재실행 시 그대로 재사용 (프롬프트 해시 정확 일치)
+    return generate_json(prompt, cache=True)
+
+
+def _q_set_cache_key(topic_info: dict) -> tuple[str, str]:
+    """Q-Set 캐시 키: 언어/인구통계 범위/문항 수는 정확 일치, final_topic은 의미 일치"""
+    scope = json.dumps({
+        "language": topic_info.get("language", "ko"),
+        "demographic_constraints": topic_info.get("demographic_constraints") or {},
+        "sizes": [config.Q_POPULATION_SIZE, config.Q_SET_SIZE],
+    }, ensure_ascii=False, sort_keys=True)
+    return scope, topic_info.get("final_topic", "")
 
 
+@semantic_cache(ns="q_set", key_fn=_q_set_cache_key)
 def construct_q_set(topic_info: dict) -> tuple[list[str], list[str]]:
     """
     Q-Population을 생성하고 Q-Set을 선정하는 전체 프로세스를 수행합니다.
@@ -2,30 +2,33 @@
 Step 4: Q-Sorting Simulation Module (모의 분류)
 각 페르소나가 Q-Set을 강제 분포에 따라 분류하는 과정을 시뮬레이션합니다.
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
+import functools
 import numpy as np
 import pandas as pd
 import concurrent.futures
-from utils.llm_client import generate_json
+from collections import Counter
+from utils.llm_client import generate_json, ContextThreadPoolExecutor
 from modules.validation import flatline_check
 from utils.localization import get_cultural_context
 import config
 
 
-def get_forced_distribution_slots() -> list[int]:
+def get_forced_distribution_slots() -> tuple[int, ...]:
     """
-    강제 분포에 따른 슬롯 리스트를 반환합니다.
+    강제 분포에 따른 슬롯 튜플을 반환합니다. (config.FORCED_DISTRIBUTION별로 한 번만 생성)
     
     Returns:
-        각 슬롯에 배치할 점수 리스트 (예: [-5, -5, -4, -4, -4, ...])
+        각 슬롯에 배치할 점수 튜플 (예: (-5, -5, -4, -4, -4, ...))
     """
+    return _forced_distribution_slots(tuple(sorted(config.FORCED_DISTRIBUTION.items())))
+
+
+@functools.cache
+def _forced_distribution_slots(distribution: tuple[tuple[int, int], ...]) -> tuple[int, ...]:
     slots = []
-    for score, count in sorted(config.FORCED_DISTRIBUTION.items()):
+    for score, count in distribution:
         slots.extend([score] * count)
-    return slots
+    return tuple(slots)
 
 
 def simulate_single_sorting(
@@ -41,8 +44,11 @@ def simulate_single_sorting(
         q_set: Q-Set 문항 리스트
         topic_info: 연구 주제 정보
     
+    LLM에는 점수 대신 문항 번호 순위(가장 동의 → 가장 비동의)만 요청하고,
+    강제 분포 슬롯을 순위에 그대로 배정합니다. (출력 토큰 절감 + 분포 보정 불필요)
+    
     Returns:
-        {문항_인덱스: 점수} 딕셔너리
+        {문항_인덱스: 점수} 딕셔너리 (강제 분포 적용 완료)
     """
     language = topic_info.get("language", "ko")
     cul_ctx = get_cultural_context(language)
@@ -72,29 +78,73 @@ def simulate_single_sorting(
 점수 범위: -5 (가장 비동의) ~ +5 (가장 동의)
 각 점수별 배치 문항 수: {distribution_desc}
 총 {sum(config.FORCED_DISTRIBUTION.values())}개 문항
+순위의 맨 앞 문항부터 +5, +4, ... 순으로 위 개수만큼 점수가 자동 배정됩니다.
 
 ## 분류 지침
 1. 이 페르소나의 성격, 가치관, 태도를 고려하여 각 문항에 대한 동의/비동의 정도를 판단합니다.
-2. 강제 분포 규칙을 정확히 따라야 합니다 (각 점수별 문항 수 준수).
+2. 모든 문항 번호(1~{len(q_set)})를 빠짐없이 한 번씩, 가장 동의하는 문항부터 가장 비동의하는 문항 순으로 나열합니다.
 3. 페르소나의 관점에서 일관성 있게 분류합니다.
 4. 반드시 {cul_ctx['report_language']} 언어로 이유(reasoning)를 작성하세요.
 
 JSON 형식으로 응답해주세요:
 {{
-    "sorting": {{
-        "1": 점수,
-        "2": 점수,
-        ...
-        "{len(q_set)}": 점수
-    }},
+    "ranking": [가장 동의하는 문항 번호, ..., 가장 비동의하는 문항 번호],
     "reasoning": "분류 시 고려한 핵심 요소들 간단 설명"
 }}
 """
     
     result = generate_json(prompt, system_prompt=cul_ctx["system_prompt"], temperature=0.6)
-    sorting = result.get("sorting", {})
+    if "ranking" not in result and "sorting" in result:
+        # 예전 형식(문항별 점수)으로 응답한 경우
+        return _parse_sorting(result["sorting"])
+    return _ranking_to_sorting(result.get("ranking") or [], len(q_set))
+
+
+def _ranking_to_sorting(ranking: list, n_items: int) -> dict[int, int]:
+    """
+    문항 번호 순위(가장 동의 → 가장 비동의)에 강제 분포 슬롯을 배정합니다.
+    범위 밖/중복/숫자가 아닌 항목은 무시하고, 누락된 문항이 몇 개뿐이면 순위 중앙(중립)에 번호 순으로 끼워 넣습니다.
+    
+    Raises:
+        ValueError: 유효 순위가 전체 문항의 RANKING_MIN_COVERAGE 미만인 경우
+            (빈/엉터리 순위를 채워 넣으면 강제 분포 검증을 통과한 가짜 분류가 요인 분석에 들어가므로 재시도하게 함)
+    """
+    order = []
+    seen = set()
+    for item in ranking:
+        try:
+            item_id = int(item)
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if 1 <= item_id <= n_items and item_id not in seen:
+            seen.add(item_id)
+            order.append(item_id)
+    
+    if len(order) < n_items * config.RANKING_MIN_COVERAGE:
+        raise ValueError(f"유효한 순위가 부족합니다 ({len(order)}/{n_items}개)")
+    
+    missing = [j for j in range(1, n_items + 1) if j not in seen]
+    if missing:
+        mid = len(order) // 2
+        order[mid:mid] = missing
+    
+    slots = _target_slots_desc(n_items, tuple(sorted(config.FORCED_DISTRIBUTION.items())))
+    return dict(zip(order, slots.tolist()))
+
+
+def _parse_sorting(sorting: dict) -> dict[int, int]:
+    """
+    LLM 분류 응답을 {문항 번호: 점수}로 변환합니다. (None 값은 0, 점수는 -5~+5로 클립)
+    응답이 모두 정수이면 한 번에 일괄 클립하고, 문자열/실수 등이 섞인 경우에만 문항별 변환으로 처리합니다.
+    """
+    try:
+        keys = [int(k) for k in sorting]
+        values = np.asarray([v if v is not None else 0 for v in sorting.values()])
+        if values.ndim == 1 and values.dtype.kind in "biu":
+            return dict(zip(keys, np.clip(values, -5, 5).astype(np.int64).tolist()))
+    except (ValueError, TypeError, OverflowError):
+        pass
     
-    # 문자열 키를 정수로 변환하고, 값도 정수로 변환 (None 값은 0으로 처리)
     parsed = {}
     for k, v in sorting.items():
         try:
@@ -103,11 +153,11 @@ JSON 형식으로 응답해주세요:
             # 값이 -5~+5 범위 내에 있는지 확인
             value = max(-5, min(5, value))
             parsed[key] = value
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, OverflowError):
             # 변환 실패 시 기본값 0
             try:
                 parsed[int(k)] = 0
-            except:
+            except (ValueError, TypeError):
                 pass
     return parsed
 
@@ -122,17 +172,32 @@ def validate_and_adjust_sorting(sorting: dict[int, int]) -> dict[int, int]:
     Returns:
         조정된 분류 결과 (반드시 강제 분포를 따름)
     """
-    target_dist = config.FORCED_DISTRIBUTION.copy()
     n_items = len(sorting)
+    target_slots_desc = _target_slots_desc(n_items, tuple(sorted(config.FORCED_DISTRIBUTION.items())))
+    if sum(config.FORCED_DISTRIBUTION.values()) != n_items:
+        print(f"⚠️ 슬롯 수({sum(config.FORCED_DISTRIBUTION.values())})와 문항 수({n_items})가 다름, 비율 조정 중...", flush=True)
+    
+    # 원본 점수를 기준으로 문항 정렬 (높은 점수순, 동점은 원래 순서 유지) → 높은 슬롯부터 할당
+    keys = np.fromiter(sorting.keys(), dtype=np.int64, count=n_items)
+    vals = np.fromiter(sorting.values(), dtype=np.int64, count=n_items)
+    order = np.argsort(-vals, kind="stable")
+    
+    return dict(zip(keys[order].tolist(), target_slots_desc.tolist()))
+
+
+@functools.lru_cache(maxsize=32)
+def _target_slots_desc(n_items: int, distribution: tuple[tuple[int, int], ...]) -> np.ndarray:
+    """
+    문항 수에 맞춘 강제 분포 슬롯 (내림차순, 읽기 전용)
+    문항 수가 분포 합계와 다르면 비율대로 조정하고 부족분은 0점, 초과분은 최고점부터 제거합니다.
+    """
+    target_dist = dict(distribution)
     
     # 점수 순서대로 슬롯 생성 (예: [-5, -5, -4, -4, -4, ...])
-    target_slots = []
-    for score in sorted(target_dist.keys()):
-        target_slots.extend([score] * target_dist[score])
+    target_slots = _forced_distribution_slots(distribution)
     
     # 슬롯 수 확인
     if len(target_slots) != n_items:
-        print(f"⚠️ 슬롯 수({len(target_slots)})와 문항 수({n_items})가 다름, 비율 조정 중...", flush=True)
         # 비율에 맞게 슬롯 수 조정
         total = sum(target_dist.values())
         adjusted_slots = []
@@ -146,17 +211,9 @@ def validate_and_adjust_sorting(sorting: dict[int, int]) -> dict[int, int]:
             adjusted_slots.pop()
         target_slots = adjusted_slots
     
-    # 원본 점수를 기준으로 문항 정렬 (높은 점수순)
-    sorted_items = sorted(sorting.items(), key=lambda x: x[1], reverse=True)
-    
-    # 높은 target_slots부터 할당
-    target_slots_sorted = sorted(target_slots, reverse=True)
-    
-    adjusted = {}
-    for (item_idx, _), new_score in zip(sorted_items, target_slots_sorted):
-        adjusted[item_idx] = new_score
-    
-    return adjusted
+    slots = np.array(sorted(target_slots, reverse=True), dtype=np.int64)
+    slots.flags.writeable = False
+    return slots
 
 
 def simulate_all_sortings(
@@ -179,7 +236,8 @@ def simulate_all_sortings(
     print("📊 Q-Sorting 시뮬레이션")
     print("="*60)
     
-    all_sortings_dict = {}
+    # 점수는 -5~+5이므로 int8 행렬을 미리 할당하고 행 단위로 채움 (list-of-lists → dtype 추론 생략)
+    sortings = np.zeros((len(personas), len(q_set)), dtype=np.int8)
     
     def _simulate_q_sorting(i, persona):
         print(f"\n🎯 {persona.get('name', f'페르소나{i+1}')} Q-Sorting 중... ({i+1}/{len(personas)})")
@@ -188,7 +246,14 @@ def simulate_all_sortings(
             # 분류 시뮬레이션 (최대 3회 시도 - flat-lining 검증 포함)
             max_attempts = 3
             for attempt in range(max_attempts):
-                sorting = simulate_single_sorting(persona, q_set, topic_info)
+                try:
+                    sorting = simulate_single_sorting(persona, q_set, topic_info)
+                except ValueError as e:
+                    # 순위 응답이 불완전 → 같은 페르소나로 다시 요청 (마지막 시도면 아래 에러 처리로)
+                    if attempt == max_attempts - 1:
+                        raise
+                    print(f"   ⚠️ {e}, 재시도 {attempt+2}/{max_attempts}")
+                    continue
                 sorting = validate_and_adjust_sorting(sorting)
                 
                 # Flat-lining 검증: 응답이 중립에 많이 몰리는지 검사
@@ -204,7 +269,8 @@ def simulate_all_sortings(
             row = [sorting.get(j+1, 0) for j in range(len(q_set))]
             
             # 분포 확인
-            score_counts = {s: row.count(s) for s in sorted(config.FORCED_DISTRIBUTION.keys())}
+            counts = Counter(row)
+            score_counts = {s: counts[s] for s in sorted(config.FORCED_DISTRIBUTION.keys())}
             print(f"   {persona.get('name', f'페르소나{i+1}')} 분포: {score_counts}")
             
             return i, row
@@ -214,22 +280,20 @@ def simulate_all_sortings(
             row = [safe_sorting.get(j+1, 0) for j in range(len(q_set))]
             return i, row
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=min(10, len(personas))) as executor:
+    with ContextThreadPoolExecutor(max_workers=max(1, min(len(personas), config.MAX_PARALLEL_LLM))) as executor:
         futures = [executor.submit(_simulate_q_sorting, i, persona) for i, persona in enumerate(personas)]
         for future in concurrent.futures.as_completed(futures):
             try:
                 i, row = future.result()
-                all_sortings_dict[i] = row
+                sortings[i] = row
             except Exception as e:
                 print(f"   ❌ 결과 수신 에러: {e}")
-                
-    all_sortings = [all_sortings_dict[i] for i in range(len(personas))]
     
     # DataFrame 생성
     columns = [f"Q{i+1}" for i in range(len(q_set))]
     index = [p.get('name', f'P{i+1}') for i, p in enumerate(personas)]
     
-    df = pd.DataFrame(all_sortings, columns=columns, index=index)
+    df = pd.DataFrame(sortings, columns=columns, index=index, copy=False)
     
     print(f"\n✅ Q-Sorting 완료: {df.shape[0]} 참여자 × {df.shape[1]} 문항")
     
@@ -3,12 +3,11 @@ Realism P-Set Generator
 Enhanced Persona Generation with Psychographics
 핵심 가치관, 불안 요소, 방어 기제 포함
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import concurrent.futures
+from itertools import chain
 
-from utils.llm_client import generate_json, generate_embedding
-from utils.similarity import check_diversity
+from utils.llm_client import generate_json, generate_embeddings_batch, ContextThreadPoolExecutor
+from utils.similarity import similar_partners, normalize_embeddings, update_similarity_rows, similarity_violations
 import config
 
 
@@ -16,16 +15,15 @@ def generate_realism_persona(
     topic_info: dict, 
     group: str,
     persona_index: int, 
-    existing_personas: list[dict] = None
+    existing_summary: str = ""
 ) -> dict:
     """
     Psychographics 변수를 포함한 페르소나 생성
+    
+    Args:
+        existing_summary: 반드시 달라야 할 기존 페르소나 요약 (다양성 재생성 시 유사했던 상대만, 한 줄씩)
     """
-    existing_desc = ""
-    if existing_personas:
-        existing_desc = "기존 페르소나들 (반드시 이들과 다르게 생성):\n"
-        for i, p in enumerate(existing_personas):
-            existing_desc += f"- {p.get('name', f'P{i+1}')}: {p.get('psychographics', {}).get('core_values', [])}\n"
+    existing_desc = f"기존 페르소나들 (반드시 이들과 다르게 생성):\n{existing_summary}\n" if existing_summary else ""
     
     prompt = f"""당신은 '{topic_info.get('final_topic', topic_info.get('topic', ''))}' 연구를 위한 심층 페르소나 전문가입니다.
 
@@ -76,6 +74,18 @@ JSON 형식:
     return result
 
 
+def _persona_embed_text(persona: dict) -> str:
+    """다양성 검증용 임베딩 입력 (Psychographics + 요약 + 내적 갈등)"""
+    psycho = persona.get("psychographics", {})
+    # 중간 문자열 없이 한 번의 join으로 연결
+    return " ".join(chain(
+        psycho.get("core_values", ()),
+        psycho.get("fears", ()),
+        psycho.get("defense_mechanisms", ()),
+        (persona.get("brief_description", ""), persona.get("internal_conflict", ""))
+    ))
+
+
 def generate_realism_personas(
     topic_info: dict,
     group: str,
@@ -86,56 +96,55 @@ def generate_realism_personas(
     """
     다양성 제약을 가진 페르소나 생성
     Cosine Similarity < 0.4 보장
+    
+    1차로 count명을 서로 독립적으로 병렬 생성한 뒤, 임베딩 다양성 검증에서
+    임계값을 넘은 쌍의 한쪽만 (유사했던 상대를 피하도록) 다시 병렬 재생성합니다. (최대 max_retries 라운드)
     """
     print(f"\n[P-SET] === {group} 페르소나 생성 시작 ({count}명) ===", flush=True)
     
-    personas = []
-    embeddings = []
-    
-    for i in range(count):
-        retry_count = 0
-        while retry_count < max_retries:
-            print(f"[P-SET] 페르소나 {i+1}/{count} 생성 중...", flush=True)
-            
-            persona = generate_realism_persona(topic_info, group, i, personas)
-            
-            # 임베딩 생성
-            psycho = persona.get("psychographics", {})
-            embed_text = " ".join([
-                " ".join(psycho.get("core_values", [])),
-                " ".join(psycho.get("fears", [])),
-                " ".join(psycho.get("defense_mechanisms", [])),
-                persona.get("brief_description", ""),
-                persona.get("internal_conflict", "")
-            ])
-            
-            new_embedding = generate_embedding(embed_text)
-            
-            # 다양성 체크
-            if embeddings:
-                is_diverse, violations = check_diversity(
-                    embeddings + [new_embedding], 
-                    similarity_threshold
-                )
-                
-                if not is_diverse and len(violations) > 0:
-                    # 마지막 추가가 문제인지 확인
-                    last_violations = [v for v in violations if i in (v[0], v[1])]
-                    if last_violations:
-                        retry_count += 1
-                        print(f"[P-SET] ⚠️ 유사도 초과, 재생성 ({retry_count}/{max_retries})", flush=True)
-                        continue
-            
-            # 성공
-            personas.append(persona)
-            embeddings.append(new_embedding)
-            print(f"[P-SET] ✅ {persona.get('name', f'P{i+1}')} - {persona.get('brief_description', '')[:30]}...", flush=True)
+    personas = [None] * count
+    
+    def _avoid_summary(i, violations):
+        # 프롬프트에는 전체 목록 대신 i와 유사했던 상대만 요약 (입력 토큰 O(1))
+        return "\n".join(
+            f"- {personas[k].get('name', f'P{k+1}')}: {personas[k].get('psychographics', {}).get('core_values', [])}"
+            for k in similar_partners(violations, i, config.PERSONA_AVOID_LIMIT)
+        )
+    
+    def _run_wave(indices, violations=None):
+        with ContextThreadPoolExecutor(max_workers=max(1, min(len(indices), config.MAX_PARALLEL_LLM))) as executor:
+            future_to_index = {}
+            for i in indices:
+                existing_summary = _avoid_summary(i, violations) if violations else ""
+                future_to_index[executor.submit(generate_realism_persona, topic_info, group, i, existing_summary)] = i
+            for future in concurrent.futures.as_completed(future_to_index):
+                i = future_to_index[future]
+                personas[i] = future.result()
+                print(f"[P-SET] ✅ {personas[i].get('name', f'P{i+1}')} - {personas[i].get('brief_description', '')[:30]}...", flush=True)
+    
+    def _embed(indices):
+        # 이번 라운드에 (재)생성된 페르소나만 한 번의 요청으로 일괄 임베딩
+        return generate_embeddings_batch([_persona_embed_text(personas[i]) for i in indices])
+    
+    # 1차: 기존 페르소나 목록에 의존하지 않으므로 전원 동시 생성
+    # 정규화 임베딩 (count, D)와 유사도 행렬 (count, count)을 유지하고 재생성된 행/열만 갱신
+    _run_wave(range(count))
+    embeddings = normalize_embeddings(_embed(range(count)))
+    similarity = embeddings @ embeddings.T
+    
+    # 다양성 체크: 초과 쌍마다 뒤쪽 페르소나를 재생성
+    for retry in range(max_retries + 1):
+        is_diverse, violations = similarity_violations(similarity, similarity_threshold)
+        if is_diverse:
+            break
+        if retry == max_retries:
+            # max_retries 초과해도 그대로 사용 (경고와 함께)
+            print(f"[P-SET] ⚠️ 다양성 경고: 재시도 한도 초과, {len(violations)}개 쌍 유사도 초과 상태로 진행", flush=True)
             break
-        else:
-            # max_retries 초과해도 추가 (경고와 함께)
-            print(f"[P-SET] ⚠️ 다양성 경고: 재시도 한도 초과, 그대로 추가", flush=True)
-            personas.append(persona)
-            embeddings.append(new_embedding)
+        to_regenerate = sorted({v[1] for v in violations})
+        print(f"[P-SET] ⚠️ 유사도 초과 {len(violations)}개 쌍, {len(to_regenerate)}명 재생성 ({retry+1}/{max_retries})", flush=True)
+        _run_wave(to_regenerate, violations)
+        update_similarity_rows(embeddings, similarity, to_regenerate, _embed(to_regenerate))
     
     print(f"[P-SET] === {group} 페르소나 생성 완료: {len(personas)}명 ===\n", flush=True)
     
@@ -2,19 +2,20 @@
 Realism Q-Set Generator
 Expansion (200+) → Reduction (60) → Blind Shuffle
 """
+import json
 import random
+import string
 from typing import List, Dict, Tuple, Optional
 from utils.llm_client import generate_json
-from utils.similarity import compute_tfidf_matrix, find_most_dissimilar_items
+from utils.similarity import compute_tfidf_matrix, find_most_dissimilar_items, near_duplicate_keep_indices
+from utils.semantic_cache import semantic_cache
+import config
 
 
-def generate_raw_statements(topic: str, group: str, count: int = 200) -> List[Dict]:
-    """
-    Phase 1: Expansion - 생존 본능, 독성 사고, 모순에 초점을 맞춘 200+ 문항 생성
-    """
-    prompt = f"""당신은 '{topic}' 분야에서 '{group}'의 심리를 분석하는 Q방법론 전문가입니다.
+# Expansion 프롬프트 (모듈 로드 시 한 번만 구성)
+_RAW_STATEMENTS_PROMPT = string.Template("""당신은 '${topic}' 분야에서 '${group}'의 심리를 분석하는 Q방법론 전문가입니다.
 
-다음 카테고리별로 총 {count}개의 날것의, 필터링되지 않은 문장을 생성하세요:
+다음 카테고리별로 총 ${count}개의 날것의, 필터링되지 않은 문장을 생성하세요:
 
 1. **Survival (생존 본능)** - 40개: 직업적 생존, 경쟁, 불안정성에 대한 문장
 2. **Toxic Thoughts (독성 사고)** - 40개: 숨기고 싶지만 진짜 느끼는 부정적 생각
@@ -29,30 +30,44 @@ def generate_raw_statements(topic: str, group: str, count: int = 200) -> List[Di
 - 상반되는 문장 쌍 포함 (contradiction_pair 필드로 연결)
 
 JSON 형식:
-{{
+{
   "statements": [
-    {{
+    {
       "id": "S001",
       "text": "나는 마감에 쫓기면 창작이 아니라 생존이라고 느낀다",
       "category": "Survival",
-      "group": "{group}",
+      "group": "${group}",
       "contradiction_pair": null,
       "intensity": "high"
-    }},
-    {{
+    },
+    {
       "id": "S002", 
       "text": "나는 마감 압박이 오히려 창작의 원동력이 된다",
       "category": "Contradictions",
-      "group": "{group}",
+      "group": "${group}",
       "contradiction_pair": "S001",
       "intensity": "high"
-    }}
+    }
   ]
-}}
+}
 
-주제: {topic}
-대상 집단: {group}
-"""
+주제: ${topic}
+대상 집단: ${group}
+""")
+
+
+def _raw_statements_cache_key(topic: str, group: str, count: int = 200) -> Tuple[str, str]:
+    """원시 문항 캐시 키: 집단/문항 수는 정확 일치, 주제는 의미 일치"""
+    scope = json.dumps({"realism_group": group, "count": count}, ensure_ascii=False, sort_keys=True)
+    return scope, topic
+
+
+@semantic_cache(ns="q_set", key_fn=_raw_statements_cache_key)
+def generate_raw_statements(topic: str, group: str, count: int = 200) -> List[Dict]:
+    """
+    Phase 1: Expansion - 생존 본능, 독성 사고, 모순에 초점을 맞춘 200+ 문항 생성
+    """
+    prompt = _RAW_STATEMENTS_PROMPT.substitute(topic=topic, group=group, count=count)
     
     result = generate_json(prompt)
     statements = result.get("statements", [])
@@ -80,8 +95,8 @@ def reduce_to_final_set(
     texts = [s["text"] for s in statements]
     tfidf_matrix = compute_tfidf_matrix(texts)
     
-    # 가장 변별력 있는 문항 선정
-    selected_indices = find_most_dissimilar_items(tfidf_matrix, target_count)
+    # 가장 변별력 있는 문항 선정 (compute_tfidf_matrix 행은 이미 L2 정규화됨)
+    selected_indices = find_most_dissimilar_items(tfidf_matrix, target_count, precomputed=True)
     
     # 상충 쌍 보존 확인
     selected = [statements[i] for i in selected_indices]
@@ -114,23 +129,17 @@ def blind_shuffle(statements: List[Dict]) -> Tuple[List[Dict], Dict[str, str]]:
     # 카테고리 매핑 저장
     category_map = {s["id"]: s.get("category", "Unknown") for s in statements}
     
-    # 깊은 복사 후 카테고리 제거
-    shuffled = []
-    for s in statements:
-        blind_stmt = {
+    # 무작위 순서로 한 번에 뽑으면서 카테고리를 뺀 사본 생성 + 새로운 표시 순서 부여
+    shuffled = [
+        {
             "id": s["id"],
             "text": s["text"],
             "group": s.get("group", "unknown"),
             # category는 제거
+            "display_order": i,
         }
-        shuffled.append(blind_stmt)
-    
-    # 무작위 섞기
-    random.shuffle(shuffled)
-    
-    # 새로운 표시 순서 부여
-    for i, stmt in enumerate(shuffled, 1):
-        stmt["display_order"] = i
+        for i, s in enumerate(random.sample(statements, len(statements)), 1)
+    ]
     
     print(f"[Q-SET] Blind Shuffle 완료: {len(shuffled)}개 문항", flush=True)
     return shuffled, category_map
@@ -174,6 +183,12 @@ def generate_q_set(
     # Phase 1: Expansion
     raw_statements = generate_raw_statements(topic, group, expansion_count)
     
+    # 근접 중복 문항 제거 (Reduction 대상 N을 줄임)
+    keep = near_duplicate_keep_indices([s["text"] for s in raw_statements], config.NEAR_DUPLICATE_THRESHOLD)
+    if len(keep) < len(raw_statements):
+        print(f"[Q-SET] {group}: 근접 중복 문항 {len(raw_statements) - len(keep)}개 제외", flush=True)
+        raw_statements = [raw_statements[i] for i in keep]
+    
     # Phase 2: Reduction
     reduced = reduce_to_final_set(raw_statements, final_count)
     
@@ -2,12 +2,48 @@
 Realism Report Generator
 Radar Chart, Z-Score Heatmap, Action Plan
 """
+import io
+import re
+from functools import lru_cache
 from typing import Dict, List, Optional
 import numpy as np
 from datetime import datetime
 import os
 
 
+# 파일명에 쓸 수 없는 문자 묶음 (\w는 한글 음절 포함, 연속 구간은 "_" 하나로)
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w\uAC00-\uD7A3]+")
+
+# 유형 블록 마크다운 틀 (유형마다 값만 바뀌므로 한 번의 format_map으로 렌더링)
+_TYPE_BLOCK_TMPL = """### {emoji} Type {i}: **{name}**
+
+*{factor} | {polarity} Pole*
+
+> {short_desc}
+
+| 차원 | 분석 |
+|------|------|
+| 🎯 **생존 본능** | {survival} |
+| 🛡️ **방어 기제** | {defense} |
+| 😰 **숨겨진 두려움** | {fear} |
+| 💭 **자기 정당화** | {justification} |
+
+"""
+
+
+@lru_cache(maxsize=64)
+def _render_type_block(emoji, i, name, factor, polarity, short_desc, survival, defense, fear, justification) -> str:
+    """
+    유형 블록 렌더링 (같은 유형을 single/dual 리포트에서 다시 쓰면 캐시에서 재사용)
+    인자는 해시 가능해야 하므로 호출부에서 str()로 넘깁니다.
+    """
+    return _TYPE_BLOCK_TMPL.format_map({
+        "emoji": emoji, "i": i, "name": name, "factor": factor, "polarity": polarity,
+        "short_desc": short_desc, "survival": survival, "defense": defense,
+        "fear": fear, "justification": justification,
+    })
+
+
 def generate_realism_report(
     topic_info: Dict,
     types: List[Dict],
@@ -31,162 +67,155 @@ def generate_realism_report(
     group_a = topic_info.get("group_a", topic_info.get("group", ""))
     group_b = topic_info.get("group_b", "")
     
-    report_lines = []
+    buf = io.StringIO()
     
     # 헤더
-    report_lines.append(f"# 🔍 The Naked Truth of **{topic}**")
-    report_lines.append("")
-    report_lines.append(f"> *\"당신의 창작/관리 DNA를 날것 그대로 분석합니다.\"*")
-    report_lines.append("")
-    report_lines.append(f"**생성일시**: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    report_lines.append(f"**분석 모드**: {'Single Group Deep-Dive' if analysis_mode == 'single' else 'Dual Group Dynamics'}")
-    report_lines.append(f"**대상 집단**: {group_a}" + (f" ↔ {group_b}" if group_b else ""))
-    report_lines.append("")
-    report_lines.append("---")
-    report_lines.append("")
+    buf.write(f"""# 🔍 The Naked Truth of **{topic}**
+
+> *"당신의 창작/관리 DNA를 날것 그대로 분석합니다."*
+
+**생성일시**: {datetime.now().strftime('%Y-%m-%d %H:%M')}
+**분석 모드**: {'Single Group Deep-Dive' if analysis_mode == 'single' else 'Dual Group Dynamics'}
+**대상 집단**: {group_a}{f" ↔ {group_b}" if group_b else ""}
+
+---
+
+""")
     
     # 요약
-    report_lines.append("## 📊 Executive Summary")
-    report_lines.append("")
-    report_lines.append(f"- **총 유형 수**: {len(types)}개 (3 Factors × 2 Poles)")
-    report_lines.append(f"- **Q-Set 문항 수**: {len(q_set)}개")
+    buf.write(f"""## 📊 Executive Summary
+
+- **총 유형 수**: {len(types)}개 (3 Factors × 2 Poles)
+- **Q-Set 문항 수**: {len(q_set)}개
+""")
     
     if analysis_mode == "single" and internal_conflict:
-        report_lines.append(f"- **내부 분화 원인**: {internal_conflict.get('fragmentation_cause', 'N/A')}")
+        buf.write(f"- **내부 분화 원인**: {internal_conflict.get('fragmentation_cause', 'N/A')}\n")
     elif analysis_mode == "dual" and match_matrix:
         best = match_matrix.get("match_matrix", {}).get("best_match", {})
         worst = match_matrix.get("match_matrix", {}).get("worst_match", {})
-        report_lines.append(f"- **최고 시너지**: {best.get('type_a', 'N/A')} ↔ {best.get('type_b', 'N/A')}")
-        report_lines.append(f"- **최악 갈등**: {worst.get('type_a', 'N/A')} ↔ {worst.get('type_b', 'N/A')}")
+        buf.write(f"""- **최고 시너지**: {best.get('type_a', 'N/A')} ↔ {best.get('type_b', 'N/A')}
+- **최악 갈등**: {worst.get('type_a', 'N/A')} ↔ {worst.get('type_b', 'N/A')}
+""")
     
-    report_lines.append("")
-    report_lines.append("---")
-    report_lines.append("")
+    buf.write("""
+---
+
+""")
     
     # 6개 유형 상세
-    report_lines.append("## 🎭 The 6 Realism Types")
-    report_lines.append("")
+    buf.write("## 🎭 The 6 Realism Types\n\n")
     
     for i, t in enumerate(types, 1):
-        polarity_emoji = "⬆️" if t.get("polarity") == "positive" else "⬇️"
-        report_lines.append(f"### {polarity_emoji} Type {i}: **{t.get('type_name', f'Type {i}')}**")
-        report_lines.append("")
-        report_lines.append(f"*{t.get('factor', 'Factor ?')} | {t.get('polarity', '?').upper()} Pole*")
-        report_lines.append("")
-        report_lines.append(f"> {t.get('short_description', '')}")
-        report_lines.append("")
-        
-        report_lines.append("| 차원 | 분석 |")
-        report_lines.append("|------|------|")
-        report_lines.append(f"| 🎯 **생존 본능** | {t.get('survival_instinct', 'N/A')} |")
-        report_lines.append(f"| 🛡️ **방어 기제** | {t.get('defense_mechanism', 'N/A')} |")
-        report_lines.append(f"| 😰 **숨겨진 두려움** | {t.get('hidden_fear', 'N/A')} |")
-        report_lines.append(f"| 💭 **자기 정당화** | {t.get('self_justification', 'N/A')} |")
-        report_lines.append("")
+        buf.write(_render_type_block(
+            "⬆️" if t.get("polarity") == "positive" else "⬇️",
+            i,
+            str(t.get('type_name', f'Type {i}')),
+            str(t.get('factor', 'Factor ?')),
+            t.get('polarity', '?').upper(),
+            str(t.get('short_description', '')),
+            str(t.get('survival_instinct', 'N/A')),
+            str(t.get('defense_mechanism', 'N/A')),
+            str(t.get('hidden_fear', 'N/A')),
+            str(t.get('self_justification', 'N/A')),
+        ))
         
         # 핵심 가치
         core_values = t.get("core_values", [])
         if core_values:
-            report_lines.append(f"**핵심 가치**: {', '.join(core_values)}")
-            report_lines.append("")
+            buf.write(f"**핵심 가치**: {', '.join(core_values)}\n\n")
         
         # 트리거 문구
         triggers = t.get("trigger_phrases", [])
         if triggers:
-            report_lines.append(f"**⚠️ 자극 트리거**: \"{triggers[0]}\"")
-            report_lines.append("")
+            buf.write(f'**⚠️ 자극 트리거**: "{triggers[0]}"\n\n')
         
         # 행동 지침
         action_plan = t.get("action_plan", [])
         if action_plan:
-            report_lines.append("**📋 Action Plan**:")
+            buf.write("**📋 Action Plan**:\n")
             for action in action_plan[:3]:
-                report_lines.append(f"- {action}")
-            report_lines.append("")
+                buf.write(f"- {action}\n")
+            buf.write("\n")
         
-        report_lines.append("---")
-        report_lines.append("")
+        buf.write("---\n\n")
     
     # 모드별 추가 분석
     if analysis_mode == "single" and internal_conflict:
-        report_lines.append("## 🔗 Internal Harmony Analysis")
-        report_lines.append("")
-        report_lines.append(f"### 분화의 근본 원인")
-        report_lines.append(f"{internal_conflict.get('fragmentation_cause', 'N/A')}")
-        report_lines.append("")
-        report_lines.append(f"### 공유된 불안")
-        report_lines.append(f"{internal_conflict.get('shared_anxiety', 'N/A')}")
-        report_lines.append("")
+        buf.write(f"""## 🔗 Internal Harmony Analysis
+
+### 분화의 근본 원인
+{internal_conflict.get('fragmentation_cause', 'N/A')}
+
+### 공유된 불안
+{internal_conflict.get('shared_anxiety', 'N/A')}
+
+""")
         
         # 갈등 쌍
         conflict_pairs = internal_conflict.get("conflict_pairs", [])
         if conflict_pairs:
-            report_lines.append("### 잠재적 갈등 쌍")
-            report_lines.append("")
+            buf.write("### 잠재적 갈등 쌍\n\n")
             for pair in conflict_pairs:
-                report_lines.append(f"- **{pair.get('type_a', '?')}** vs **{pair.get('type_b', '?')}**: {pair.get('conflict_reason', '')}")
-            report_lines.append("")
+                buf.write(f"- **{pair.get('type_a', '?')}** vs **{pair.get('type_b', '?')}**: {pair.get('conflict_reason', '')}\n")
+            buf.write("\n")
         
         # 조화 전략
         strategies = internal_conflict.get("harmony_strategies", [])
         if strategies:
-            report_lines.append("### 🕊️ 내부 조화 전략")
+            buf.write("### 🕊️ 내부 조화 전략\n")
             for s in strategies:
-                report_lines.append(f"1. {s}")
-            report_lines.append("")
+                buf.write(f"1. {s}\n")
+            buf.write("\n")
     
     elif analysis_mode == "dual" and match_matrix:
-        report_lines.append("## ⚡ Match/Mismatch Matrix")
-        report_lines.append("")
-        
         # 최고/최악 매칭
         matrix_data = match_matrix.get("match_matrix", {})
         best = matrix_data.get("best_match", {})
         worst = matrix_data.get("worst_match", {})
         
-        report_lines.append("### 🏆 Best Match (최고 시너지)")
-        report_lines.append(f"**{best.get('type_a', 'N/A')}** ↔ **{best.get('type_b', 'N/A')}** (점수: {best.get('score', 0):.2f})")
-        report_lines.append("")
-        
-        report_lines.append("### 💥 Worst Match (최악 갈등)")
-        report_lines.append(f"**{worst.get('type_a', 'N/A')}** ↔ **{worst.get('type_b', 'N/A')}** (점수: {worst.get('score', 0):.2f})")
-        report_lines.append("")
+        buf.write(f"""## ⚡ Match/Mismatch Matrix
+
+### 🏆 Best Match (최고 시너지)
+**{best.get('type_a', 'N/A')}** ↔ **{best.get('type_b', 'N/A')}** (점수: {best.get('score', 0):.2f})
+
+### 💥 Worst Match (최악 갈등)
+**{worst.get('type_a', 'N/A')}** ↔ **{worst.get('type_b', 'N/A')}** (점수: {worst.get('score', 0):.2f})
+
+""")
         
         # 위험 경고
         warnings = match_matrix.get("risk_warnings", [])
         if warnings:
-            report_lines.append("### ⚠️ Risk Warnings")
+            buf.write("### ⚠️ Risk Warnings\n")
             for w in warnings[:5]:
-                report_lines.append(f"- {w.get('warning_message', '')}")
-            report_lines.append("")
+                buf.write(f"- {w.get('warning_message', '')}\n")
+            buf.write("\n")
         
         # 커뮤니케이션 스크립트
         scripts = match_matrix.get("communication_scripts", {})
         if scripts:
-            report_lines.append("### 💬 Communication Scripts")
-            report_lines.append("")
+            buf.write("### 💬 Communication Scripts\n\n")
             
             best_scripts = scripts.get("best_match_scripts", {})
             if best_scripts:
-                report_lines.append("**시너지 매칭 대화법**:")
-                report_lines.append(f"- 첫 마디: *\"{best_scripts.get('opening_line', '')}\"*")
-                report_lines.append("")
+                buf.write(f"""**시너지 매칭 대화법**:
+- 첫 마디: *"{best_scripts.get('opening_line', '')}"*
+
+""")
             
             worst_scripts = scripts.get("worst_match_scripts", {})
             if worst_scripts:
-                report_lines.append("**갈등 매칭 주의사항**:")
-                report_lines.append(f"- ⚠️ {worst_scripts.get('warning', '')}")
+                buf.write(f"**갈등 매칭 주의사항**:\n- ⚠️ {worst_scripts.get('warning', '')}\n")
                 donts = worst_scripts.get("absolute_donts", [])
                 for d in donts[:2]:
-                    report_lines.append(f"- ❌ {d}")
-                report_lines.append("")
+                    buf.write(f"- ❌ {d}\n")
+                buf.write("\n")
     
     # 푸터
-    report_lines.append("---")
-    report_lines.append("")
-    report_lines.append("*Generated by Realism Q System | Q-Methodology Research Platform*")
+    buf.write("---\n\n*Generated by Realism Q System | Q-Methodology Research Platform*")
     
-    return "\n".join(report_lines)
+    return buf.getvalue()
 
 
 def save_realism_report(
@@ -200,7 +229,7 @@ def save_realism_report(
     os.makedirs(output_dir, exist_ok=True)
     
     topic = topic_info.get("final_topic", topic_info.get("topic", "report"))
-    safe_topic = "".join(c if c.isalnum() or c in "가-힣" else "_" for c in topic)[:30]
+    safe_topic = _UNSAFE_FILENAME_RE.sub("_", topic)[:30]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     filename = f"realism_report_{safe_topic}_{timestamp}.md"
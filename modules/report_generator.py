@@ -2,14 +2,34 @@
 Step 7: Report Generator Module (결과 리포트 생성)
 분석 결과를 마크다운 형식의 리포트로 생성합니다.
 """
-import sys
+import io
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-import json
+import importlib.util
+import orjson
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import config
+from utils import async_writer
+
+
+def _md_cell(value) -> str:
+    """표 셀 문자열 (실수는 tabulate 기본값과 같은 'g' 형식)"""
+    if isinstance(value, (float, np.floating)):
+        return format(value, "g")
+    return str(value)
+
+
+def _df_to_md(df: pd.DataFrame, write) -> None:
+    """
+    DataFrame을 마크다운 표로 한 행씩 write에 흘려 씁니다.
+    (to_markdown처럼 표 전체 문자열을 tabulate로 만들지 않음, 열 너비 정렬은 생략)
+    """
+    numeric = [pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes]
+    write("|  | " + " | ".join(map(str, df.columns)) + " |\n")
+    write("|:---|" + "".join("---:|" if is_num else ":---|" for is_num in numeric) + "\n")
+    for row in df.itertuples(name=None):
+        write("| " + " | ".join(map(_md_cell, row)) + " |\n")
 
 
 def generate_report(
@@ -43,10 +63,10 @@ def generate_report(
     date_text = "Generated at" if is_eng else "생성일시"
     date_format = "%Y-%m-%d %H:%M" if is_eng else "%Y년 %m월 %d일 %H:%M"
     
-    report = []
+    buf = io.StringIO()
     
     # 헤더
-    report.append(f"""# {title_text}
+    buf.write(f"""# {title_text}
 
 **{date_text}**: {datetime.now().strftime(date_format)}
 
@@ -72,7 +92,7 @@ def generate_report(
     
     # Q-Set 문항 목록
     for i, stmt in enumerate(q_set):
-        report.append(f"{i+1}. {stmt}")
+        buf.write(f"\n{i+1}. {stmt}")
     
     sec3_title = f"Participants (P-Set) ({len(personas)} people)" if is_eng else f"참여자 (P-Set) 정보 ({len(personas)}명)"
     lbl_profile = "Profile" if is_eng else "프로필"
@@ -82,7 +102,8 @@ def generate_report(
     age_suffix = "" if is_eng else "세"
     participant_lbl = "Participant" if is_eng else "참여자"
     
-    report.append(f"""
+    buf.write(f"""
+
 
 ---
 
@@ -92,7 +113,8 @@ def generate_report(
     
     # 페르소나 요약
     for i, p in enumerate(personas):
-        report.append(f"""
+        buf.write(f"""
+
 ### {i+1}. {p.get('name', f'{participant_lbl} {i+1}')}
 - **{lbl_profile}**: {p.get('age', '?')}{age_suffix}, {p.get('gender', '?')}, {p.get('occupation', '?')}
 - **{lbl_personality}**: {', '.join(p.get('personality_traits', []))}
@@ -107,7 +129,8 @@ def generate_report(
     tbl_cumulative = "Cumulative Var." if is_eng else "누적 분산"
     sec4_loadings = "Factor Loadings by Participant" if is_eng else "참여자별 요인 적재량"
     
-    report.append(f"""
+    buf.write(f"""
+
 
 ---
 
@@ -120,20 +143,22 @@ def generate_report(
     # 분산 설명력
     variance = factor_result.get('variance', {})
     if variance:
-        report.append(f"| {tbl_factor} | Eigenvalue | {tbl_explained} | {tbl_cumulative} |")
-        report.append("|------|------------|-------------|-----------|")
+        buf.write(f"\n| {tbl_factor} | Eigenvalue | {tbl_explained} | {tbl_cumulative} |")
+        buf.write("\n|------|------------|-------------|-----------|")
         for i in range(factor_result.get('n_factors', 0)):
-            report.append(f"| Factor {i+1} | {variance['ss_loadings'][i]:.2f} | {variance['proportion_var'][i]:.1%} | {variance['cumulative_var'][i]:.1%} |")
+            buf.write(f"\n| Factor {i+1} | {variance['ss_loadings'][i]:.2f} | {variance['proportion_var'][i]:.1%} | {variance['cumulative_var'][i]:.1%} |")
     
     # 요인 적재량 표
     loadings_df = factor_result.get('loadings_df')
     if loadings_df is not None:
-        report.append(f"\n### {sec4_loadings}\n")
-        report.append(loadings_df.to_markdown())
+        buf.write(f"\n\n### {sec4_loadings}\n")
+        buf.write("\n")
+        _df_to_md(loadings_df, buf.write)
     
     sec5_title = f"Derived Type Analysis ({len(types)} types)" if is_eng else f"도출된 유형 분석 ({len(types)}개 유형)"
     
-    report.append(f"""
+    buf.write(f"""
+
 
 ---
 
@@ -148,10 +173,10 @@ def generate_report(
         
         # 핵심 문항
         key_statements = t.get('key_statements', [])
-        statements_text = ""
-        for item in key_statements[:5]:
-            score_sign = "+" if item['z_score'] > 0 else ""
-            statements_text += f"   - {item['statement']} (Z: {score_sign}{item['z_score']:.2f})\n"
+        statements_text = "".join(
+            f"   - {item['statement']} (Z: {'+' if item['z_score'] > 0 else ''}{item['z_score']:.2f})\n"
+            for item in key_statements[:5]
+        )
         
         type_prefix = "Type" if is_eng else "유형"
         attr_text = "Attribute" if is_eng else "속성"
@@ -167,7 +192,8 @@ def generate_report(
         action = "Action Plan" if is_eng else "행동 지침"
         key_stmt = "Key Statements" if is_eng else "핵심 문항"
         
-        report.append(f"""
+        buf.write(f"""
+
 ### {bias_emoji} {type_prefix} {i+1}: {t.get('type_name', f'{type_prefix} {i+1}')}
 
 > **{t.get('short_description', 'N/A')}**
@@ -195,17 +221,18 @@ def generate_report(
         
         # 트리거 표현
         if t.get('trigger_phrases'):
-            report.append(f"#### ⚡ {trigger}")
+            buf.write(f"\n#### ⚡ {trigger}")
             for phrase in t.get('trigger_phrases', []):
-                report.append(f'- "{phrase}"')
+                buf.write(f'\n- "{phrase}"')
         
         # 행동 지침
         if t.get('action_plan'):
-            report.append(f"\n#### 📌 {action}")
+            buf.write(f"\n\n#### 📌 {action}")
             for act in t.get('action_plan', []):
-                report.append(f"1. {act}")
+                buf.write(f"\n1. {act}")
         
-        report.append(f"""
+        buf.write(f"""
+
 
 #### 📊 {key_stmt}
 {statements_text}
@@ -226,7 +253,8 @@ def generate_report(
     count_suffix = "" if is_eng else "개"
     ppl_suffix = " people" if is_eng else "명"
     
-    report.append(f"""
+    buf.write(f"""
+
 
 ## 6. {sec6_title}
 
@@ -238,7 +266,7 @@ def generate_report(
     
     for t in types:
         bias = lbl_pos if t.get("bias") == "positive" else lbl_neg
-        report.append(f"| {t.get('type_name', 'N/A')} | {t.get('factor', 'N/A')} | {bias} | {t.get('short_description', 'N/A')} |")
+        buf.write(f"\n| {t.get('type_name', 'N/A')} | {t.get('factor', 'N/A')} | {bias} | {t.get('short_description', 'N/A')} |")
     
     if is_eng:
         insight_body = f"""Through this Q-methodology study, we explored diverse perspectives on **{topic_info.get('final_topic', 'the research topic')}**.
@@ -261,7 +289,8 @@ Each type reflects a unique subjective viewpoint on the research topic and can b
     
     footer = "*This report was auto-generated by Q-Methodology Research Insight Generator.*" if is_eng else "*이 리포트는 Q-Methodology Research Insight Generator에 의해 자동 생성되었습니다.*"
     
-    report.append(f"""
+    buf.write(f"""
+
 
 ### 🔍 {sec6_insights}
 
@@ -273,7 +302,7 @@ Each type reflects a unique subjective viewpoint on the research topic and can b
 """)
     
     # 파일 저장
-    report_content = "\n".join(report)
+    report_content = buf.getvalue()
     
     if output_path is None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -290,6 +319,13 @@ Each type reflects a unique subjective viewpoint on the research topic and can b
     return output_path
 
 
+def _sorting_matrix_ext() -> str:
+    """SORTING_MATRIX_FORMAT이 parquet이어도 pyarrow가 없으면 CSV로 저장합니다."""
+    if config.SORTING_MATRIX_FORMAT == "parquet" and importlib.util.find_spec("pyarrow") is not None:
+        return "parquet"
+    return "csv"
+
+
 def save_data_artifacts(
     topic_info: dict,
     q_population: list[str],
@@ -310,7 +346,7 @@ def save_data_artifacts(
         output_dir: 저장 디렉토리
     
     Returns:
-        저장된 파일 경로 딕셔너리
+        저장될 파일 경로 딕셔너리 (쓰기는 백그라운드에서 진행, utils.async_writer.flush()로 완료 보장)
     """
     if output_dir is None:
         output_dir = config.OUTPUT_DIR
@@ -318,38 +354,22 @@ def save_data_artifacts(
     os.makedirs(output_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    paths = {}
-    
-    # 연구 주제 정보
-    topic_path = os.path.join(output_dir, f"topic_{timestamp}.json")
-    with open(topic_path, 'w', encoding='utf-8') as f:
-        json.dump(topic_info, f, ensure_ascii=False, indent=2)
-    paths['topic'] = topic_path
-    
-    # Q-Population
-    qpop_path = os.path.join(output_dir, f"q_population_{timestamp}.json")
-    with open(qpop_path, 'w', encoding='utf-8') as f:
-        json.dump(q_population, f, ensure_ascii=False, indent=2)
-    paths['q_population'] = qpop_path
-    
-    # Q-Set
-    qset_path = os.path.join(output_dir, f"q_set_{timestamp}.json")
-    with open(qset_path, 'w', encoding='utf-8') as f:
-        json.dump(q_set, f, ensure_ascii=False, indent=2)
-    paths['q_set'] = qset_path
-    
-    # 페르소나
-    personas_path = os.path.join(output_dir, f"personas_{timestamp}.json")
-    with open(personas_path, 'w', encoding='utf-8') as f:
-        json.dump(personas, f, ensure_ascii=False, indent=2)
-    paths['personas'] = personas_path
-    
-    # Q-Sorting 매트릭스
-    matrix_path = os.path.join(output_dir, f"sorting_matrix_{timestamp}.csv")
-    sorting_matrix.to_csv(matrix_path, encoding='utf-8')
-    paths['sorting_matrix'] = matrix_path
-    
-    print(f"\n📁 데이터 아티팩트 저장 완료: {output_dir}")
+    # JSON 직렬화는 호출 시점에 바로 하고 (이후 원본 변경과 무관), 디스크 쓰기만 백그라운드로 예약
+    prefix = os.path.join(output_dir, "")  # 구분자까지 한 번만 붙이고 파일명은 문자열로 이어 붙임
+    paths = {name: f"{prefix}{name}_{timestamp}.json" for name in ('topic', 'q_population', 'q_set', 'personas')}
+    paths['sorting_matrix'] = f"{prefix}sorting_matrix_{timestamp}.{_sorting_matrix_ext()}"
+    for name, data in (('topic', topic_info), ('q_population', q_population), ('q_set', q_set), ('personas', personas)):
+        async_writer.schedule_write(paths[name], orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    
+    # Q-Sorting 매트릭스 (점수는 -5~+5이므로 int8)
+    # int8 변환은 호출 스레드에서 복사본을 만들어 스냅샷으로 고정하고, 파일 쓰기만 쓰기 스레드에서 수행
+    matrix = sorting_matrix.astype(np.int8)
+    if paths['sorting_matrix'].endswith('.parquet'):
+        async_writer.schedule(matrix.to_parquet, paths['sorting_matrix'], engine='pyarrow', compression='zstd')
+    else:
+        async_writer.schedule(matrix.to_csv, paths['sorting_matrix'], encoding='utf-8')
+    
+    print(f"\n📁 데이터 아티팩트 저장 예약: {output_dir} (async_writer.flush()로 완료 대기)")
     
     return paths
 
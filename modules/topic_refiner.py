@@ -3,15 +3,72 @@ Step 1: Topic Refinement Module (주제 구체화)
 사용자로부터 연구 주제를 입력받고 명확히 구조화합니다.
 """
 from typing import Optional
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.llm_client import generate_text, generate_json
 from utils.localization import get_cultural_context
+from utils.semantic_cache import semantic_cache
 import config
 
 
+# 프롬프트는 "고정 지시문 → 가변 입력" 순서로 구성합니다.
+# 고정 부분이 요청마다 바이트 단위로 동일해야 프로바이더의 프롬프트 접두사(KV) 캐시가 적중합니다.
+_CLARIFY_INSTRUCTIONS = """다음 연구 주제를 더 구체화하기 위한 질문을 생성해주세요.
+
+질문을 생성할 때 다음 측면들을 고려하세요:
+1. 왜 이 연구가 필요한가? (연구의 필요성)
+2. 구체적으로 어떤 대상을 타겟하는가? (연구 대상)
+3. 어떤 맥락/상황에서의 연구인가? (연구 맥락)
+4. 기대하는 결과는 무엇인가? (연구 목표)
+
+JSON 형식으로 응답해주세요:
+{"question": "질문 내용", "aspect": "이 질문이 다루는 측면"}
+"""
+
+_CLARITY_INSTRUCTIONS = """다음 Q방법론 연구 주제의 명확성을 평가해주세요.
+
+다음 기준으로 평가해주세요:
+1. 연구 대상이 명확한가?
+2. 연구 맥락/상황이 구체적인가?
+3. 연구 목적이 분명한가?
+4. Q방법론에 적합한 주제인가? (주관성 탐구에 적합한지)
+
+JSON 형식으로 응답해주세요:
+{
+    "is_clear": true/false (충분히 명확한지),
+    "score": 1-10 (명확성 점수),
+    "missing_aspects": ["부족한 측면1", ...],
+    "refined_topic": "명확화된 주제 (한 문장)"
+}
+"""
+
+_STRUCTURE_INSTRUCTIONS = """아래 연구 주제와 대화 맥락을 바탕으로 Q방법론 연구의 최종 주제를 구조화해주세요.
+
+JSON 형식으로 다음 정보를 포함해주세요:
+{
+    "final_topic": "최종 확정된 연구 주제 (한 문장)",
+    "research_question": "핵심 연구 질문",
+    "target_population": "연구 대상 집단 (텍스트 설명)",
+    "context": "연구 맥락/상황",
+    "expected_outcomes": "기대하는 결과/통찰",
+    "keywords": ["핵심", "키워드", "목록"],
+    "demographic_constraints": {
+        "age_min": 연구 대상의 최소 연령 (숫자, 제약 없으면 null),
+        "age_max": 연구 대상의 최대 연령 (숫자, 제약 없으면 null),
+        "gender": "연구 대상 성별 (남성/여성/null - 제약 없으면 null)",
+        "occupation_types": ["직업군1", "직업군2"] 또는 null (제약 없으면 null),
+        "other_requirements": ["기타 필수조건1", "기타 필수조건2"] 또는 []
+    }
+}
+
+demographic_constraints 작성 시 주의사항:
+- "20대" → age_min: 20, age_max: 29
+- "MZ세대" → age_min: 20, age_max: 44 (1980-2005년생 기준)
+- "직장인" → occupation_types: ["사무직", "전문직", "기술직", "서비스직", "관리직"]
+- "대학생" → occupation_types: ["대학생", "대학원생"]
+- 성별 언급이 없으면 gender: null
+"""
+
+
 def ask_clarifying_question(topic: str, iteration: int, previous_context: str = "") -> dict:
     """
     주제를 명확화하기 위한 후속 질문을 생성합니다.
@@ -23,27 +80,17 @@ def ask_clarifying_question(topic: str, iteration: int, previous_context: str =
     
     Returns:
         {"question": 질문, "aspect": 질문이 다루는 측면}
+        (같은 주제/맥락이면 프롬프트 해시 캐시에서 재사용)
     """
-    prompt = f"""
-다음 연구 주제를 더 구체화하기 위한 질문을 생성해주세요.
-
+    prompt = f"""{_CLARIFY_INSTRUCTIONS}
 현재 연구 주제: {topic}
 
 이전 대화 맥락:
 {previous_context if previous_context else "없음"}
 
 반복 횟수: {iteration}/{config.MAX_TOPIC_REFINEMENT_ITERATIONS}
-
-질문을 생성할 때 다음 측면들을 고려하세요:
-1. 왜 이 연구가 필요한가? (연구의 필요성)
-2. 구체적으로 어떤 대상을 타겟하는가? (연구 대상)
-3. 어떤 맥락/상황에서의 연구인가? (연구 맥락)
-4. 기대하는 결과는 무엇인가? (연구 목표)
-
-JSON 형식으로 응답해주세요:
-{{"question": "질문 내용", "aspect": "이 질문이 다루는 측면"}}
 """
-    return generate_json(prompt)
+    return generate_json(prompt, cache=True)
 
 
 def evaluate_topic_clarity(topic: str, context: str = "") -> dict:
@@ -56,30 +103,15 @@ def evaluate_topic_clarity(topic: str, context: str = "") -> dict:
     
     Returns:
         {"is_clear": bool, "score": 1-10, "missing_aspects": [], "refined_topic": str}
+        (같은 주제/맥락이면 프롬프트 해시 캐시에서 재사용)
     """
-    prompt = f"""
-다음 Q방법론 연구 주제의 명확성을 평가해주세요.
-
+    prompt = f"""{_CLARITY_INSTRUCTIONS}
 연구 주제: {topic}
 
 추가 맥락:
 {context if context else "없음"}
-
-다음 기준으로 평가해주세요:
-1. 연구 대상이 명확한가?
-2. 연구 맥락/상황이 구체적인가?
-3. 연구 목적이 분명한가?
-4. Q방법론에 적합한 주제인가? (주관성 탐구에 적합한지)
-
-JSON 형식으로 응답해주세요:
-{{
-    "is_clear": true/false (충분히 명확한지),
-    "score": 1-10 (명확성 점수),
-    "missing_aspects": ["부족한 측면1", ...],
-    "refined_topic": "명확화된 주제 (한 문장)"
-}}
 """
-    return generate_json(prompt)
+    return generate_json(prompt, cache=True)
 
 
 def structure_final_topic(topic: str, context: str, language: str = 'ko') -> dict:
@@ -88,37 +120,11 @@ def structure_final_topic(topic: str, context: str, language: str = 'ko') -> dic
     """
     cul_ctx = get_cultural_context(language)
     
-    prompt = f"""
-다음 정보를 바탕으로 Q방법론 연구의 최종 주제를 구조화해주세요.
-
+    prompt = f"""{_STRUCTURE_INSTRUCTIONS}
 연구 주제: {topic}
 
 대화 맥락:
 {context}
-
-JSON 형식으로 다음 정보를 포함해주세요:
-{{
-    "final_topic": "최종 확정된 연구 주제 (한 문장)",
-    "research_question": "핵심 연구 질문",
-    "target_population": "연구 대상 집단 (텍스트 설명)",
-    "context": "연구 맥락/상황",
-    "expected_outcomes": "기대하는 결과/통찰",
-    "keywords": ["핵심", "키워드", "목록"],
-    "demographic_constraints": {{
-        "age_min": 연구 대상의 최소 연령 (숫자, 제약 없으면 null),
-        "age_max": 연구 대상의 최대 연령 (숫자, 제약 없으면 null),
-        "gender": "연구 대상 성별 (남성/여성/null - 제약 없으면 null)",
-        "occupation_types": ["직업군1", "직업군2"] 또는 null (제약 없으면 null),
-        "other_requirements": ["기타 필수조건1", "기타 필수조건2"] 또는 []
-    }}
-}}
-
-demographic_constraints 작성 시 주의사항:
-- "20대" → age_min: 20, age_max: 29
-- "MZ세대" → age_min: 20, age_max: 44 (1980-2005년생 기준)
-- "직장인" → occupation_types: ["사무직", "전문직", "기술직", "서비스직", "관리직"]
-- "대학생" → occupation_types: ["대학생", "대학원생"]
-- 성별 언급이 없으면 gender: null
 """
     result = generate_json(prompt, system_prompt=cul_ctx["system_prompt"])
     result['language'] = language
@@ -184,6 +190,7 @@ def refine_topic_interactive() -> dict:
     return final_topic
 
 
+@semantic_cache(ns="refine", key_fn=lambda initial_topic, language='ko': (language, initial_topic))
 def refine_topic_from_string(initial_topic: str, language: str = 'ko') -> dict:
     """
     주어진 주제 문자열로부터 직접 주제를 구조화합니다. (비대화형)
@@ -194,7 +201,7 @@ def refine_topic_from_string(initial_topic: str, language: str = 'ko') -> dict:
     Returns:
         구조화된 연구 주제
     """
-    evaluation = evaluate_topic_clarity(initial_topic)
+    # 비대화형에서는 명확성 평가 결과를 쓰지 않으므로 구조화 호출 한 번만 보냅니다.
     return structure_final_topic(initial_topic, f"초기 주제: {initial_topic}", language)
 
 
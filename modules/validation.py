@@ -2,10 +2,16 @@
 Validation Module for Q-Sorting
 Mirror Test + Flat-lining Check + Self-Check
 """
-from typing import Dict, List, Tuple
+import logging
+from typing import Callable, Dict, List, Tuple
 import numpy as np
-from utils.llm_client import generate_json, generate_embedding
+from utils.llm_client import generate_json, generate_embeddings_batch, ContextThreadPoolExecutor
 from utils.similarity import calculate_cosine_similarity
+import config
+
+# 통과/요약 메시지는 페르소나마다 찍히므로 debug 로그로만 남깁니다. (%-인자라 비활성 시 문자열을 만들지 않음)
+# 실패 메시지는 기존처럼 print로 바로 보여줍니다.
+logger = logging.getLogger(__name__)
 
 
 def mirror_test(
@@ -28,36 +34,54 @@ def mirror_test(
         is_valid: 유효성 여부
         violations: 위반 사항 리스트
     """
-    violations = []
+    contradiction_pairs = list(contradiction_pairs)
+    # 쌍별 점수를 [K, 2] 배열로 한 번에 모은 뒤 비교는 NumPy로 (위반 쌍만 Python에서 리포트 생성)
+    pair_scores = np.array(
+        [(sorting_data.get(id_a, 0), sorting_data.get(id_b, 0)) for id_a, id_b in contradiction_pairs]
+    ).reshape(-1, 2)
+    violations = _mirror_violations(pair_scores, contradiction_pairs.__getitem__, threshold)
+    
+    is_valid = len(violations) == 0
+    
+    if not is_valid:
+        print(f"[VALIDATION] Mirror Test 실패: {len(violations)}개 모순 발견", flush=True)
     
-    for id_a, id_b in contradiction_pairs:
-        score_a = sorting_data.get(id_a, 0)
-        score_b = sorting_data.get(id_b, 0)
-        
+    return is_valid, violations
+
+
+def _mirror_violations(
+    pair_scores: np.ndarray,
+    pair_ids: Callable[[int], Tuple[str, str]],
+    threshold: int
+) -> List[Dict]:
+    """
+    상충 쌍 점수 배열 [K, 2]에서 양쪽 모두 높거나(>=threshold) 낮은(<=-threshold) 쌍의 위반 리포트 생성
+    (mirror_test / validate_sorting_array 공용, pair_ids(k)는 k번째 쌍의 문항 ID)
+    """
+    both_high = (pair_scores >= threshold).all(axis=1)
+    both_low = (pair_scores <= -threshold).all(axis=1)
+    
+    violations = []
+    for k in np.flatnonzero(both_high | both_low):
+        id_a, id_b = pair_ids(k)
+        score_a, score_b = pair_scores[k].tolist()
         # 둘 다 높은 점수(>=threshold)면 모순
-        if score_a >= threshold and score_b >= threshold:
+        if both_high[k]:
             violations.append({
                 "type": "both_high",
                 "pair": (id_a, id_b),
                 "scores": (score_a, score_b),
                 "message": f"상충 문항 {id_a}({score_a})와 {id_b}({score_b}) 모두 높은 동의"
             })
-        
         # 둘 다 낮은 점수(<=-threshold)도 모순일 수 있음
-        if score_a <= -threshold and score_b <= -threshold:
+        if both_low[k]:
             violations.append({
                 "type": "both_low",
                 "pair": (id_a, id_b),
                 "scores": (score_a, score_b),
                 "message": f"상충 문항 {id_a}({score_a})와 {id_b}({score_b}) 모두 강한 비동의"
             })
-    
-    is_valid = len(violations) == 0
-    
-    if not is_valid:
-        print(f"[VALIDATION] Mirror Test 실패: {len(violations)}개 모순 발견", flush=True)
-    
-    return is_valid, violations
+    return violations
 
 
 def flatline_check(
@@ -77,29 +101,24 @@ def flatline_check(
         is_valid: 유효성 여부
         stats: 통계 정보
     """
-    scores = list(sorting_data.values())
-    
-    if len(scores) == 0:
+    scores = np.fromiter(sorting_data.values(), dtype=np.float64, count=len(sorting_data))
+    return _flatline_stats(scores, min_std, neutral_threshold)
+
+
+def _flatline_stats(scores: np.ndarray, min_std: float, neutral_threshold: int) -> Tuple[bool, Dict]:
+    """점수 배열 한 번의 NumPy 연산으로 Flat-line 통계 계산 (flatline_check / validate_sorting_array 공용)"""
+    if scores.size == 0:
         return False, {"error": "No scores provided"}
     
-    scores_array = np.array(scores)
-    std = np.std(scores_array)
-    mean = np.mean(scores_array)
-    
-    # 중립 범위 내 점수 비율
-    neutral_count = sum(1 for s in scores if abs(s) <= neutral_threshold)
-    neutral_ratio = neutral_count / len(scores)
-    
-    # 극단값 비율
-    extreme_count = sum(1 for s in scores if abs(s) >= 4)
-    extreme_ratio = extreme_count / len(scores)
-    
+    abs_scores = np.abs(scores)
+    std = float(np.std(scores))
     stats = {
-        "std": float(std),
-        "mean": float(mean),
-        "neutral_ratio": float(neutral_ratio),
-        "extreme_ratio": float(extreme_ratio),
-        "total_items": len(scores)
+        "std": std,
+        "mean": float(np.mean(scores)),
+        # 중립 범위 내 점수 비율 / 극단값 비율
+        "neutral_ratio": float(np.count_nonzero(abs_scores <= neutral_threshold) / scores.size),
+        "extreme_ratio": float(np.count_nonzero(abs_scores >= 4) / scores.size),
+        "total_items": int(scores.size)
     }
     
     # 표준편차가 너무 낮으면 플랫라인
@@ -144,8 +163,69 @@ def validate_sorting(
         }
     }
     
-    status = "✅ 통과" if is_valid else "❌ 실패"
-    print(f"[VALIDATION] 전체 검증 {status}", flush=True)
+    logger.debug("[VALIDATION] 전체 검증 %s", "✅ 통과" if is_valid else "❌ 실패")
+    
+    return is_valid, report
+
+
+def resolve_pair_indices(q_ids: List[str], contradiction_pairs: List[Tuple[str, str]]) -> np.ndarray:
+    """
+    상충 문항 쌍을 Q-Set 내 위치 인덱스 배열로 한 번만 변환합니다.
+    Q-Set에 없는 문항이 포함된 쌍은 (점수 0으로 간주되어 위반이 될 수 없으므로) 제외합니다.
+    
+    Returns:
+        int32 [K, 2] 인덱스 배열
+    """
+    position = {q_id: j for j, q_id in enumerate(q_ids)}
+    pairs = [(position[a], position[b]) for a, b in contradiction_pairs if a in position and b in position]
+    return np.array(pairs, dtype=np.int32).reshape(-1, 2)
+
+
+def validate_sorting_array(
+    scores: np.ndarray,
+    pair_idx: np.ndarray,
+    q_ids: List[str],
+    mirror_threshold: int = 3,
+    min_std: float = 1.5,
+    neutral_threshold: int = 2
+) -> Tuple[bool, Dict]:
+    """
+    validate_sorting의 배열 버전 (딕셔너리 생성 없이 인덱스로 직접 조회)
+    
+    Args:
+        scores: Q-Set 순서의 점수 배열
+        pair_idx: resolve_pair_indices()로 만든 상충 쌍 인덱스 배열
+        q_ids: Q-Set 순서의 문항 ID (위반 리포트용)
+    
+    Returns:
+        is_valid: 전체 유효성
+        report: validate_sorting과 동일한 형식의 리포트
+    """
+    scores = np.asarray(scores)
+    pair_scores = scores[pair_idx]  # [K, 2]
+    violations = _mirror_violations(
+        pair_scores, lambda k: (q_ids[pair_idx[k, 0]], q_ids[pair_idx[k, 1]]), mirror_threshold
+    )
+    mirror_valid = len(violations) == 0
+    if not mirror_valid:
+        print(f"[VALIDATION] Mirror Test 실패: {len(violations)}개 모순 발견", flush=True)
+    
+    flatline_valid, flatline_stats = _flatline_stats(scores, min_std, neutral_threshold)
+    
+    is_valid = mirror_valid and flatline_valid
+    report = {
+        "is_valid": is_valid,
+        "mirror_test": {
+            "passed": mirror_valid,
+            "violations": violations
+        },
+        "flatline_check": {
+            "passed": flatline_valid,
+            "stats": flatline_stats
+        }
+    }
+    
+    logger.debug("[VALIDATION] 전체 검증 %s", "✅ 통과" if is_valid else "❌ 실패")
     
     return is_valid, report
 
@@ -212,11 +292,9 @@ def self_check_sorting(
         is_valid: 일관성 충족 여부
         report: 검증 상세 리포트
     """
-    # +5 문항 추출
-    top_items = []
-    for q in q_set:
-        if sorting_data.get(q["id"], 0) >= 4:
-            top_items.append(q["text"])
+    # +5 문항 추출 (상위 점수 ID를 먼저 집합으로 모아 Q-Set 순서대로 한 번에 필터)
+    top_ids = {q_id for q_id, score in sorting_data.items() if score >= 4}
+    top_items = [q["text"] for q in q_set if q["id"] in top_ids]
     
     if not top_items:
         return True, {"skip": "No +4/+5 items found"}
@@ -240,17 +318,18 @@ Q-Sorting에서 다음 문항들에 +4 또는 +5를 주었습니다:
 
 왜 이 문항들을 가장 높게 평가했는지 1인칭으로 설명해주세요.
 (2-3문장으로 간결하게)
+
+JSON 형식: {{"reasoning": "설명"}}
 """
     
-    reasoning_result = generate_json(f'{{"instruction": "{prompt}", "response_format": {{"reasoning": "설명"}}}}')
+    reasoning_result = generate_json(prompt)
     reasoning_text = reasoning_result.get("reasoning", "")
     
     if not reasoning_text:
         return True, {"skip": "No reasoning generated"}
     
     # 임베딩 비교
-    profile_embedding = generate_embedding(profile_text)
-    reasoning_embedding = generate_embedding(reasoning_text)
+    profile_embedding, reasoning_embedding = generate_embeddings_batch([profile_text, reasoning_text])
     
     similarity = calculate_cosine_similarity(profile_embedding, reasoning_embedding)
     
@@ -267,11 +346,36 @@ Q-Sorting에서 다음 문항들에 +4 또는 +5를 주었습니다:
     if not is_valid:
         print(f"[VALIDATION] Self-Check 실패: {persona.get('name', 'Unknown')} (유사도: {similarity:.2f} < {similarity_threshold})", flush=True)
     else:
-        print(f"[VALIDATION] Self-Check 통과: {persona.get('name', 'Unknown')} (유사도: {similarity:.2f})", flush=True)
+        logger.debug("[VALIDATION] Self-Check 통과: %s (유사도: %.2f)", report["persona_name"], similarity)
     
     return is_valid, report
 
 
+def self_check_sorting_batch(
+    personas: List[Dict],
+    sortings: List[Dict[str, int]],
+    q_set: List[Dict],
+    similarity_threshold: float = 0.6
+) -> List[Tuple[bool, Dict]]:
+    """
+    여러 페르소나의 Self-Check를 병렬로 수행합니다. (페르소나별 LLM + 임베딩 호출이 서로 독립)
+    
+    Args:
+        personas: 페르소나 리스트
+        sortings: personas와 같은 순서의 문항 ID → 점수 딕셔너리 리스트
+    
+    Returns:
+        personas 순서의 (is_valid, report) 리스트
+    """
+    if not personas:
+        return []
+    with ContextThreadPoolExecutor(max_workers=max(1, min(len(personas), config.MAX_PARALLEL_LLM))) as executor:
+        return list(executor.map(
+            lambda args: self_check_sorting(args[0], args[1], q_set, similarity_threshold),
+            zip(personas, sortings)
+        ))
+
+
 if __name__ == "__main__":
     # 테스트
     test_sorting = {"A": 5, "B": 4, "C": -5, "D": -4, "E": 3, "F": -3}
@@ -4,6 +4,7 @@ class QMethodApp {
     constructor() {
         this.sessionId = null;
         this.pollInterval = null;
+        this.eventSource = null;
         this.startTime = null;
         this.timerInterval = null;
         this.consecutiveErrors = 0;
@@ -240,7 +241,7 @@ class QMethodApp {
             this.sessionId = data.session_id;
             this.startTime = Date.now();
             this.showSection('progress');
-            this.startPolling();
+            this.startStreaming();
             this.startTimer();
 
         } catch (error) {
@@ -248,11 +249,37 @@ class QMethodApp {
         }
     }
 
+    startStreaming() {
+        // SSE 미지원 브라우저는 폴링으로 대체
+        if (!window.EventSource) {
+            this.startPolling();
+            return;
+        }
+
+        this.eventSource = new EventSource(`/api/stream/${this.sessionId}`);
+        this.eventSource.onmessage = (event) => {
+            this.consecutiveErrors = 0;
+            this.handleStatus(JSON.parse(event.data));
+        };
+        this.eventSource.onerror = () => {
+            // 스트림이 끊기면 폴링으로 전환
+            if (this.eventSource) {
+                this.eventSource.close();
+                this.eventSource = null;
+                this.startPolling();
+            }
+        };
+    }
+
     startPolling() {
         this.pollInterval = setInterval(() => this.checkStatus(), 2000);
     }
 
     stopPolling() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
         if (this.pollInterval) {
             clearInterval(this.pollInterval);
             this.pollInterval = null;
@@ -293,15 +320,7 @@ class QMethodApp {
             // 성공 시 에러 카운터 초기화
             this.consecutiveErrors = 0;
 
-            this.updateProgress(data);
-
-            if (data.status === 'completed') {
-                this.stopPolling();
-                this.showResult(data.result);
-            } else if (data.status === 'error') {
-                this.stopPolling();
-                this.showError(data.error || this.translations[this.currentLang]['error_response']);
-            }
+            this.handleStatus(data);
 
         } catch (error) {
             this.consecutiveErrors++;
@@ -314,6 +333,18 @@ class QMethodApp {
         }
     }
 
+    handleStatus(data) {
+        this.updateProgress(data);
+
+        if (data.status === 'completed') {
+            this.stopPolling();
+            this.showResult(data.result);
+        } else if (data.status === 'error') {
+            this.stopPolling();
+            this.showError(data.error || this.translations[this.currentLang]['error_response']);
+        }
+    }
+
     updateProgress(data) {
         // Update progress bar
         this.progressFill.style.width = `${data.progress}%`;
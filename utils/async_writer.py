@@ -0,0 +1,56 @@
+"""
+Background artifact writer
+산출물 파일 쓰기를 백그라운드 스레드로 넘겨 다음 파이프라인 단계(리포트 생성 등)와 겹쳐 실행합니다.
+"""
+import concurrent.futures
+import threading
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending: list[concurrent.futures.Future] = []
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="artifact-writer")
+        return _executor
+
+
+def schedule(fn, *args, **kwargs) -> concurrent.futures.Future:
+    """임의의 쓰기 작업(예: DataFrame.to_csv)을 백그라운드로 예약합니다."""
+    future = _get_executor().submit(fn, *args, **kwargs)
+    with _executor_lock:
+        _pending.append(future)
+    return future
+
+
+def _write(path: str, data, encoding: str) -> None:
+    if isinstance(data, bytes):
+        with open(path, "wb") as f:
+            f.write(data)
+    else:
+        with open(path, "w", encoding=encoding) as f:
+            f.write(data)
+
+
+def schedule_write(path: str, data, encoding: str = "utf-8") -> concurrent.futures.Future:
+    """이미 직렬화된 문자열/바이트를 path에 쓰는 작업을 예약합니다."""
+    return schedule(_write, path, data, encoding)
+
+
+def flush() -> None:
+    """예약된 쓰기가 모두 끝날 때까지 기다립니다. (실패한 쓰기가 있으면 첫 예외를 다시 발생)"""
+    with _executor_lock:
+        pending = list(_pending)
+        _pending.clear()
+    errors = []
+    for future in pending:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"[WRITER] 파일 저장 실패: {e}", flush=True)
+            errors.append(e)
+    if errors:
+        raise errors[0]
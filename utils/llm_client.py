@@ -2,14 +2,196 @@
 LLM API Wrapper for Q-Methodology application
 Supports both OpenAI and Google Gemini APIs
 """
+import concurrent.futures
+import contextlib
+import contextvars
+import hashlib
 import json
+import logging
+import random
+import re
+import threading
 import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional
+import orjson
 import config
+from utils import semantic_cache
+
+# 호출마다 찍히는 진행 메시지는 debug, 재시도/대체 경고는 warning (%-인자라 비활성 레벨은 문자열을 만들지 않음)
+logger = logging.getLogger(__name__)
+
+
+# ============== 세션 단위 클라이언트 ==============
+class LLMSession:
+    """한 분석 세션이 사용할 프로바이더/API 키와 한 번만 초기화되는 SDK 클라이언트"""
+    
+    def __init__(self, provider: str, api_key: str):
+        self.provider = provider
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """SDK 클라이언트 (최초 접근 시 생성 후 세션 내내 재사용)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if self.provider == "openai":
+                        import httpx
+                        from openai import DefaultHttpxClient, OpenAI
+                        # 동시 요청 상한만큼 keep-alive 연결을 유지해 병렬 호출이 TLS 핸드셰이크를 반복하지 않도록 함
+                        http_client = DefaultHttpxClient(limits=httpx.Limits(
+                            max_connections=config.LLM_MAX_CONCURRENCY * 2,
+                            max_keepalive_connections=config.LLM_MAX_CONCURRENCY,
+                        ))
+                        self._client = OpenAI(api_key=self.api_key, http_client=http_client)
+                    else:
+                        from google import genai
+                        self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+
+def create_llm_session(api_key: str = "") -> LLMSession:
+    """
+    API 키 형식으로 프로바이더를 한 번 판별해 세션 클라이언트를 만듭니다.
+    키가 없으면 서버 설정(config)의 프로바이더와 키를 사용합니다.
+    """
+    if api_key.startswith("AIza"):
+        return LLMSession("gemini", api_key)
+    if api_key.startswith("sk-"):
+        return LLMSession("openai", api_key)
+    if api_key:
+        raise ValueError("지원하지 않는 API Key 형식입니다. (OpenAI: sk-..., Gemini: AIza...)")
+    provider = get_provider()
+    return _shared_session(provider)
+
+
+# 서버 설정 키용 세션은 프로세스 전체에서 하나만 만들어 SDK의 커넥션 풀(keep-alive)을 재사용
+_shared_sessions: dict[str, LLMSession] = {}
+_shared_sessions_lock = threading.Lock()
+
+
+def _shared_session(provider: str) -> LLMSession:
+    """config의 API 키로 만든 프로바이더별 공유 세션 (키가 바뀌면 새로 생성)"""
+    api_key = config.GOOGLE_API_KEY if provider == "gemini" else config.OPENAI_API_KEY
+    llm_session = _shared_sessions.get(provider)
+    if llm_session is None or llm_session.api_key != api_key:
+        with _shared_sessions_lock:
+            llm_session = _shared_sessions.get(provider)
+            if llm_session is None or llm_session.api_key != api_key:
+                llm_session = _shared_sessions[provider] = LLMSession(provider, api_key)
+    return llm_session
+
+
+_current_session: contextvars.ContextVar[Optional[LLMSession]] = contextvars.ContextVar("llm_session", default=None)
+
+
+@contextlib.contextmanager
+def use_llm_session(llm_session: LLMSession):
+    """블록 안의 모든 LLM 호출이 주어진 세션 클라이언트를 사용하도록 합니다."""
+    token = _current_session.set(llm_session)
+    try:
+        yield llm_session
+    finally:
+        _current_session.reset(token)
+
+
+class ContextThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    """제출 시점의 contextvars(세션 클라이언트 포함)를 작업 스레드로 전달하는 스레드 풀"""
+    
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# ============== 동시 요청 수 / 분당 요청 수 제한 ==============
+class _TokenBucket:
+    """분당 요청 수(RPM) 토큰 버킷 (rpm <= 0이면 제한 없음)"""
+    
+    def __init__(self, rpm: int):
+        self.rpm = rpm
+        self._tokens = float(rpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """토큰 1개를 얻을 때까지 대기 (대기는 락 밖에서 하므로 다른 스레드를 막지 않음)"""
+        if self.rpm <= 0:
+            return
+        rate = self.rpm / 60.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(float(self.rpm), self._tokens + (now - self._updated) * rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+            time.sleep(wait)
+
+
+_llm_slots = threading.BoundedSemaphore(config.LLM_MAX_CONCURRENCY)
+_rpm_limiter = _TokenBucket(config.LLM_RPM_LIMIT)
+
+
+def configure_concurrency(max_concurrency: Optional[int] = None, rpm: Optional[int] = None) -> None:
+    """
+    프로세스 전체 LLM 동시 요청 수와 분당 요청 수를 바꿉니다. (프로바이더 쿼터에 맞춰 조정)
+    이미 진행 중인 요청은 이전 제한으로 끝까지 실행됩니다.
+    """
+    global _llm_slots, _rpm_limiter
+    if max_concurrency is not None:
+        _llm_slots = threading.BoundedSemaphore(max(1, max_concurrency))
+    if rpm is not None:
+        _rpm_limiter = _TokenBucket(rpm)
+
+
+@contextlib.contextmanager
+def _provider_call():
+    """프로바이더 API 요청 1회를 동시 요청 슬롯 + RPM 토큰 안에서 실행"""
+    slots = _llm_slots
+    with slots:
+        _rpm_limiter.acquire()
+        yield
+
+
+# 재시도해도 되는 HTTP 상태 (요청 시간 초과 / 충돌 / 레이트 리밋, 그 외 5xx)
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def _is_retryable(e: Exception) -> bool:
+    """
+    재시도할 가치가 있는 오류인지 판별합니다.
+    상태 코드가 있으면 (OpenAI: status_code, google-genai: code) 429/5xx 등만 재시도하고 인증/잘못된 요청 등 4xx는 바로 실패.
+    상태 코드가 없는 오류 (연결 끊김, 타임아웃, 빈 응답 등)는 재시도합니다.
+    """
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(e, "code", None)
+    if isinstance(status, int):
+        return status in _RETRYABLE_STATUS or status >= 500
+    return True
+
+
+def _backoff(attempt: int) -> None:
+    """지수 백오프 + ±25% 지터 (여러 작업 스레드가 같은 순간에 재시도하지 않도록)"""
+    time.sleep((2 ** attempt) * (0.75 + random.random() * 0.5))
+
+def _chunked(items: list, size: int):
+    """items를 최대 size개씩 순서대로 나눕니다. (배치 API의 요청당 입력 개수 제한용)"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 # Provider detection
 def get_provider() -> str:
     """현재 사용할 LLM 프로바이더를 결정합니다."""
+    llm_session = _current_session.get()
+    if llm_session is not None:
+        return llm_session.provider
     if config.LLM_PROVIDER == "openai":
         return "openai"
     elif config.LLM_PROVIDER == "gemini":
@@ -26,10 +208,12 @@ def get_provider() -> str:
 # ============== OpenAI ==============
 def get_openai_client():
     """OpenAI 클라이언트 인스턴스를 반환합니다."""
-    from openai import OpenAI
+    llm_session = _current_session.get()
+    if llm_session is not None and llm_session.provider == "openai":
+        return llm_session.client
     if not config.OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY 환경변수가 설정되지 않았습니다.")
-    return OpenAI(api_key=config.OPENAI_API_KEY)
+    return _shared_session("openai").client
 
 
 def generate_text_openai(prompt: str, system_prompt: str, temperature: float, max_retries: int) -> str:
@@ -37,125 +221,173 @@ def generate_text_openai(prompt: str, system_prompt: str, temperature: float, ma
     
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model=config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-            )
+            with _provider_call():
+                response = client.chat.completions.create(
+                    model=config.OPENAI_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=temperature,
+                )
             return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"[OpenAI] 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            logger.warning("[OpenAI] 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1 and _is_retryable(e):
+                _backoff(attempt)
                 continue
             raise RuntimeError(f"OpenAI API 호출 실패: {e}")
 
 
-def generate_json_openai(prompt: str, system_prompt: str, temperature: float, max_retries: int) -> dict:
+def generate_json_openai(
+    prompt: str,
+    system_prompt: str,
+    temperature: float,
+    max_retries: int,
+    max_output_tokens: Optional[int] = None,
+    timeout: float = config.LLM_TIMEOUT_SECONDS
+) -> dict:
     client = get_openai_client()
+    limits = {"max_tokens": max_output_tokens} if max_output_tokens else {}
     
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model=config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                response_format={"type": "json_object"}
-            )
+            with _provider_call():
+                response = client.chat.completions.create(
+                    model=config.OPENAI_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=temperature,
+                    response_format={"type": "json_object"},
+                    timeout=timeout,
+                    **limits
+                )
+            if response.choices[0].finish_reason == "length":
+                logger.warning("[OpenAI] 응답이 max_output_tokens(%s)에서 잘림", max_output_tokens)
             content = response.choices[0].message.content.strip()
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            print(f"[OpenAI] JSON 파싱 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
+            return orjson.loads(content)
+        except json.JSONDecodeError as e:  # orjson.JSONDecodeError 포함 (하위 클래스)
+            logger.warning("[OpenAI] JSON 파싱 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            # json_object 모드에서 파싱 실패는 잘림 등 재요청으로 고쳐지지 않는 경우라 엄격 모드에서는 바로 실패
+            parse_attempts = 1 if config.LLM_STRICT_JSON else config.LLM_JSON_PARSE_RETRIES
+            if attempt < min(max_retries, parse_attempts) - 1:
                 continue
             raise RuntimeError(f"JSON 파싱 실패: {e}")
         except Exception as e:
-            print(f"[OpenAI] API 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            logger.warning("[OpenAI] API 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1 and _is_retryable(e):
+                _backoff(attempt)
                 continue
             raise RuntimeError(f"OpenAI API 호출 실패: {e}")
 
 
 def generate_embedding_openai(text: str) -> list[float]:
     client = get_openai_client()
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
+    with _provider_call():
+        response = client.embeddings.create(
+            model="text-embedding-3-small",
+            input=text
+        )
     return response.data[0].embedding
 
 
+def generate_embeddings_batch_openai(texts: list[str]) -> list[list[float]]:
+    """여러 텍스트를 요청당 최대 EMBEDDING_BATCH_LIMITS["openai"]개씩 임베딩 (응답 순서는 index 기준으로 정렬)"""
+    client = get_openai_client()
+    embeddings = []
+    for chunk in _chunked(texts, config.EMBEDDING_BATCH_LIMITS["openai"]):
+        with _provider_call():
+            response = client.embeddings.create(
+                model="text-embedding-3-small",
+                input=chunk
+            )
+        embeddings.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+    return embeddings
+
+
 # ============== Google Gemini (New google-genai SDK) ==============
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)  # ```json ... ``` 코드 블록 본문
+
+
 def get_gemini_client():
     """Gemini 클라이언트를 초기화합니다. (google-genai SDK)"""
-    from google import genai
+    llm_session = _current_session.get()
+    if llm_session is not None and llm_session.provider == "gemini":
+        return llm_session.client
     if not config.GOOGLE_API_KEY:
         raise ValueError("GOOGLE_API_KEY 환경변수가 설정되지 않았습니다.")
-    return genai.Client(api_key=config.GOOGLE_API_KEY)
+    return _shared_session("gemini").client
 
 
+# 요청 설정 객체는 (시스템 프롬프트, 온도, ...)가 같으면 그대로 재사용 (pydantic 검증을 호출마다 반복하지 않음)
+# 대부분의 호출이 기본 시스템 프롬프트를 공유하므로 적중률이 높습니다. SDK가 설정 객체를 변경하지 않으므로 스레드 간 공유 가능.
+@lru_cache(maxsize=32)
+def _gemini_text_config(system_prompt: str, temperature: float):
+    from google.genai import types
+    return types.GenerateContentConfig(
+        temperature=temperature,
+        system_instruction=system_prompt
+    )
+
+
+@lru_cache(maxsize=32)
+def _gemini_json_config(system_prompt: str, temperature: float, max_output_tokens: Optional[int], timeout: float):
+    from google.genai import types
+    return types.GenerateContentConfig(
+        temperature=temperature,
+        system_instruction=system_prompt + "\n\n반드시 유효한 JSON 형식으로만 응답하세요. 다른 텍스트 없이 JSON만 출력하세요.",
+        response_mime_type="application/json",
+        max_output_tokens=max_output_tokens,
+        http_options=types.HttpOptions(timeout=int(timeout * 1000))  # 밀리초 단위
+    )
+
 def generate_text_gemini(prompt: str, system_prompt: str, temperature: float, max_retries: int) -> str:
     client = get_gemini_client()
-    from google.genai import types
     
     for attempt in range(max_retries):
         try:
-            response = client.models.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=temperature,
-                    system_instruction=system_prompt
+            with _provider_call():
+                response = client.models.generate_content(
+                    model=config.GEMINI_MODEL,
+                    contents=prompt,
+                    config=_gemini_text_config(system_prompt, temperature)
                 )
-            )
             return response.text.strip()
         except Exception as e:
-            print(f"[Gemini] 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            logger.warning("[Gemini] 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1 and _is_retryable(e):
+                _backoff(attempt)
                 continue
             raise RuntimeError(f"Gemini API 호출 실패: {e}")
 
 
-def generate_json_gemini(prompt: str, system_prompt: str, temperature: float, max_retries: int) -> dict:
+def generate_json_gemini(
+    prompt: str,
+    system_prompt: str,
+    temperature: float,
+    max_retries: int,
+    max_output_tokens: Optional[int] = None,
+    timeout: float = config.LLM_TIMEOUT_SECONDS
+) -> dict:
     client = get_gemini_client()
-    from google.genai import types
     
     for attempt in range(max_retries):
         try:
-            response = client.models.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=temperature,
-                    system_instruction=system_prompt + "\n\n반드시 유효한 JSON 형식으로만 응답하세요. 다른 텍스트 없이 JSON만 출력하세요.",
-                    response_mime_type="application/json"
+            with _provider_call():
+                response = client.models.generate_content(
+                    model=config.GEMINI_MODEL,
+                    contents=prompt,
+                    config=_gemini_json_config(system_prompt, temperature, max_output_tokens, timeout)
                 )
-            )
             content = response.text.strip()
-            # JSON 블록 추출 (```json ... ``` 형태인 경우)
-            if content.startswith("```"):
-                lines = content.split("\n")
-                json_lines = []
-                in_json = False
-                for line in lines:
-                    if line.startswith("```json"):
-                        in_json = True
-                        continue
-                    elif line.startswith("```"):
-                        in_json = False
-                        continue
-                    if in_json:
-                        json_lines.append(line)
-                content = "\n".join(json_lines)
-            result = json.loads(content)
+            # JSON 블록 추출 (```json ... ``` 형태인 경우, response_mime_type이 지켜지면 바로 JSON으로 시작)
+            if content[:1] not in ("{", "["):
+                match = _JSON_FENCE_RE.search(content)
+                if match:
+                    content = match.group(1)
+            result = orjson.loads(content)
             # Handle case where Gemini returns a list instead of dict
             if isinstance(result, list):
                 if len(result) > 0 and isinstance(result[0], dict):
@@ -164,14 +396,14 @@ def generate_json_gemini(prompt: str, system_prompt: str, temperature: float, ma
                     result = {"items": result}  # Wrap in dict
             return result
         except json.JSONDecodeError as e:
-            print(f"[Gemini] JSON 파싱 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
+            logger.warning("[Gemini] JSON 파싱 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < min(max_retries, config.LLM_JSON_PARSE_RETRIES) - 1:
                 continue
             raise RuntimeError(f"JSON 파싱 실패: {e}")
         except Exception as e:
-            print(f"[Gemini] API 오류 (시도 {attempt+1}/{max_retries}): {e}", flush=True)
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
+            logger.warning("[Gemini] API 오류 (시도 %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1 and _is_retryable(e):
+                _backoff(attempt)
                 continue
             raise RuntimeError(f"Gemini API 호출 실패: {e}")
 
@@ -179,30 +411,60 @@ def generate_json_gemini(prompt: str, system_prompt: str, temperature: float, ma
 def generate_embedding_gemini(text: str) -> list[float]:
     """Gemini 임베딩 생성 (text-embedding-004 모델 사용)"""
     client = get_gemini_client()
-    result = client.models.embed_content(
-        model="text-embedding-004",
-        contents=text
-    )
+    with _provider_call():
+        result = client.models.embed_content(
+            model="text-embedding-004",
+            contents=text
+        )
     return result.embeddings[0].values
 
 
+def generate_embeddings_batch_gemini(texts: list[str]) -> list[list[float]]:
+    """여러 텍스트를 embed_content 요청당 최대 EMBEDDING_BATCH_LIMITS["gemini"]개씩 임베딩"""
+    client = get_gemini_client()
+    embeddings = []
+    for chunk in _chunked(texts, config.EMBEDDING_BATCH_LIMITS["gemini"]):
+        with _provider_call():
+            result = client.models.embed_content(
+                model="text-embedding-004",
+                contents=chunk
+            )
+        embeddings.extend(e.values for e in result.embeddings)
+    return embeddings
+
+
 # ============== Unified Interface ==============
 def generate_text(
     prompt: str,
     system_prompt: str = "당신은 Q방법론 연구를 돕는 전문 연구 보조원입니다. 모든 응답은 한국어로 합니다.",
     max_retries: int = 3,
     temperature: float = 0.7,
+    cache: bool = False,
 ) -> str:
-    """텍스트를 생성합니다."""
+    """
+    텍스트를 생성합니다.
+    
+    Args:
+        cache: True이면 (모델, 온도, 프롬프트)가 같은 이전 응답을 재사용
+               (temperature <= SEMANTIC_LLM_CACHE_MAX_TEMPERATURE이면 항상 사용하고 의미가 같은 프롬프트도 적중)
+    """
     provider = get_provider()
-    print(f"[LLM] 텍스트 생성 시작... (프로바이더: {provider})", flush=True)
+    use_cache = (cache or temperature <= config.SEMANTIC_LLM_CACHE_MAX_TEMPERATURE) and config.CACHE_ENABLED
+    if use_cache:
+        cache_key, cached = _llm_cache_lookup("llm_text", provider, prompt, system_prompt, temperature, None)
+        if cached is not semantic_cache._MISS:
+            return cached
+    
+    logger.debug("[LLM] 텍스트 생성 시작... (프로바이더: %s)", provider)
     
     if provider == "openai":
         result = generate_text_openai(prompt, system_prompt, temperature, max_retries)
     else:
         result = generate_text_gemini(prompt, system_prompt, temperature, max_retries)
     
-    print(f"[LLM] 텍스트 생성 완료 ({len(result)} chars)", flush=True)
+    logger.debug("[LLM] 텍스트 생성 완료 (%d chars)", len(result))
+    if use_cache:
+        _llm_cache_store("llm_text", cache_key, result)
     return result
 
 
@@ -211,25 +473,222 @@ def generate_json(
     system_prompt: str = "당신은 Q방법론 연구를 돕는 전문 연구 보조원입니다. 모든 응답은 JSON 형식으로 합니다.",
     max_retries: int = 3,
     temperature: float = 0.7,
+    max_output_tokens: Optional[int] = None,
+    timeout: float = None,
+    cache: bool = False,
 ) -> dict:
-    """JSON 응답을 생성하고 파싱합니다."""
+    """
+    JSON 응답을 생성하고 파싱합니다.
+    
+    Args:
+        max_output_tokens: 응답 토큰 상한 (None이면 모델 기본값, 스키마가 고정된 호출에서 지정)
+        timeout: 요청 1회당 대기 시간(초) (기본값: config.LLM_TIMEOUT_SECONDS)
+        cache: True이면 (모델, 온도, 토큰 상한, 프롬프트)가 같은 이전 응답을 재사용 (재실행 시 LLM 호출 생략)
+               (temperature <= SEMANTIC_LLM_CACHE_MAX_TEMPERATURE이면 항상 사용하고 의미가 같은 프롬프트도 적중)
+    """
     provider = get_provider()
-    print(f"[LLM] JSON 생성 시작... (프로바이더: {provider})", flush=True)
+    if timeout is None:
+        timeout = config.LLM_TIMEOUT_SECONDS
+    
+    use_cache = (cache or temperature <= config.SEMANTIC_LLM_CACHE_MAX_TEMPERATURE) and config.CACHE_ENABLED
+    if use_cache:
+        cache_key, cached = _llm_cache_lookup("llm", provider, prompt, system_prompt, temperature, max_output_tokens)
+        if cached is not semantic_cache._MISS:
+            return cached
     
+    logger.debug("[LLM] JSON 생성 시작... (프로바이더: %s)", provider)
     if provider == "openai":
-        result = generate_json_openai(prompt, system_prompt, temperature, max_retries)
+        result = generate_json_openai(prompt, system_prompt, temperature, max_retries, max_output_tokens, timeout)
     else:
-        result = generate_json_gemini(prompt, system_prompt, temperature, max_retries)
+        result = generate_json_gemini(prompt, system_prompt, temperature, max_retries, max_output_tokens, timeout)
     
-    print(f"[LLM] JSON 생성 완료", flush=True)
+    logger.debug("[LLM] JSON 생성 완료")
+    if use_cache:
+        _llm_cache_store("llm", cache_key, result)
     return result
 
 
-def generate_embedding(text: str) -> list[float]:
-    """텍스트의 임베딩 벡터를 생성합니다."""
-    provider = get_provider()
+def generate_batch(prompts: list[str], json_mode: bool = False, **kwargs) -> list:
+    """
+    여러 프롬프트를 동시에 보내고 입력 순서대로 결과를 돌려줍니다.
+    (SDK 동기 클라이언트는 네트워크 대기 중 GIL을 놓으므로 스레드 풀로 겹쳐 실행, 동시 요청 수는 MAX_PARALLEL_LLM)
     
+    Args:
+        json_mode: True이면 generate_json, 아니면 generate_text 사용
+        **kwargs: generate_text / generate_json에 그대로 전달
+    """
+    if not prompts:
+        return []
+    generate = generate_json if json_mode else generate_text
+    with ContextThreadPoolExecutor(max_workers=max(1, min(len(prompts), config.MAX_PARALLEL_LLM))) as executor:
+        return list(executor.map(lambda prompt: generate(prompt, **kwargs), prompts))
+
+
+def _prompt_cache_key(
+    provider: str,
+    prompt: str,
+    system_prompt: str,
+    temperature: float,
+    max_output_tokens: Optional[int]
+) -> tuple[str, str]:
+    """프롬프트 캐시 키: (모델명, 원문 그대로의 blake2b 해시) - 공백/구두점 정규화 없이 정확 일치만"""
+    model = config.OPENAI_MODEL if provider == "openai" else config.GEMINI_MODEL
+    raw = f"{model}|{temperature}|{max_output_tokens}|{system_prompt}|{prompt}"
+    return model, hashlib.blake2b(raw.encode("utf-8"), digest_size=32).hexdigest()
+
+
+def _llm_cache_lookup(
+    ns: str,
+    provider: str,
+    prompt: str,
+    system_prompt: str,
+    temperature: float,
+    max_output_tokens: Optional[int]
+):
+    """
+    LLM 응답 디스크 캐시를 조회합니다.
+    - 일반: 프롬프트 원문 해시 정확 일치
+    - 저온도(SEMANTIC_LLM_CACHE_MAX_TEMPERATURE 이하): 프롬프트 임베딩 코사인 유사도 일치까지 허용
+      (고온도 응답은 다양성이 목적이므로 의미 일치로 재사용하지 않음)
+    
+    Returns:
+        (저장 시 쓸 캐시 키, 캐시 값 또는 semantic_cache._MISS) - 조회 실패는 미적중으로 처리
+    """
+    model, digest = _prompt_cache_key(provider, prompt, system_prompt, temperature, max_output_tokens)
+    # 현재 트리의 호출부는 모두 temperature 0.6 이상이므로 아래 의미 일치 경로는 실행되지 않음
+    semantic = temperature <= config.SEMANTIC_LLM_CACHE_MAX_TEMPERATURE
+    if semantic:
+        # 모델/온도/토큰 상한/시스템 프롬프트가 같은 항목끼리만 의미 비교
+        # 정확 일치 키는 원문 해시(digest)를 그대로 사용 (normalize_text는 부호/JSON 구두점까지 지워 다른 프롬프트가 충돌)
+        # 프롬프트 원문은 임베딩 대상 텍스트로만 사용
+        system_digest = hashlib.blake2b(system_prompt.encode("utf-8"), digest_size=16).hexdigest()
+        cache_key = [f"{model}|{temperature}|{max_output_tokens}|{system_digest}", prompt, None, digest]
+    else:
+        cache_key = [model, digest, None, None]
+    try:
+        cached, embedding = semantic_cache.lookup(
+            ns, cache_key[0], cache_key[1],
+            threshold=config.SEMANTIC_CACHE_THRESHOLD if semantic else None,
+            key=cache_key[3]
+        )
+        cache_key[2] = embedding  # 저장 시 임베딩 재계산 방지
+        return cache_key, cached
+    except Exception as e:
+        logger.warning("[CACHE] %s 조회 실패, 캐시 건너뜀: %s", ns, e)
+        return cache_key, semantic_cache._MISS
+
+
+def _llm_cache_store(ns: str, cache_key: list, result) -> None:
+    scope, text, embedding, key = cache_key
+    try:
+        semantic_cache.store(ns, scope, text, result, embedding=embedding, key=key)
+    except Exception as e:
+        logger.warning("[CACHE] %s 저장 실패: %s", ns, e)
+
+
+# 프로세스 내 임베딩 LRU: (프로바이더, 텍스트 해시) → 벡터
+_embedding_cache: "OrderedDict[tuple[str, str], list[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+def _embedding_key(provider: str, text: str) -> tuple[str, str]:
+    return provider, hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _embedding_cache_get(key: tuple[str, str]) -> Optional[list[float]]:
+    with _embedding_cache_lock:
+        embedding = _embedding_cache.get(key)
+        if embedding is not None:
+            _embedding_cache.move_to_end(key)
+        return embedding
+
+
+def _embedding_cache_put(key: tuple[str, str], embedding: list[float]) -> None:
+    with _embedding_cache_lock:
+        _embedding_cache[key] = embedding
+        _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > config.EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def _cached_embeddings(provider: str, texts: list[str]) -> list[Optional[list[float]]]:
+    """프로세스 LRU → 디스크 캐시 순으로 임베딩 조회 (디스크 적중은 LRU로 올림, 없으면 None)"""
+    keys = [_embedding_key(provider, text) for text in texts]
+    embeddings = [_embedding_cache_get(key) for key in keys]
+    missing = list(dict.fromkeys(key[1] for key, embedding in zip(keys, embeddings) if embedding is None))
+    if missing and config.CACHE_ENABLED:
+        try:
+            stored = semantic_cache.lookup_vectors("embedding", provider, missing)
+        except Exception as e:
+            logger.warning("[CACHE] embedding 조회 실패, 캐시 건너뜀: %s", e)
+            stored = {}
+        for i, key in enumerate(keys):
+            if embeddings[i] is None and key[1] in stored:
+                embeddings[i] = stored[key[1]].tolist()
+                _embedding_cache_put(key, embeddings[i])
+    return embeddings
+
+
+def _remember_embeddings(provider: str, by_text: dict[str, list[float]]) -> None:
+    """새로 받은 임베딩을 프로세스 LRU와 디스크 캐시에 저장 (재실행 시 API 호출 생략)"""
+    keys = {text: _embedding_key(provider, text) for text in by_text}
+    for text, embedding in by_text.items():
+        _embedding_cache_put(keys[text], embedding)
+    if config.CACHE_ENABLED:
+        try:
+            semantic_cache.store_vectors("embedding", provider, {keys[text][1]: embedding for text, embedding in by_text.items()})
+        except Exception as e:
+            logger.warning("[CACHE] embedding 저장 실패: %s", e)
+
+
+def _fetch_embedding(provider: str, text: str) -> list[float]:
     if provider == "openai":
         return generate_embedding_openai(text)
-    else:
-        return generate_embedding_gemini(text)
+    return generate_embedding_gemini(text)
+
+
+def generate_embedding(text: str) -> list[float]:
+    """텍스트의 임베딩 벡터를 생성합니다. (같은 텍스트는 프로세스 LRU / 디스크 캐시에서 재사용)"""
+    provider = get_provider()
+    cached = _cached_embeddings(provider, [text])[0]
+    if cached is not None:
+        return cached
+    
+    embedding = _fetch_embedding(provider, text)
+    _remember_embeddings(provider, {text: embedding})
+    return embedding
+
+
+def generate_embeddings_batch(texts: list[str]) -> list[list[float]]:
+    """
+    여러 텍스트의 임베딩을 한 번의 API 호출로 생성합니다. (입력 순서 유지)
+    배치 응답 개수가 맞지 않거나 배치 호출이 실패하면 텍스트별 개별 호출 (병렬)로 대체합니다.
+    """
+    if not texts:
+        return []
+    provider = get_provider()
+    embeddings = _cached_embeddings(provider, texts)
+    # 캐시에 없는 텍스트만 요청 (중복 텍스트는 한 번만)
+    missing = list(dict.fromkeys(text for text, e in zip(texts, embeddings) if e is None))
+    if not missing:
+        return embeddings
+    
+    try:
+        if provider == "openai":
+            fetched = generate_embeddings_batch_openai(missing)
+        else:
+            fetched = generate_embeddings_batch_gemini(missing)
+        if len(fetched) != len(missing):
+            logger.warning("[LLM] 배치 임베딩 응답 개수 불일치 (%d/%d), 개별 호출로 대체", len(fetched), len(missing))
+            fetched = None
+    except Exception as e:
+        logger.warning("[LLM] 배치 임베딩 실패, 개별 호출로 대체: %.100s", e)
+        fetched = None
+    if fetched is None:
+        # 개별 호출도 순차 대기 대신 동시에 요청 (결과는 입력 순서 유지)
+        with ContextThreadPoolExecutor(max_workers=max(1, min(len(missing), config.MAX_PARALLEL_LLM))) as executor:
+            fetched = list(executor.map(lambda text: _fetch_embedding(provider, text), missing))
+    
+    by_text = dict(zip(missing, fetched))
+    _remember_embeddings(provider, by_text)
+    return [e if e is not None else by_text[text] for text, e in zip(texts, embeddings)]
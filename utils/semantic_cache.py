@@ -0,0 +1,226 @@
+"""
+Two-tier cache for expensive LLM pipeline stages
+1단계: 정규화된 키의 md5 정확 일치 / 2단계: 임베딩 코사인 유사도 (의미 일치)
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_MISS = object()
+_write_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """캐시 DB 연결을 엽니다. (스레드마다 별도 연결 사용)"""
+    global _schema_ready
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(config.CACHE_DB_PATH, timeout=30)
+    if not _schema_ready:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                embedding BLOB,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_scope ON cache_entries (ns, scope)")
+        conn.commit()
+        _schema_ready = True
+    return conn
+
+
+def normalize_text(text: str) -> str:
+    """공백/구두점을 제거하고 소문자로 정규화합니다. ("MZ세대 워라밸" == "mz세대, 워라밸")"""
+    return re.sub(r"[\s\W_]+", "", text or "").lower()
+
+
+def make_key(scope: str, text: str) -> str:
+    """scope + 정규화 텍스트의 md5 정확 일치 키"""
+    return hashlib.md5(f"{scope}\x1f{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _ttl(ns: str) -> float:
+    return config.CACHE_TTL_SECONDS.get(ns, config.CACHE_DEFAULT_TTL_SECONDS)
+
+
+def lookup(ns: str, scope: str, text: str, threshold: float = None, key: str = None):
+    """
+    캐시를 조회합니다.
+
+    Args:
+        ns: 캐시 네임스페이스 (TTL 단위)
+        scope: 정확히 일치해야 하는 부가 조건 (언어, 인구통계 제약 등)
+        text: 정확/의미 일치 대상 텍스트
+        threshold: 의미 일치 코사인 임계값 (None이면 정확 일치만)
+        key: 정확 일치 키 (None이면 make_key(scope, text), 정규화 없이 원문 그대로 비교할 때 지정)
+
+    Returns:
+        (값 또는 _MISS, 조회 중 계산한 임베딩 또는 None)
+    """
+    min_created = time.time() - _ttl(ns)
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE ns = ? AND key = ? AND created_at >= ?",
+            (ns, key or make_key(scope, text), min_created)
+        ).fetchone()
+        if row:
+            logger.debug("[CACHE] %s 정확 일치 적중", ns)
+            return json.loads(row[0]), None
+
+        if threshold is None:
+            return _MISS, None
+
+        rows = conn.execute(
+            "SELECT embedding, value FROM cache_entries "
+            "WHERE ns = ? AND scope = ? AND created_at >= ? AND embedding IS NOT NULL",
+            (ns, scope, min_created)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    from utils.llm_client import generate_embedding
+    query = np.asarray(generate_embedding(text), dtype=np.float32)
+
+    # 프로바이더가 바뀌면 임베딩 차원이 달라지므로 같은 차원만 비교
+    candidates = [(np.frombuffer(emb, dtype=np.float32), value) for emb, value in rows]
+    candidates = [(emb, value) for emb, value in candidates if emb.shape == query.shape]
+    if not candidates:
+        return _MISS, query
+
+    matrix = np.vstack([emb for emb, _ in candidates])
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    sims = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+    best = int(np.argmax(sims))
+    if sims[best] >= threshold:
+        logger.debug("[CACHE] %s 의미 일치 적중 (유사도 %.3f)", ns, sims[best])
+        return json.loads(candidates[best][1]), query
+
+    return _MISS, query
+
+
+def store(ns: str, scope: str, text: str, value, embedding=None, key: str = None) -> None:
+    """결과를 정확 키(및 임베딩)와 함께 저장합니다. (key는 lookup과 같은 값)"""
+    blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+    payload = json.dumps(value, ensure_ascii=False)
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (ns, key, scope, embedding, value, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ns, key or make_key(scope, text), scope, blob, payload, time.time())
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE ns = ? AND created_at < ?",
+                (ns, time.time() - _ttl(ns))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def lookup_vectors(ns: str, scope: str, keys: list[str]) -> dict[str, np.ndarray]:
+    """
+    정확 키 목록으로 저장된 벡터를 한 번의 쿼리로 조회합니다. (임베딩 디스크 캐시용, 텍스트 정규화 없음)
+
+    Returns:
+        {키: float32 벡터} (TTL 내 적중한 키만)
+    """
+    if not keys:
+        return {}
+    min_created = time.time() - _ttl(ns)
+    placeholders = ",".join("?" * len(keys))
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"SELECT key, embedding FROM cache_entries "
+            f"WHERE ns = ? AND scope = ? AND created_at >= ? AND key IN ({placeholders})",
+            (ns, scope, min_created, *keys)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows if blob is not None}
+
+
+def store_vectors(ns: str, scope: str, vectors: dict) -> None:
+    """{키: 벡터}를 한 트랜잭션으로 저장합니다. (lookup_vectors와 같은 키 사용)"""
+    if not vectors:
+        return
+    now = time.time()
+    rows = [
+        (ns, key, scope, np.asarray(vector, dtype=np.float32).tobytes(), "null", now)
+        for key, vector in vectors.items()
+    ]
+    with _write_lock:
+        conn = _connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (ns, key, scope, embedding, value, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE ns = ? AND created_at < ?",
+                (ns, now - _ttl(ns))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def semantic_cache(ns: str, key_fn, threshold: float = None):
+    """
+    파이프라인 단계 함수에 2단계 캐시를 적용하는 데코레이터
+
+    Args:
+        ns: 캐시 네임스페이스 (config.CACHE_TTL_SECONDS의 키)
+        key_fn: 원 함수와 같은 인자를 받아 (scope, text)를 반환하는 함수
+        threshold: 의미 일치 임계값 (기본값: config.SEMANTIC_CACHE_THRESHOLD)
+    """
+    if threshold is None:
+        threshold = config.SEMANTIC_CACHE_THRESHOLD
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not config.CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            scope, text = key_fn(*args, **kwargs)
+            embedding = None
+            try:
+                cached, embedding = lookup(ns, scope, text, threshold)
+                if cached is not _MISS:
+                    return tuple(cached["value"]) if cached["is_tuple"] else cached["value"]
+            except Exception as e:
+                logger.warning("[CACHE] %s 조회 실패, 캐시 건너뜀: %s", ns, e)
+
+            result = func(*args, **kwargs)
+
+            try:
+                store(ns, scope, text, {"is_tuple": isinstance(result, tuple), "value": result}, embedding)
+            except Exception as e:
+                logger.warning("[CACHE] %s 저장 실패: %s", ns, e)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -2,33 +2,44 @@
 Similarity calculation utilities for Q-Methodology application
 """
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from typing import Optional
 
 
-def calculate_cosine_similarity(vec1: list[float], vec2: list[float]) -> float:
+def calculate_cosine_similarity(
+    vec1: list[float] | np.ndarray,
+    vec2: list[float] | np.ndarray,
+    *,
+    normalized: bool = False
+) -> float:
     """
     두 벡터 간의 코사인 유사도를 계산합니다.
     
     Args:
         vec1: 첫 번째 벡터
         vec2: 두 번째 벡터
+        normalized: True이면 두 벡터가 이미 L2 정규화된 것으로 보고 내적만 계산
+            (임베딩을 반복 비교하는 호출부는 normalize_embeddings()로 만든 float32 행을 넘기면 변환/복사 없음)
     
     Returns:
         코사인 유사도 (-1.0 ~ 1.0)
     """
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
+    # float32 ndarray는 복사하지 않음 (리스트는 한 번만 float32로 변환)
+    vec1 = np.asarray(vec1, dtype=np.float32)
+    vec2 = np.asarray(vec2, dtype=np.float32)
+    
+    if normalized:
+        return float(vec1 @ vec2)
     
-    dot_product = np.dot(vec1, vec2)
     norm1 = np.linalg.norm(vec1)
     norm2 = np.linalg.norm(vec2)
     
     if norm1 == 0 or norm2 == 0:
         return 0.0
     
-    return dot_product / (norm1 * norm2)
+    return float(vec1 @ vec2 / (norm1 * norm2))
 
 
 def calculate_text_similarity_matrix(texts: list[str]) -> np.ndarray:
@@ -39,14 +50,14 @@ def calculate_text_similarity_matrix(texts: list[str]) -> np.ndarray:
         texts: 텍스트 리스트
     
     Returns:
-        유사도 매트릭스 (n x n)
+        유사도 매트릭스 (n x n, float32)
     """
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(texts)
-    return cosine_similarity(tfidf_matrix)
+    # compute_tfidf_matrix 행은 이미 L2 정규화되어 있으므로 코사인 = 내적 (재정규화 생략)
+    tfidf_matrix = compute_tfidf_matrix(texts)
+    return (tfidf_matrix @ tfidf_matrix.T).toarray()
 
 
-def compute_tfidf_matrix(texts: list[str]) -> np.ndarray:
+def compute_tfidf_matrix(texts: list[str]) -> sparse.csr_matrix:
     """
     텍스트 리스트의 TF-IDF 행렬을 계산합니다.
     
@@ -54,54 +65,97 @@ def compute_tfidf_matrix(texts: list[str]) -> np.ndarray:
         texts: 텍스트 리스트
     
     Returns:
-        TF-IDF 행렬
+        float32 희소(CSR) TF-IDF 행렬 (N x 어휘 수를 밀집 행렬로 펼치지 않음)
+        TfidfVectorizer 기본값 norm="l2"로 행이 이미 단위 벡터 → 코사인 = 내적
     """
-    vectorizer = TfidfVectorizer()
-    return vectorizer.fit_transform(texts).toarray()
+    vectorizer = TfidfVectorizer(dtype=np.float32)
+    return vectorizer.fit_transform(texts)
 
 
 def find_most_dissimilar_items(
-    tfidf_matrix: np.ndarray,
-    target_count: int
+    tfidf_matrix: np.ndarray | sparse.spmatrix,
+    target_count: int,
+    precomputed: bool = False
 ) -> list[int]:
     """
     TF-IDF 행렬에서 가장 변별력 있는(서로 다른) 항목들의 인덱스를 찾습니다.
     
     Args:
-        tfidf_matrix: TF-IDF 행렬
+        tfidf_matrix: TF-IDF 행렬 (밀집 또는 희소)
         target_count: 선택할 항목 수
+        precomputed: True이면 행이 이미 L2 정규화된 것으로 보고 내적만으로 코사인 유사도 계산
     
     Returns:
         선택된 항목들의 인덱스 리스트
     """
-    similarity_matrix = cosine_similarity(tfidf_matrix)
-    n = len(tfidf_matrix)
-    selected = [0]  # 첫 번째 항목으로 시작
+    if precomputed:
+        similarity_matrix = tfidf_matrix @ tfidf_matrix.T
+        if sparse.issparse(similarity_matrix):
+            similarity_matrix = similarity_matrix.toarray()  # N x N만 밀집으로 (희소 곱은 nnz에 비례)
+    else:
+        similarity_matrix = cosine_similarity(tfidf_matrix)
+    return _farthest_point_selection(similarity_matrix, [0], target_count)  # 첫 번째 항목으로 시작
+
+
+def _farthest_point_selection(similarity_matrix: np.ndarray, selected: list[int], target_count: int) -> list[int]:
+    """
+    Greedy farthest-point 선택: 선택된 항목들과의 최대 유사도가 가장 낮은 후보를 차례로 추가합니다.
+    각 후보의 '선택된 항목들과의 최대 유사도'를 유지하고 새로 선택된 열만 반영 (O(N·K) NumPy 연산)
+    """
+    n = similarity_matrix.shape[0]
+    selected = list(selected)
+    if len(selected) >= target_count or len(selected) >= n:
+        return selected
+    
+    max_sim_to_selected = np.max(np.asarray(similarity_matrix[:, selected], dtype=float), axis=1)
+    max_sim_to_selected[selected] = np.inf  # 선택된 항목은 후보에서 제외 (이후 np.maximum에도 inf 유지)
     
     while len(selected) < target_count and len(selected) < n:
-        min_max_similarity = float('inf')
-        best_candidate = None
-        
-        for i in range(n):
-            if i in selected:
-                continue
-            
-            # 이미 선택된 항목들과의 최대 유사도 계산
-            max_sim_to_selected = max(similarity_matrix[i][j] for j in selected)
-            
-            # 최대 유사도가 가장 낮은 후보 선택
-            if max_sim_to_selected < min_max_similarity:
-                min_max_similarity = max_sim_to_selected
-                best_candidate = i
-        
-        if best_candidate is not None:
-            selected.append(best_candidate)
-        else:
-            break
+        # 최대 유사도가 가장 낮은 후보 선택 (동점이면 앞 인덱스)
+        best_candidate = int(np.argmin(max_sim_to_selected))
+        selected.append(best_candidate)
+        np.maximum(max_sim_to_selected, np.asarray(similarity_matrix[:, best_candidate], dtype=float).ravel(), out=max_sim_to_selected)
+        max_sim_to_selected[best_candidate] = np.inf
     
     return selected
 
 
+def near_duplicate_keep_indices(texts: list[str], threshold: float = 0.85) -> list[int]:
+    """
+    문자 3-gram 집합의 Jaccard 유사도가 threshold 이상인 근접 중복을 제거하고 남길 인덱스를 반환합니다.
+    앞쪽 항목을 우선 유지하며 (순서 보존), 교집합 크기는 이진 shingle 행렬 곱 한 번으로 계산합니다.
+    
+    Args:
+        texts: 텍스트 리스트
+        threshold: 중복으로 볼 Jaccard 유사도 하한
+    
+    Returns:
+        유지할 항목들의 인덱스 리스트 (오름차순)
+    """
+    if len(texts) < 2:
+        return list(range(len(texts)))
+    try:
+        shingles = CountVectorizer(analyzer="char", ngram_range=(3, 3), binary=True).fit_transform(texts)
+    except ValueError:
+        # 모든 텍스트가 3글자 미만 → shingle 없음
+        return list(range(len(texts)))
+    
+    intersection = (shingles @ shingles.T).toarray()
+    sizes = np.diag(intersection)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    jaccard = intersection / np.maximum(union, 1)
+    duplicate = np.triu(jaccard >= threshold, k=1)
+    
+    keep = []
+    removed = np.zeros(len(texts), dtype=bool)
+    for i in range(len(texts)):
+        if removed[i]:
+            continue
+        keep.append(i)
+        removed |= duplicate[i]
+    return keep
+
+
 def find_most_dissimilar(
     texts: list[str],
     target_count: int,
@@ -120,35 +174,13 @@ def find_most_dissimilar(
         선택된 항목들의 인덱스 리스트
     """
     similarity_matrix = calculate_text_similarity_matrix(texts)
-    n = len(texts)
     selected = list(existing_indices) if existing_indices else []
     
-    # 첫 번째 항목이 없으면 무작위 선택
+    # 첫 번째 항목이 없으면 0번부터 시작
     if not selected:
         selected.append(0)
     
-    while len(selected) < target_count and len(selected) < n:
-        min_max_similarity = float('inf')
-        best_candidate = None
-        
-        for i in range(n):
-            if i in selected:
-                continue
-            
-            # 이미 선택된 항목들과의 최대 유사도 계산
-            max_sim_to_selected = max(similarity_matrix[i][j] for j in selected)
-            
-            # 최대 유사도가 가장 낮은 후보 선택
-            if max_sim_to_selected < min_max_similarity:
-                min_max_similarity = max_sim_to_selected
-                best_candidate = i
-        
-        if best_candidate is not None:
-            selected.append(best_candidate)
-        else:
-            break
-    
-    return selected
+    return _farthest_point_selection(similarity_matrix, selected, target_count)
 
 
 def calculate_embedding_similarity_matrix(embeddings: list[list[float]]) -> np.ndarray:
@@ -161,28 +193,106 @@ def calculate_embedding_similarity_matrix(embeddings: list[list[float]]) -> np.n
     Returns:
         유사도 매트릭스 (n x n)
     """
-    embeddings_array = np.array(embeddings)
-    return cosine_similarity(embeddings_array)
+    return cosine_similarity_batch(embeddings)
 
 
-def check_diversity(embeddings: list[list[float]], threshold: float = 0.4) -> tuple[bool, list[tuple[int, int, float]]]:
+def cosine_similarity_batch(embeddings: list[list[float]] | np.ndarray) -> np.ndarray:
+    """
+    (N, D) 벡터들의 코사인 유사도 행렬 (N, N)
+    행을 한 번 L2 정규화한 뒤 행렬곱 한 번으로 계산합니다. (sklearn cosine_similarity의 입력 검증/복사 생략)
+    """
+    normalized = normalize_embeddings(embeddings)
+    return normalized @ normalized.T
+
+
+def similar_partners(violations: list[tuple[int, int, float]], index: int, limit: int = 5) -> list[int]:
+    """
+    check_diversity 위반 쌍 중 index와 임계값을 넘은 상대 인덱스 (유사도 내림차순, 최대 limit개)
+    """
+    partners = [(sim, j if i == index else i) for i, j, sim in violations if index in (i, j)]
+    partners.sort(reverse=True)
+    return [k for _, k in partners[:limit]]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """scores 내림차순 상위 k개 인덱스 (argpartition으로 O(n) 선택 후 k개만 정렬, 하위 k개는 -scores로 호출)"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def check_diversity(
+    embeddings: list[list[float]] | np.ndarray,
+    threshold: float = 0.4,
+    return_violations: bool = True,
+    max_violations: Optional[int] = None
+) -> tuple[bool, list[tuple[int, int, float]]]:
     """
     임베딩들의 다양성을 검증합니다.
     
     Args:
-        embeddings: 임베딩 벡터 리스트
+        embeddings: 임베딩 벡터 리스트 또는 (N, D) 행렬
         threshold: 유사도 임계값 (이 값 미만이어야 다양성 충족)
+        return_violations: False이면 충족 여부만 계산 (초과 쌍 리스트는 항상 [])
+        max_violations: 초과 쌍 리스트 최대 개수 (None이면 전부, 행 우선 순서로 앞에서부터)
     
     Returns:
         (다양성 충족 여부, 임계값 초과 쌍 리스트)
     """
-    similarity_matrix = calculate_embedding_similarity_matrix(embeddings)
-    n = len(embeddings)
-    violations = []
+    if len(embeddings) < 2:
+        return True, []
+    
+    return similarity_violations(cosine_similarity_batch(embeddings), threshold, return_violations, max_violations)
+
+
+def normalize_embeddings(embeddings: list[list[float]] | np.ndarray) -> np.ndarray:
+    """행 단위 L2 정규화한 float32 (N, D) 행렬 (영벡터는 그대로 0 → 유사도 0)"""
+    E = np.array(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(E, axis=-1, keepdims=True)
+    E /= np.where(norms == 0, 1.0, norms)
+    return E
+
+
+def update_similarity_rows(
+    normalized: np.ndarray,
+    similarity_matrix: np.ndarray,
+    indices: list[int],
+    new_embeddings: list[list[float]] | np.ndarray
+) -> None:
+    """
+    일부 임베딩만 바뀌었을 때 정규화 행렬과 유사도 행렬의 해당 행/열만 제자리 갱신합니다.
+    (k개 교체 시 O(k·N·D), 전체 재계산 O(N²·D) 대신)
+    """
+    normalized[indices] = normalize_embeddings(new_embeddings)
+    rows = normalized[indices] @ normalized.T
+    similarity_matrix[indices, :] = rows
+    similarity_matrix[:, indices] = rows.T
+
+
+def similarity_violations(
+    similarity_matrix: np.ndarray,
+    threshold: float,
+    return_violations: bool = True,
+    max_violations: Optional[int] = None
+) -> tuple[bool, list[tuple[int, int, float]]]:
+    """유사도 행렬에서 임계값 이상인 (i < j) 쌍 추출 → (다양성 충족 여부, 초과 쌍 리스트)"""
+    n = similarity_matrix.shape[0]
+    
+    # 상삼각 (i < j) 쌍 중 임계값 이상만 추출 (행 우선 순서 유지)
+    iu, ju = np.triu_indices(n, k=1)
+    sims = similarity_matrix[iu, ju]
+    mask = sims >= threshold
+    if not return_violations:
+        # 충족 여부만 필요하면 파이썬 튜플을 만들지 않음
+        return not mask.any(), []
     
-    for i in range(n):
-        for j in range(i + 1, n):
-            if similarity_matrix[i][j] >= threshold:
-                violations.append((i, j, similarity_matrix[i][j]))
+    hits = np.flatnonzero(mask)
+    is_diverse = hits.size == 0
+    if max_violations is not None:
+        hits = hits[:max_violations]
+    # .tolist()로 파이썬 int/float 변환을 C에서 한 번에 처리
+    violations = list(zip(iu[hits].tolist(), ju[hits].tolist(), sims[hits].tolist()))
     
-    return len(violations) == 0, violations
+    return is_diverse, violations